@@ -38,6 +38,7 @@ interface UserDetails {
   last_access: string
   last_gate_id: string
   last_gate_name: string
+  access_count: number
   access_history: Array<{
     gateId: string
     gate_name: string
@@ -491,7 +492,7 @@ export function SearchBar() {
                             </div>
                             <div className="p-2 bg-gradient-to-br from-purple-50 to-purple-100 rounded-lg border border-purple-200">
                               <p className="text-xs text-purple-600 font-medium">Total</p>
-                              <p className="text-sm font-semibold text-purple-900">{selectedUser.access_history.length}</p>
+                              <p className="text-sm font-semibold text-purple-900">{selectedUser.access_count}</p>
                             </div>
                             <div className="p-2 bg-gradient-to-br from-orange-50 to-orange-100 rounded-lg border border-orange-200">
                               <p className="text-xs text-orange-600 font-medium">Status</p>
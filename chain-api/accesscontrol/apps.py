@@ -1,6 +1,30 @@
+import os
+import sys
 from django.apps import AppConfig
 
 
 class AccesscontrolConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accesscontrol'
+
+    def ready(self):
+        from config.config import ANCHOR, CHAIN_INDEXER, SUMMARIES
+        if not self.is_serving_process():
+            return
+        if ANCHOR["worker_enabled"]:
+            from blockchain.modules.outbox import start_anchor_worker
+            start_anchor_worker()
+        if CHAIN_INDEXER["worker_enabled"]:
+            from blockchain.modules.indexer import start_chain_indexer
+            start_chain_indexer()
+        if SUMMARIES["worker_enabled"]:
+            from accesscontrol.controller.models.summaries import start_summary_worker
+            start_summary_worker()
+
+    def is_serving_process(self):
+        # Background workers only run inside the process that serves requests,
+        # not in one-off management commands or the runserver autoreloader parent.
+        if not sys.argv or not sys.argv[0].endswith("manage.py"):
+            return True
+        command = sys.argv[1] if len(sys.argv) > 1 else None
+        return command == "runserver" and os.environ.get("RUN_MAIN") == "true"
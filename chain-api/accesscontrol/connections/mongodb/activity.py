@@ -0,0 +1,84 @@
+"""
+Per-user activity profiles.
+
+One small document per user in activity_profiles, kept up to date by every
+tap with a single $inc/$min/$max upsert (no reads):
+
+    granted, denied                 totals
+    gates.<key>                     {id, name, granted, denied} per gate
+    hours.<0-23>                    granted taps per hour of day
+    first_seen, last_seen           first and last granted tap
+    last_denied_at                  last denied tap
+
+Its size is bounded by the number of gates, not by how often the user taps,
+so prompts built from it stay the same size as activity grows.
+"""
+from bson import ObjectId
+from pymongo import UpdateOne
+from .dbconnect import activity_profiles_collection
+
+
+def gate_key(gate_id):
+    # Field names cannot contain "." or start with "$".
+    return str(gate_id or "unknown").replace(".", "_").replace("$", "_")
+
+def activity_update(user_id, gate_id, gate_name, timestamp, granted=True):
+    if isinstance(user_id, str):
+        user_id = ObjectId(user_id)
+    gate = f"gates.{gate_key(gate_id)}"
+    outcome = "granted" if granted else "denied"
+    update = {
+        "$inc": {outcome: 1, f"{gate}.{outcome}": 1},
+        "$set": {f"{gate}.id": gate_id, f"{gate}.name": gate_name}
+    }
+    if granted:
+        update["$inc"][f"hours.{timestamp.hour}"] = 1
+        update["$min"] = {"first_seen": timestamp}
+        update["$max"] = {"last_seen": timestamp}
+    else:
+        update["$max"] = {"last_denied_at": timestamp}
+    return UpdateOne({"_id": user_id}, update, upsert=True)
+
+def load_activity(user_id):
+    if isinstance(user_id, str):
+        user_id = ObjectId(user_id)
+    return activity_profiles_collection.find_one({"_id": user_id}) or {}
+
+def approximate(count):
+    """Exact below 10, then rounded down to one significant digit (14 -> 10, 4567 -> 4000)."""
+    if count < 10:
+        return count
+    step = 10 ** (len(str(count)) - 1)
+    return count - count % step
+
+def activity_digest(activity, top_gates=5, top_hours=3):
+    """The profile as a few short, fixed-size fields for a prompt.
+
+    The summary cache is keyed by a hash of this digest, so counts are
+    approximated, times are whole days and shares are rounded to 5%: the
+    digest (and the cached summary) only changes when the picture does,
+    not on every tap.
+    """
+    granted = activity.get("granted", 0)
+    gates = sorted(activity.get("gates", {}).values(), key=lambda gate: (-gate.get("granted", 0), str(gate.get("id"))))
+    hours = sorted(((int(hour), count) for hour, count in activity.get("hours", {}).items()), key=lambda item: (-item[1], item[0]))
+
+    def when(value):
+        return value.strftime("%Y-%m-%d") if value else None
+
+    return {
+        "total_accesses": approximate(granted),
+        "denied_attempts": approximate(activity.get("denied", 0)),
+        "first_seen": when(activity.get("first_seen")),
+        "last_seen": when(activity.get("last_seen")),
+        "last_denied": when(activity.get("last_denied_at")),
+        "top_gates": [
+            f"{gate.get('name') or gate.get('id')}: {approximate(gate.get('granted', 0))} granted"
+            + (f", {approximate(gate['denied'])} denied" if gate.get("denied") else "")
+            for gate in gates[:top_gates]
+        ],
+        "busiest_hours": [
+            f"{hour:02d}:00-{(hour + 1) % 24:02d}:00 ({5 * round(20 * count / granted)}%)"
+            for hour, count in hours[:top_hours] if granted
+        ]
+    }
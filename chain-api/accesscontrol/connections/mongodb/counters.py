@@ -0,0 +1,83 @@
+"""
+Materialized dashboard counters.
+
+One document in the stats collection holds the overview totals. Tap and
+CRUD paths move them with $inc, so OverviewView reads them in a single
+fetch instead of counting whole collections. reconcile_counters() rebuilds
+the document from the source collections if it ever drifts.
+
+A database that predates the counters is seeded by the first read, once:
+seed_counters() adds the recounted totals on top of whatever increments
+already arrived, and only if no other process has seeded it first.
+"""
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from .dbconnect import stats_collection, users_collection, devices_collection, accesslog_collection
+
+OVERVIEW_ID = "overview"
+COUNTER_FIELDS = ("granted", "denied", "total_users", "active_users", "total_devices", "active_devices")
+
+
+def counter_update(increments):
+    return UpdateOne(
+        {"_id": OVERVIEW_ID},
+        {"$inc": increments, "$set": {"updated_at": datetime.now()}},
+        upsert=True
+    )
+
+def bump_counters(**increments):
+    increments = {field: amount for field, amount in increments.items() if amount}
+    if not increments:
+        return
+    try:
+        stats_collection.bulk_write([counter_update(increments)])
+    except Exception as e:
+        # A missed increment is repaired by reconcile_counters; the write it describes already happened.
+        print(f"Error updating overview counters {increments}: {e}")
+
+def count_sources():
+    granted = accesslog_collection.count_documents({"access_status": "granted"})
+    denied = accesslog_collection.count_documents({"access_status": "denied"})
+    return {
+        "granted": granted,
+        "denied": denied,
+        "total_users": users_collection.count_documents({}),
+        "active_users": users_collection.count_documents({"active": True}),
+        "total_devices": devices_collection.count_documents({}),
+        "active_devices": devices_collection.count_documents({"status": "Active"})
+    }
+
+def reconcile_counters():
+    """Recount every counter; returns (previous, current) values."""
+    previous = stats_collection.find_one({"_id": OVERVIEW_ID}) or {}
+    current = count_sources()
+    stats_collection.update_one(
+        {"_id": OVERVIEW_ID},
+        {"$set": {**current, "updated_at": datetime.now(), "reconciled_at": datetime.now()}},
+        upsert=True
+    )
+    return {field: previous.get(field) for field in COUNTER_FIELDS}, current
+
+def seed_counters(previous):
+    """Add the source counts, less the increments already in previous, unless another process seeded first."""
+    current = count_sources()
+    increments = {field: current[field] - (previous or {}).get(field, 0) for field in COUNTER_FIELDS}
+    try:
+        # $inc rather than $set: taps landing while the sources were counted are kept.
+        stats_collection.update_one(
+            {"_id": OVERVIEW_ID, "reconciled_at": {"$exists": False}},
+            {"$inc": increments, "$set": {"updated_at": datetime.now(), "reconciled_at": datetime.now()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Seeded by another process in the meantime.
+        pass
+    return stats_collection.find_one({"_id": OVERVIEW_ID}) or {}
+
+def read_counters():
+    counters = stats_collection.find_one({"_id": OVERVIEW_ID})
+    if counters is None or "reconciled_at" not in counters:
+        # Database that predates the counters: increments alone would start from zero.
+        counters = seed_counters(counters)
+    return {field: counters.get(field, 0) for field in COUNTER_FIELDS}
@@ -1,12 +1,103 @@
-from pymongo import MongoClient
+import os
+import threading
+import pymongo
 from ..mongodb.dbconf import con_string
 from config.config import MONGODB
 
-client = MongoClient(con_string)
-db = client[MONGODB["database_name"]]
-users_collection = db[MONGODB["collections"]["users"]]
-cards_collection = db[MONGODB["collections"]["cards"]]
-admins_collection = db[MONGODB["collections"]["admin"]]
-accesslog_collection = db[MONGODB["collections"]["accesslog"]]
-devices_collection = db[MONGODB["collections"]["devices"]]
-settings_collection = db[MONGODB["collections"]["settings"]]
\ No newline at end of file
+# One MongoClient per process, created on first use. Importing this module
+# opens nothing, and a forked child (e.g. a gunicorn worker of a preloaded
+# app) builds its own client instead of sharing the parent's sockets.
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def client_options():
+    options = MONGODB["client"]
+    kwargs = {
+        "maxPoolSize": options["max_pool_size"],
+        "minPoolSize": options["min_pool_size"],
+        "maxIdleTimeMS": options["max_idle_time_ms"],
+        "connectTimeoutMS": options["connect_timeout_ms"],
+        "serverSelectionTimeoutMS": options["server_selection_timeout_ms"],
+        "appname": options["app_name"]
+    }
+    # Keyword options override the connection string's, so these are only passed when set explicitly.
+    if options["write_concern"]:
+        kwargs["w"] = int(options["write_concern"]) if options["write_concern"].isdigit() else options["write_concern"]
+    if options["read_concern"]:
+        kwargs["readConcernLevel"] = options["read_concern"]
+    if options["read_preference"]:
+        kwargs["readPreference"] = options["read_preference"]
+    if options["socket_timeout_ms"]:
+        kwargs["socketTimeoutMS"] = options["socket_timeout_ms"]
+    return kwargs
+
+def get_client():
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = pymongo.MongoClient(con_string, connect=False, **client_options())
+            _client_pid = os.getpid()
+        return _client
+
+def get_database():
+    return get_client()[MONGODB["database_name"]]
+
+def client_initialised():
+    return _client is not None
+
+
+class LazyHandle:
+    """Module-level stand-in for the client, database or a collection.
+
+    The real object is built from the process's client on first use and
+    rebuilt only if that client changes (after a fork).
+    """
+
+    def __init__(self, build, label):
+        self._build = build
+        self._label = label
+        self._owner = None
+        self._target = None
+
+    def _resolve(self):
+        client = get_client()
+        if self._owner is not client:
+            self._target = self._build(client)
+            self._owner = client
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+    def __repr__(self):
+        return f"<lazy {self._label}>"
+
+
+def lazy_collection(key):
+    return LazyHandle(lambda client: client[MONGODB["database_name"]][MONGODB["collections"][key]], f"collection {key}")
+
+
+client = LazyHandle(lambda client: client, "MongoClient")
+db = LazyHandle(lambda client: client[MONGODB["database_name"]], "database")
+users_collection = lazy_collection("users")
+cards_collection = lazy_collection("cards")
+admins_collection = lazy_collection("admin")
+accesslog_collection = lazy_collection("accesslog")
+access_levels_collection = lazy_collection("access_levels")
+alertconfig_collection = lazy_collection("alertconfig")
+devices_collection = lazy_collection("devices")
+settings_collection = lazy_collection("settings")
+anchor_outbox_collection = lazy_collection("anchor_outbox")
+anchor_batches_collection = lazy_collection("anchor_batches")
+access_history_collection = lazy_collection("access_history")
+stats_collection = lazy_collection("stats")
+chain_transactions_collection = lazy_collection("chain_transactions")
+user_summaries_collection = lazy_collection("user_summaries")
+activity_profiles_collection = lazy_collection("activity_profiles")
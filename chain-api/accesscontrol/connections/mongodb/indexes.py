@@ -0,0 +1,200 @@
+"""
+Declared MongoDB indexes and the query shapes they serve.
+
+INDEXES lists every index the API relies on, matched to the filters and
+sorts of the views and workers (equality fields first, then the sort, then
+ranges). QUERY_SHAPES registers those queries with representative values so
+explain() can show which ones still fall back to a collection scan.
+"""
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from .dbconnect import db
+from config.config import MONGODB
+
+C = MONGODB["collections"]
+
+INDEXES = {
+    C["users"]: [
+        # Tap lookup and QA lookup by card.
+        IndexModel([("nfc_id", ASCENDING)], name="nfc_id_1"),
+        IndexModel([("active", ASCENDING)], name="active_1"),
+        # UserListView default sort (name) and its keyset cursor.
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_1__id_1"),
+        IndexModel([("access_level", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)],
+                   name="access_level_1_name_1__id_1"),
+        # UserSearchView and the name= list filter (prefix and trigram keys).
+        IndexModel([("search_keys", ASCENDING)], name="search_keys_1"),
+    ],
+    C["devices"]: [
+        IndexModel([("tag_id", ASCENDING)], name="tag_id_1", unique=True),
+        IndexModel([("status", ASCENDING)], name="status_1"),
+    ],
+    C["admin"]: [
+        IndexModel([("email", ASCENDING)], name="email_1"),
+    ],
+    C["accesslog"]: [
+        # AccessLogsView listing, overview recent logs and the keyset cursor.
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_-1__id_-1"),
+        IndexModel([("access_status", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="access_status_1_timestamp_-1__id_-1"),
+        IndexModel([("access_time.date", ASCENDING), ("timestamp", DESCENDING)],
+                   name="access_time.date_1_timestamp_-1"),
+        # Denied taps carry no user_id, so they are left out of this index.
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="user_id_1_timestamp_-1__id_-1",
+                   partialFilterExpression={"user_id": {"$exists": True}}),
+        IndexModel([("nfc_id", ASCENDING), ("timestamp", DESCENDING)], name="nfc_id_1_timestamp_-1"),
+        # Anchoring backfill and /logs/<id>/verify/.
+        IndexModel([("blockchain_data.anchor_id", ASCENDING)], name="blockchain_data.anchor_id_1",
+                   partialFilterExpression={"blockchain_data.anchor_id": {"$exists": True}}),
+        # Anchoring outbox: only documents still being anchored carry the outbox field.
+        # claim_next / claim_batch / batch_ready: oldest pending first.
+        IndexModel([("outbox.status", ASCENDING), ("outbox.created_at", ASCENDING)],
+                   name="outbox.status_1_outbox.created_at_1",
+                   partialFilterExpression={"outbox.status": {"$exists": True}}),
+        # check_receipts only ever scans submitted entries.
+        IndexModel([("outbox.submitted_at", ASCENDING)], name="outbox.submitted_at_1_submitted",
+                   partialFilterExpression={"outbox.status": "submitted"}),
+        IndexModel([("outbox.batch_id", ASCENDING), ("outbox.created_at", ASCENDING)],
+                   name="outbox.batch_id_1_outbox.created_at_1",
+                   partialFilterExpression={"outbox.batch_id": {"$exists": True}}),
+    ],
+    C["access_history"]: [
+        # Bucket upserts (user_id, date, count) and newest-first reads.
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("last_timestamp", DESCENDING)],
+                   name="user_id_1_date_-1_last_timestamp_-1"),
+        IndexModel([("user_id", ASCENDING), ("entries.blockchain_data.anchor_id", ASCENDING)],
+                   name="user_id_1_entries.blockchain_data.anchor_id_1"),
+    ],
+    C["user_summaries"]: [
+        # Worker claims (oldest pending first) and the per-user lookups of cached_summary.
+        IndexModel([("status", ASCENDING), ("requested_at", ASCENDING)], name="status_1_requested_at_1"),
+        IndexModel([("user_id", ASCENDING), ("question", ASCENDING), ("status", ASCENDING), ("generated_at", DESCENDING)],
+                   name="user_id_1_question_1_status_1_generated_at_-1"),
+    ],
+    C["chain_transactions"]: [
+        # BlockchainTransactionsView: newest first, by hash, by sender or recipient.
+        IndexModel([("block", DESCENDING), ("_id", DESCENDING)], name="block_-1__id_-1"),
+        IndexModel([("hash", ASCENDING)], name="hash_1", unique=True),
+        IndexModel([("from", ASCENDING), ("block", DESCENDING), ("_id", DESCENDING)], name="from_1_block_-1__id_-1"),
+        IndexModel([("to", ASCENDING), ("block", DESCENDING), ("_id", DESCENDING)], name="to_1_block_-1__id_-1"),
+    ],
+}
+
+_sample_id = ObjectId()
+
+QUERY_SHAPES = [
+    {"name": "tap: user by card", "collection": C["users"], "filter": {"nfc_id": "0000000000"}},
+    {"name": "tap: device by tag", "collection": C["devices"], "filter": {"tag_id": "GATE"}},
+    {"name": "users: list by name", "collection": C["users"], "filter": {},
+     "sort": [("name", ASCENDING), ("_id", ASCENDING)]},
+    {"name": "users: list by level", "collection": C["users"], "filter": {"access_level": "Staff"},
+     "sort": [("name", ASCENDING), ("_id", ASCENDING)]},
+    {"name": "users: search by prefix", "collection": C["users"], "filter": {"search_keys": {"$all": ["n:jo"]}}},
+    {"name": "users: active count", "collection": C["users"], "filter": {"active": True}},
+    {"name": "login: admin by email", "collection": C["admin"], "filter": {"email": "admin@example.com"}},
+    {"name": "logs: newest first", "collection": C["accesslog"], "filter": {},
+     "sort": [("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    {"name": "logs: by status", "collection": C["accesslog"], "filter": {"access_status": "granted"},
+     "sort": [("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    {"name": "logs: by date range", "collection": C["accesslog"],
+     "filter": {"access_time.date": {"$gte": "2025-01-01", "$lte": "2025-01-31"}},
+     "sort": [("timestamp", DESCENDING)]},
+    {"name": "logs: by user", "collection": C["accesslog"], "filter": {"user_id": "000000000000000000000000"},
+     "sort": [("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    {"name": "logs: by card", "collection": C["accesslog"], "filter": {"nfc_id": "0000000000"},
+     "sort": [("timestamp", DESCENDING)]},
+    {"name": "logs: by anchor", "collection": C["accesslog"],
+     "filter": {"blockchain_data.anchor_id": str(_sample_id)}},
+    {"name": "anchor: oldest pending", "collection": C["accesslog"], "filter": {"outbox.status": "pending"},
+     "sort": [("outbox.created_at", ASCENDING)]},
+    {"name": "anchor: submitted receipts", "collection": C["accesslog"], "filter": {"outbox.status": "submitted"},
+     "sort": [("outbox.submitted_at", ASCENDING)]},
+    {"name": "anchor: batch members", "collection": C["accesslog"], "filter": {"outbox.batch_id": _sample_id},
+     "sort": [("outbox.created_at", ASCENDING)]},
+    {"name": "history: user buckets", "collection": C["access_history"], "filter": {"user_id": _sample_id},
+     "sort": [("date", DESCENDING), ("last_timestamp", DESCENDING)]},
+    {"name": "history: backfill entry", "collection": C["access_history"],
+     "filter": {"user_id": _sample_id, "entries.blockchain_data.anchor_id": str(_sample_id)}},
+    {"name": "summaries: oldest pending", "collection": C["user_summaries"], "filter": {"status": "pending"},
+     "sort": [("requested_at", ASCENDING)]},
+    {"name": "chain: newest transactions", "collection": C["chain_transactions"], "filter": {},
+     "sort": [("block", DESCENDING), ("_id", DESCENDING)]},
+    {"name": "chain: transaction by hash", "collection": C["chain_transactions"], "filter": {"hash": "0x00"}},
+    {"name": "chain: transactions by sender", "collection": C["chain_transactions"],
+     "filter": {"from": "0x0000000000000000000000000000000000000000"},
+     "sort": [("block", DESCENDING), ("_id", DESCENDING)]},
+]
+
+
+def ensure_indexes(dry_run=False):
+    """Create missing indexes; returns one report row per declared index."""
+    report = []
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+        existing_keys = {tuple(info["key"]): name for name, info in existing.items()}
+        for model in models:
+            spec = model.document
+            keys = tuple(spec["key"].items())
+            row = {"collection": collection_name, "index": spec["name"]}
+            if spec["name"] in existing:
+                row["status"] = "exists"
+            elif keys in existing_keys:
+                row["status"] = "exists"
+                row["detail"] = f"same keys as {existing_keys[keys]}"
+            elif dry_run:
+                row["status"] = "missing"
+            else:
+                try:
+                    # MongoDB 4.2+ builds indexes without holding an exclusive lock for the whole build.
+                    collection.create_indexes([model])
+                    row["status"] = "created"
+                except OperationFailure as e:
+                    row["status"] = "failed"
+                    row["detail"] = str(e)
+            report.append(row)
+    return report
+
+def plan_stages(plan):
+    stages = [plan.get("stage")]
+    if plan.get("inputStage"):
+        stages += plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+def plan_indexes(plan):
+    names = [plan["indexName"]] if plan.get("indexName") else []
+    if plan.get("inputStage"):
+        names += plan_indexes(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        names += plan_indexes(child)
+    return names
+
+def explain_shapes():
+    """Explain every registered query shape; returns one report row per shape."""
+    report = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape["collection"]].find(shape["filter"]).limit(shape.get("limit", 20))
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        explain = cursor.explain()
+        planner = explain.get("queryPlanner", {})
+        # Queries answered by the slot-based engine nest the classic plan one level down.
+        winning = planner.get("winningPlan", {})
+        winning = winning.get("queryPlan", winning)
+        stages = plan_stages(winning)
+        stats = explain.get("executionStats", {})
+        report.append({
+            "shape": shape["name"],
+            "collection": shape["collection"],
+            "collscan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+            "indexes": plan_indexes(winning),
+            "keys_examined": stats.get("totalKeysExamined"),
+            "docs_examined": stats.get("totalDocsExamined"),
+            "returned": stats.get("nReturned")
+        })
+    return report
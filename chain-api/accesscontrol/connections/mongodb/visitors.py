@@ -0,0 +1,136 @@
+"""
+Persisted unique-visitor sketches.
+
+Every tap with a card id raises one HyperLogLog register in three sketches
+kept in the stats collection:
+
+    visitors:all                    all-time
+    visitors:day:<date>             per calendar day
+    visitors:gate:<gateId>:<date>   per gate per day
+
+_ids sort by date within each prefix, so a date range is an _id range scan.
+Ranges are answered by merging the matching sketches; short ranges can be
+counted exactly from accesslog instead.
+
+Taps only cover what happens after the upgrade, so sketches are trusted once
+rebuild_visitor_sketches has stamped built_at on visitors:all; until then
+every range is counted exactly.
+"""
+from datetime import datetime
+from pymongo import UpdateOne
+from config.config import VISITORS
+from accesscontrol.helper.hyperloglog import HyperLogLog, register_for
+from .dbconnect import stats_collection, accesslog_collection
+
+ALL_ID = "visitors:all"
+DAY_PREFIX = "visitors:day:"
+GATE_PREFIX = "visitors:gate:"
+
+
+class SketchPrecisionError(Exception):
+    """Stored sketches use a different precision than VISITORS["precision"]."""
+
+
+def day_id(date):
+    return f"{DAY_PREFIX}{date}"
+
+def gate_prefix(gate_id):
+    return f"{GATE_PREFIX}{gate_id}:"
+
+def gate_day_id(gate_id, date):
+    return f"{gate_prefix(gate_id)}{date}"
+
+def sketch_update(sketch_id, index, rank, fields=None):
+    return UpdateOne(
+        {"_id": sketch_id},
+        {"$max": {f"registers.{index}": rank}, "$setOnInsert": {"precision": VISITORS["precision"], **(fields or {})}},
+        upsert=True
+    )
+
+def visitor_sketch_updates(nfc_id, date, gate_id=None):
+    """Register updates for one tap; empty when the tap carried no usable card id."""
+    if nfc_id in (None, "", "None"):
+        return []
+    index, rank = register_for(nfc_id, VISITORS["precision"])
+    updates = [
+        sketch_update(ALL_ID, index, rank, {"scope": "all"}),
+        sketch_update(day_id(date), index, rank, {"scope": "day", "date": date}),
+    ]
+    if gate_id:
+        updates.append(sketch_update(gate_day_id(gate_id, date), index, rank,
+                                     {"scope": "gate_day", "gate": gate_id, "date": date}))
+    return updates
+
+def sketches_built():
+    return stats_collection.find_one({"_id": ALL_ID, "built_at": {"$exists": True}}, {"_id": 1}) is not None
+
+def load_sketches(query):
+    sketch = HyperLogLog(VISITORS["precision"])
+    found = 0
+    for document in stats_collection.find(query, {"registers": 1, "precision": 1}):
+        precision = document.get("precision", VISITORS["precision"])
+        if precision != VISITORS["precision"]:
+            raise SketchPrecisionError(
+                f"Sketch {document['_id']} has precision {precision}, VISITORS_HLL_PRECISION is "
+                f"{VISITORS['precision']}; run rebuild_visitor_sketches --reset"
+            )
+        found += 1
+        sketch.merge(HyperLogLog.from_fields(document.get("registers"), precision))
+    return sketch, found
+
+def sketch_query(start_date=None, end_date=None, gate_id=None):
+    prefix = gate_prefix(gate_id) if gate_id else DAY_PREFIX
+    if not start_date and not end_date:
+        return {"_id": ALL_ID} if not gate_id else {"_id": {"$gte": prefix, "$lt": prefix + "\uffff"}}
+    return {"_id": {"$gte": prefix + (start_date or ""), "$lte": prefix + (end_date or "\uffff")}}
+
+def exact_unique_visitors(start_date=None, end_date=None, gate_id=None):
+    match = {"nfc_id": {"$nin": [None, "", "None"]}}
+    if start_date or end_date:
+        match["access_time.date"] = {}
+        if start_date:
+            match["access_time.date"]["$gte"] = start_date
+        if end_date:
+            match["access_time.date"]["$lte"] = end_date
+    if gate_id:
+        match["gateId"] = gate_id
+    result = list(accesslog_collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$nfc_id"}},
+        {"$count": "visitors"}
+    ], allowDiskUse=True))
+    return result[0]["visitors"] if result else 0
+
+def parse_date(value):
+    if value is None:
+        return None
+    datetime.strptime(value, "%Y-%m-%d")
+    return value
+
+def unique_visitors(start_date=None, end_date=None, gate_id=None, exact=None):
+    """Distinct card ids for a date range and/or gate.
+
+    exact=None picks the exact count for ranges of at most
+    VISITORS["exact_max_days"] days and the merged sketches otherwise.
+    Raises ValueError for malformed dates and SketchPrecisionError when the
+    stored sketches do not match the configured precision.
+    """
+    start_date, end_date = parse_date(start_date), parse_date(end_date)
+    if exact is None:
+        exact = False
+        if start_date and end_date:
+            days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+            exact = days <= VISITORS["exact_max_days"]
+
+    # Before rebuild_visitor_sketches ran, the sketches only hold taps since the upgrade.
+    if not exact and sketches_built():
+        sketch, found = load_sketches(sketch_query(start_date, end_date, gate_id))
+        if found:
+            return {
+                "count": sketch.count(),
+                "method": "hyperloglog",
+                "sketches": found,
+                "standard_error": round(sketch.standard_error(), 4)
+            }
+
+    return {"count": exact_unique_visitors(start_date, end_date, gate_id), "method": "exact"}
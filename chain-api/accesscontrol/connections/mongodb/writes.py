@@ -0,0 +1,229 @@
+"""
+Coalesced MongoDB writes for the tap path.
+
+A tap used to issue a user lookup, an access_history update, a last_access
+update and an accesslog insert one after the other. TapWriteBatch collects
+them and sends at most two writes on the request, however many taps it holds:
+
+    users               last_access fields                  bulk_write
+    accesslog           log entries, each carrying its      insert_many
+                        anchoring outbox state
+
+So a granted tap costs two round trips and any other tap one. The derived
+writes are handed to deferred_writes, which merges them across taps and
+flushes one write per collection every WRITES["flush_interval_seconds"]:
+
+    access_history      history bucket upserts              bulk_write
+    activity_profiles   activity profile counters           bulk_write
+    stats               dashboard counters (summed into one $inc) and
+                        visitor sketches                    bulk_write
+
+Deferred writes still buffered when a process dies are lost; counters,
+sketches and activity profiles are repaired by reconcile_counters,
+rebuild_visitor_sketches and rebuild_activity_profiles. A flush interval of
+0 writes them inline, after the request's own writes.
+
+Modes:
+    acknowledged  ordered, acknowledged writes (default)
+    fast          unordered; the users update is sent with w=0 and not waited
+                  for, so a tap waits on the accesslog insert alone
+    transaction   every write, derived ones included, in one multi-document
+                  transaction (replica set only); nothing is deferred
+"""
+import atexit
+import os
+import threading
+import traceback
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.write_concern import WriteConcern
+from config.config import WRITES
+from blockchain.modules.history import history_bucket_update
+from .dbconnect import (
+    client, users_collection, accesslog_collection, access_history_collection, stats_collection,
+    activity_profiles_collection
+)
+from .activity import activity_update
+from .counters import counter_update
+from .visitors import visitor_sketch_updates
+
+MODE_ACKNOWLEDGED = "acknowledged"
+MODE_FAST = "fast"
+MODE_TRANSACTION = "transaction"
+
+
+class TapWriteBatch:
+
+    def __init__(self, mode=None):
+        self.mode = mode or WRITES["mode"]
+        self.user_updates = {}
+        self.user_guards = {}
+        self.history_updates = []
+        self.activity_updates = []
+        self.accesslog_entries = []
+        self.counter_increments = {}
+        self.stats_updates = []
+
+    def push_history(self, user_id, entry):
+        self.history_updates.append(history_bucket_update(user_id, entry))
+
+    def add_activity(self, user_id, gate_id, gate_name, timestamp, granted=True):
+        self.activity_updates.append(activity_update(user_id, gate_id, gate_name, timestamp, granted))
+
+    def set_user_fields(self, user_id, fields, guard=None):
+        # A guard is an extra filter the user update must match, e.g. "only if newer".
+        self._user_update(user_id).setdefault("$set", {}).update(fields)
+        if guard is not None:
+            self.user_guards[self._user_id(user_id)] = guard
+
+    def add_accesslog(self, entry):
+        self.accesslog_entries.append(entry)
+
+    def increment(self, counter, amount=1):
+        self.counter_increments[counter] = self.counter_increments.get(counter, 0) + amount
+
+    def add_visitor(self, nfc_id, date, gate_id=None):
+        self.stats_updates.extend(visitor_sketch_updates(nfc_id, date, gate_id))
+
+    def _user_id(self, user_id):
+        return ObjectId(user_id) if isinstance(user_id, str) else user_id
+
+    def _user_update(self, user_id):
+        return self.user_updates.setdefault(self._user_id(user_id), {})
+
+    def commit(self):
+        if self.mode == MODE_TRANSACTION:
+            with client.start_session() as session:
+                return session.with_transaction(lambda s: self._write_all(session=s))
+
+        if self.mode == MODE_FAST:
+            # The accesslog insert is the tap's record and its anchoring outbox entry, so it stays acknowledged.
+            result = self._write(users_collection.with_options(write_concern=WriteConcern(w=0)), ordered=False)
+        else:
+            result = self._write(users_collection)
+        deferred_writes.add(self.history_updates, self.activity_updates, self.stats_updates, self.counter_increments)
+        return result
+
+    def _write(self, users, session=None, ordered=True):
+        result = {"users_matched": None, "history_written": None, "accesslog_ids": []}
+
+        if self.user_updates:
+            operations = [
+                UpdateOne({"_id": user_id, **self.user_guards.get(user_id, {})}, update)
+                for user_id, update in self.user_updates.items()
+            ]
+            bulk_result = users.bulk_write(operations, ordered=ordered, session=session)
+            if bulk_result.acknowledged:
+                result["users_matched"] = bulk_result.matched_count
+
+        if self.accesslog_entries:
+            insert_result = accesslog_collection.insert_many(self.accesslog_entries, ordered=ordered, session=session)
+            result["accesslog_ids"] = insert_result.inserted_ids
+
+        return result
+
+    def _write_all(self, session):
+        result = self._write(users_collection, session=session)
+        result["history_written"] = write_derived(
+            self.history_updates, self.activity_updates, self.stats_updates, self.counter_increments, session=session
+        )
+        return result
+
+
+def write_derived(history_updates, activity_updates, stats_updates, counter_increments, session=None):
+    """One write per collection; returns the number of history buckets written."""
+    history_written = 0
+    if history_updates:
+        # Bucket upserts for one user depend on each other's counts, so they stay ordered.
+        bulk_result = access_history_collection.bulk_write(history_updates, ordered=True, session=session)
+        history_written = bulk_result.modified_count + bulk_result.upserted_count
+
+    if activity_updates:
+        activity_profiles_collection.bulk_write(activity_updates, ordered=False, session=session)
+
+    stats_operations = list(stats_updates)
+    if counter_increments:
+        stats_operations.append(counter_update(counter_increments))
+    if stats_operations:
+        stats_collection.bulk_write(stats_operations, ordered=False, session=session)
+
+    return history_written
+
+
+class DeferredWrites:
+    """Derived tap writes buffered per process and flushed in the background.
+
+    Counter increments from every buffered tap are summed into one $inc; the
+    rest is flushed as one bulk_write per collection. A flush starts every
+    WRITES["flush_interval_seconds"], or as soon as WRITES["flush_max_ops"]
+    operations are waiting.
+    """
+
+    def __init__(self):
+        self.history = []
+        self.activity = []
+        self.stats = []
+        self.counters = {}
+        self.pending = 0
+        self._reset()
+
+    def _reset(self):
+        # Also run in a forked child: the parent's buffer, lock and thread are not the child's.
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._take()
+
+    def _take(self):
+        buffered = (self.history, self.activity, self.stats, self.counters)
+        self.history = []
+        self.activity = []
+        self.stats = []
+        self.counters = {}
+        self.pending = 0
+        return buffered
+
+    def add(self, history_updates, activity_updates, stats_updates, counter_increments):
+        if not (history_updates or activity_updates or stats_updates or counter_increments):
+            return
+        if WRITES["flush_interval_seconds"] <= 0:
+            write_derived(history_updates, activity_updates, stats_updates, counter_increments)
+            return
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            self.history.extend(history_updates)
+            self.activity.extend(activity_updates)
+            self.stats.extend(stats_updates)
+            for counter, amount in counter_increments.items():
+                self.counters[counter] = self.counters.get(counter, 0) + amount
+            self.pending += len(history_updates) + len(activity_updates) + len(stats_updates)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="deferred-writes", daemon=True)
+                self._thread.start()
+            if self.pending >= WRITES["flush_max_ops"]:
+                self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(WRITES["flush_interval_seconds"])
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            history, activity, stats, counters = self._take()
+        try:
+            write_derived(history, activity, stats, counters)
+        except Exception as e:
+            # Nothing is retried: a partly applied bulk would double its $inc on a second try.
+            print(f"Error flushing deferred tap writes: {e}")
+            traceback.print_exc()
+
+
+deferred_writes = DeferredWrites()
+# Management commands and a graceful worker shutdown write out what is still buffered.
+atexit.register(deferred_writes.flush)
@@ -8,56 +8,84 @@ from datetime import datetime
 import json
 import traceback
 from bson import ObjectId
+from blockchain.modules.access import verify_anchored_event
+from ...helper.pagination import keyset_page, encode_cursor, clamp_per_page
+from ...helper.export import ACCESSLOG_CSV_COLUMNS, ndjson_lines, csv_lines, chunked, gzipped
+from ...middleware.sessioncontroller import verify_session
+from config.config import EXPORT
+from django.http import StreamingHttpResponse
+
+# The anchoring outbox state of in-flight documents is internal to the anchor worker.
+ACCESSLOG_PROJECTION = {"outbox": 0}
+
+def access_log_filters(params):
+    filters = {}
+    
+    access_status = params.get('status', None)
+    if access_status:
+        filters['access_status'] = access_status
+        
+    user_id = params.get('user_id', None)
+    if user_id:
+        filters['user_id'] = user_id
+        
+    start_date = params.get('start_date', None)
+    end_date = params.get('end_date', None)
+    
+    if start_date or end_date:
+        date_filter = {}
+        if start_date:
+            date_filter['$gte'] = start_date
+        if end_date:
+            date_filter['$lte'] = end_date
+            
+        if date_filter:
+            filters['access_time.date'] = date_filter
+    return filters
+
 
 class AccessLogsView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
         try:
             page = int(request.query_params.get('page', 1))
-            per_page = int(request.query_params.get('per_page', 5))
+            per_page = clamp_per_page(int(request.query_params.get('per_page', 5)))
+            cursor = request.query_params.get('cursor', None)
+            if page < 1:
+                raise ValueError("page must be positive")
             
             skip = (page - 1) * per_page
             
-            filters = {}
+            filters = access_log_filters(request.query_params)
             
-            access_status = request.query_params.get('status', None)
-            if access_status:
-                filters['access_status'] = access_status
-                
-            user_id = request.query_params.get('user_id', None)
-            if user_id:
-                filters['user_id'] = user_id
-                
-            start_date = request.query_params.get('start_date', None)
-            end_date = request.query_params.get('end_date', None)
-            
-            if start_date or end_date:
-                date_filter = {}
-                if start_date:
-                    date_filter['$gte'] = start_date
-                if end_date:
-                    date_filter['$lte'] = end_date
-                    
-                if date_filter:
-                    filters['access_time.date'] = date_filter
+            if cursor is not None:
+                # Keyset mode: pass cursor= (empty) for the first page, then next_cursor.
+                logs, next_cursor = keyset_page(accesslog_collection, filters, 'timestamp', -1, per_page, cursor or None,
+                                              ACCESSLOG_PROJECTION)
+                pagination = {
+                    'mode': 'cursor',
+                    'per_page': per_page,
+                    'next_cursor': next_cursor,
+                    'has_next': next_cursor is not None
+                }
+                if request.query_params.get('include_total', 'false').lower() == 'true':
+                    pagination['total_logs'] = accesslog_collection.count_documents(filters)
+                return Response({
+                    'logs': [self.serialize_log(log) for log in logs],
+                    'pagination': pagination
+                }, status=status.HTTP_200_OK)
             
             total_logs = accesslog_collection.count_documents(filters)
             
             logs_cursor = accesslog_collection.find(
-                filters
+                filters, ACCESSLOG_PROJECTION
             ).sort(
-                'timestamp', -1 
+                [('timestamp', -1), ('_id', -1)]
             ).skip(skip).limit(per_page)
             
-            logs_list = []
-            for log in logs_cursor:
-                if '_id' in log:
-                    log['_id'] = str(log['_id'])
-                    
-                if 'timestamp' in log and isinstance(log['timestamp'], datetime):
-                    log['timestamp'] = log['timestamp'].isoformat()
-                    
-                logs_list.append(log)
+            logs = list(logs_cursor)
+            next_cursor = encode_cursor('timestamp', -1, logs[-1]) if len(logs) == per_page else None
+            logs_list = [self.serialize_log(log) for log in logs]
             
             total_pages = (total_logs + per_page - 1) // per_page if total_logs > 0 else 1
             
@@ -69,7 +97,8 @@ class AccessLogsView(APIView):
                     'current_page': page,
                     'per_page': per_page,
                     'has_next': page < total_pages,
-                    'has_prev': page > 1
+                    'has_prev': page > 1,
+                    'next_cursor': next_cursor if page < total_pages else None
                 }
             }
             
@@ -85,4 +114,81 @@ class AccessLogsView(APIView):
             return Response(
                 {'error': 'Failed to retrieve access logs', 'details': str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+    def serialize_log(self, log):
+        log['_id'] = str(log['_id'])
+        if isinstance(log.get('timestamp'), datetime):
+            log['timestamp'] = log['timestamp'].isoformat()
+        return log
+
+
+class AccessLogExportView(APIView):
+    permission_classes = [AllowAny]
+    def get(self, request):
+        if not verify_session(request):
+            return Response({"error": "User is not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
+        # Not "format": DRF reserves that query parameter for renderer selection.
+        export_format = request.query_params.get('output', 'ndjson').lower()
+        compress = request.query_params.get('gzip', 'false').lower() == 'true'
+        if export_format not in ('ndjson', 'csv'):
+            return Response({'error': "output must be 'ndjson' or 'csv'"}, status=status.HTTP_400_BAD_REQUEST)
+        order = -1 if request.query_params.get('order', 'desc') == 'desc' else 1
+
+        filters = access_log_filters(request.query_params)
+        # One server-side cursor, fetched EXPORT["batch_size"] documents per round trip;
+        # nothing is counted or skipped.
+        cursor = accesslog_collection.find(filters, ACCESSLOG_PROJECTION).sort(
+            [('timestamp', order), ('_id', order)]
+        ).batch_size(EXPORT["batch_size"])
+
+        if export_format == 'csv':
+            lines = csv_lines(cursor, ACCESSLOG_CSV_COLUMNS)
+            content_type = 'text/csv'
+        else:
+            lines = ndjson_lines(cursor)
+            content_type = 'application/x-ndjson'
+        body = chunked(lines, EXPORT["chunk_bytes"])
+        filename = f"accesslog-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+        if compress:
+            body = gzipped(body, EXPORT["gzip_level"])
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(self.closing(body, cursor), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def closing(self, body, cursor):
+        try:
+            yield from body
+        except Exception as e:
+            # Headers are already sent; all that is left is to stop the stream and log.
+            print(f"Access log export failed: {e}")
+            traceback.print_exc()
+        finally:
+            cursor.close()
+
+
+class AccessLogVerifyView(APIView):
+    permission_classes = [AllowAny]
+    def get(self, request, log_id):
+        if not verify_session(request):
+            return Response({"error": "User is not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
+        if not ObjectId.is_valid(log_id):
+            return Response({'error': 'Invalid log id'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            log = accesslog_collection.find_one({"_id": ObjectId(log_id)}, {"blockchain_data": 1})
+            if not log:
+                return Response({'error': 'Access log not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            result = verify_anchored_event(log.get("blockchain_data", {}))
+            result["log_id"] = log_id
+            return Response(result, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            traceback.print_exc()
+            return Response(
+                {'error': 'Failed to verify access log', 'details': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
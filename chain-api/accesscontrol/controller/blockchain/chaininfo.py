@@ -9,6 +9,13 @@ import traceback
 from bson import ObjectId
 from web3 import Web3
 from ...middleware.sessioncontroller import verify_session
+from blockchain.modules.connection import blockchain_connection
+from blockchain.modules.blocks import blocks_mined_on_day
+from blockchain.modules.chainreader import chain_reader
+from blockchain.modules.provider import shared_web3, node_health, rpc_metrics
+from blockchain.modules.indexer import indexer_stats
+from ...connections.mongodb.dbconnect import chain_transactions_collection
+from ...helper.pagination import keyset_page, encode_cursor, clamp_per_page
 
 class ChainInfoView(APIView):
     permission_classes = [AllowAny]
@@ -16,37 +23,33 @@ class ChainInfoView(APIView):
         if not verify_session(request):
             return Response({"error": "User is not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
         try:
-            start_time = datetime.now()
-            web3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545", request_kwargs={'timeout': 5}))
-            
-            if not web3.is_connected():
+            web3 = shared_web3()
+            connected, _ = node_health()
+            if not connected:
                 return Response({
                     "status": "error",
                     "message": "Failed to connect to the blockchain node"
                 }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
-            latency = (datetime.now() - start_time).total_seconds() * 1000  # in milliseconds
-            
             chain_id = web3.eth.chain_id
             today = datetime.now().date()
+            start_time = datetime.now()
             latest_block = web3.eth.block_number
+            latency = (datetime.now() - start_time).total_seconds() * 1000  # in milliseconds
 
-            today_block_count = 0
-
-            for i in range(0, latest_block + 1):
-                block = web3.eth.get_block(i)
-                block_time = datetime.fromtimestamp(block.timestamp).date()
-                if block_time == today:
-                    today_block_count += 1
+            today_block_count = blocks_mined_on_day(chain_reader, latest_block, today, chain_key=chain_id)
 
             print(f"Blocks mined today ({today}): {today_block_count}")
+            signer_pool = blockchain_connection.get_signer_pool()
             
             return Response({
                 "status": "healthy",
                 "latency_ms": round(latency, 2),
                 "chain_id": chain_id,
                 "latest_block": latest_block,
-                "blocks_mined_today": today_block_count
+                "blocks_mined_today": today_block_count,
+                "signer_lanes": signer_pool.stats() if signer_pool else None,
+                "rpc_metrics": rpc_metrics.snapshot()
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -65,68 +68,52 @@ class BlockchainTransactionsView(APIView):
             return Response({"error": "User is not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
         try:
             page = int(request.query_params.get('page', 1))
-            per_page = 5
-            
-            web3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545", request_kwargs={'timeout': 5}))
-            
-            if not web3.is_connected():
-                return Response({
-                    "status": "error",
-                    "message": "Failed to connect to the blockchain node"
-                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-            
-            latest_block = web3.eth.block_number
-            
-            total_transactions = 0
-            all_transactions = []
-            
-            for i in range(latest_block, max(0, latest_block - 50), -1):  # Check last 50 blocks max
-                try:
-                    block = web3.eth.get_block(i, full_transactions=True)
-                    for tx in block.transactions:
-                        tx_data = {
-                            "hash": tx.hash.hex(),
-                            "from": tx["from"],
-                            "to": tx.to,
-                            "value": float(web3.from_wei(tx.value, 'ether')),
-                            "block": tx.blockNumber,
-                            "timestamp": datetime.fromtimestamp(block.timestamp).isoformat(),
-                            "gas_used": tx.gas,
-                            "gas_price": str(tx.gasPrice)
-                        }
-                        all_transactions.append(tx_data)
-                        total_transactions += 1
-                        
-                        if total_transactions >= 100:
-                            break
-                    
-                    if total_transactions >= 100:
-                        break
-                        
-                except Exception as block_error:
-                    print(f"Error reading block {i}: {block_error}")
-                    continue
-            
-            total_pages = (total_transactions + per_page - 1) // per_page
-            start_index = (page - 1) * per_page
-            end_index = start_index + per_page
-            
-            page_transactions = all_transactions[start_index:end_index]
-            
-            pagination = {
-                "total_transactions": total_transactions,
-                "total_pages": total_pages,
-                "current_page": page,
-                "per_page": per_page,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
-            }
-            
+            per_page = clamp_per_page(int(request.query_params.get('per_page', 5)))
+            cursor = request.query_params.get('cursor', None)
+            if page < 1:
+                raise ValueError("page must be positive")
+
+            filters = self.build_filters(request.query_params)
+
+            # Served from the chain indexer's copy; the node is not queried here.
+            if cursor is not None:
+                transactions, next_cursor = keyset_page(
+                    chain_transactions_collection, filters, 'block', -1, per_page, cursor or None
+                )
+                pagination = {
+                    "mode": "cursor",
+                    "per_page": per_page,
+                    "next_cursor": next_cursor,
+                    "has_next": next_cursor is not None
+                }
+                if request.query_params.get('include_total', 'false').lower() == 'true':
+                    pagination["total_transactions"] = chain_transactions_collection.count_documents(filters)
+            else:
+                total_transactions = chain_transactions_collection.count_documents(filters)
+                transactions = list(
+                    chain_transactions_collection.find(filters)
+                    .sort([('block', -1), ('_id', -1)])
+                    .skip((page - 1) * per_page)
+                    .limit(per_page)
+                )
+                total_pages = (total_transactions + per_page - 1) // per_page
+                next_cursor = encode_cursor('block', -1, transactions[-1]) if len(transactions) == per_page else None
+                pagination = {
+                    "total_transactions": total_transactions,
+                    "total_pages": total_pages,
+                    "current_page": page,
+                    "per_page": per_page,
+                    "has_next": page < total_pages,
+                    "has_prev": page > 1,
+                    "next_cursor": next_cursor if page < total_pages else None
+                }
+
             return Response({
                 "status": "success",
                 "message": "Blockchain transactions retrieved successfully",
-                "transactions": page_transactions,
-                "pagination": pagination
+                "transactions": [self.serialize_transaction(tx) for tx in transactions],
+                "pagination": pagination,
+                "indexer": indexer_stats()
             }, status=status.HTTP_200_OK)
             
         except ValueError as e:
@@ -143,4 +130,38 @@ class BlockchainTransactionsView(APIView):
                 "status": "error",
                 "message": "Error retrieving blockchain transactions",
                 "details": str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def build_filters(self, params):
+        filters = {}
+        for field in ('from', 'to'):
+            if params.get(field):
+                if not Web3.is_address(params[field]):
+                    raise ValueError(f"Invalid {field} address")
+                filters[field] = Web3.to_checksum_address(params[field])
+
+        tx_hash = params.get('hash')
+        if tx_hash:
+            tx_hash = tx_hash.lower()
+            filters['hash'] = tx_hash if tx_hash.startswith('0x') else '0x' + tx_hash
+
+        block_filter = {}
+        if params.get('block_from'):
+            block_filter['$gte'] = int(params['block_from'])
+        if params.get('block_to'):
+            block_filter['$lte'] = int(params['block_to'])
+        if block_filter:
+            filters['block'] = block_filter
+        return filters
+
+    def serialize_transaction(self, tx):
+        return {
+            "hash": tx["hash"],
+            "from": tx["from"],
+            "to": tx.get("to"),
+            "value": float(Web3.from_wei(int(tx["value_wei"]), 'ether')),
+            "block": tx["block"],
+            "timestamp": tx["timestamp"].isoformat() if isinstance(tx.get("timestamp"), datetime) else tx.get("timestamp"),
+            "gas_used": tx.get("gas"),
+            "gas_price": tx.get("gas_price")
+        }
@@ -10,36 +10,44 @@ import traceback
 from bson import ObjectId
 from datetime import datetime
 from blockchain.modules.connection import blockchain_connection
-from blockchain.modules.access import store_access_record
-from blockchain.modules.history import update_access_history
+from blockchain.modules.outbox import build_outbox_state
+from blockchain.modules.history import build_history_entry
+from ..connections.mongodb.writes import TapWriteBatch
+from ..helper.cache import authorization_cache
+from ..helper.decisions import access_matrix
+from ..helper.timing import stage_clock
+from .models.summaries import notify_user_changed
+from ..helper.tapresponse import (
+    resolve_profile, tap_response, PROFILE_FULL, DECISION_GRANTED, DECISION_UNKNOWN_CARD,
+    DECISION_LEVEL_NOT_ALLOWED, DECISION_DEVICE_INACTIVE, DECISION_DEVICE_NOT_FOUND, DECISION_BAD_REQUEST
+)
+from config.config import INGEST
+
+# The cached user is the whole profile, so the full response needs no second read.
+USER_TAP_PROJECTION = {"access_history": 0, "search_keys": 0}
+
 
 class pn532data(APIView):
     
     def post(self, request):
         
+        clock = stage_clock()
         data = request.data
         uid_hex = data.get('uidHex', '')
         uid_length = data.get('uidLength', 0)
         gateId = data.get('gateId', None)
+        profile = resolve_profile(request)
         
         if not uid_hex:
-            return Response({"error": "No UID data provided"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        standardized_uid = self.standardize_uid(uid_hex)
-        processed_uid = self.process_uid(standardized_uid, 4)
+            return self.reject(profile, DECISION_BAD_REQUEST, {"error": "No UID data provided"}, status.HTTP_400_BAD_REQUEST)
         
-        try:
-            clean_uid = processed_uid.replace(':', '')
-            decimal_value = int(clean_uid, 16)
-            decimal_str = str(decimal_value)
-            if len(decimal_str) < 10:
-                decimal_value = decimal_str.zfill(10) 
-            
-            user = self.find_user_by_nfc(f"{decimal_value}")
-        except ValueError:
-            print(f"Could not convert '{processed_uid}' to decimal")
-            decimal_value = None
-            user = None
+        standardized_uid, processed_uid, decimal_value = self.decode_uid(uid_hex)
+        clock.lap("decode")
+        if decimal_value is None:
+            # Nothing to look up or anchor: storing "None" on the chain would only burn retries.
+            return self.reject(profile, DECISION_BAD_REQUEST, {"error": "Could not decode UID"}, status.HTTP_400_BAD_REQUEST)
+        user = self.find_user_by_nfc(f"{decimal_value}")
+        clock.lap("user_lookup")
             
         response_data = {
             "message": "Data received successfully",
@@ -50,20 +58,22 @@ class pn532data(APIView):
             "decimal_value": decimal_value
         }
         if gateId == None:
-            return Response("No gateId provided", status=status.HTTP_400_BAD_REQUEST)
+            return self.reject(profile, DECISION_BAD_REQUEST, "No gateId provided", status.HTTP_400_BAD_REQUEST)
         
         if gateId:
-            device = devices_collection.find_one({"tag_id": gateId})
+            device = self.find_device_by_tag(gateId)
+            clock.lap("device_lookup")
+            profile = resolve_profile(request, device)
             print(f"Device found: {device}")
             device_status = device.get("status", "Unknown") if device else "Unknown"
             if device_status != "Active":
-                return Response({"error": "Device is not active"}, status=status.HTTP_403_FORBIDDEN)
+                decision = DECISION_DEVICE_INACTIVE if device else DECISION_DEVICE_NOT_FOUND
+                return self.reject(profile, decision, {"error": "Device is not active"}, status.HTTP_403_FORBIDDEN)
             if not device:
-                return Response({"error": "Device not found"}, status=status.HTTP_404_NOT_FOUND)
+                return self.reject(profile, DECISION_DEVICE_NOT_FOUND, {"error": "Device not found"}, status.HTTP_404_NOT_FOUND)
             GateName = device.get("name", "Unknown")
             location = device.get("location", "Unknown")    
         
-        device_access_levels = device.get("assigned_to", [])
         user_access_level = user.get("access_level", "Unknown") if user else "Unknown"
 
         
@@ -79,117 +89,172 @@ class pn532data(APIView):
                 
             }
         if user:
-            if user_access_level not in device_access_levels:
+            allowed = self.is_allowed(device, user_access_level)
+            clock.lap("decision")
+            if not allowed:
+                writes = TapWriteBatch()
+                writes.add_activity(user.get("_id"), gateId, GateName, timestamp, granted=False)
+                writes.commit()
+                notify_user_changed(user.get("_id"))
+                if profile != PROFILE_FULL:
+                    return tap_response(profile, DECISION_LEVEL_NOT_ALLOWED, user.get("name"), status.HTTP_403_FORBIDDEN)
                 return Response({"error": "User does not have access to this device"}, status=status.HTTP_403_FORBIDDEN)
             
             user_id = user.get("_id")
-            access_data["user_id"] = user_id
+            # access_data becomes the outbox payload and the Merkle event, so keep it JSON-safe.
+            access_data["user_id"] = str(user_id)
             print(f"User found with ID: {user_id}, type: {type(user_id)}")
+            writes = TapWriteBatch()
+            anchor_id = self.record_granted(writes, user, access_data, timestamp, gateId, GateName, location)
+            write_result = writes.commit()
+            clock.lap("write")
+            notify_user_changed(user_id)
+            if profile != PROFILE_FULL:
+                return tap_response(profile, DECISION_GRANTED, user.get("name", "Unknown"))
             response_data["user_found"] = True
-            response_data["user"] = user
+            response_data["user"] = self.full_user(user, timestamp, gateId, GateName)
             response_data["message"] = f"Access granted to {user.get('name', 'Unknown')}"
-            tx_hash = store_access_record(str(decimal_value), access_data)
-            print(tx_hash)
-            if tx_hash:
-                response_data["blockchain_tx"] = tx_hash
-                history_updated = update_access_history(user_id, access_data, tx_hash, gateId, GateName, location)
-                accesslog_entry = {
-                    "timestamp": timestamp,
-                    "gate_name": GateName,
-                    "location": location,
-                    "gateId": gateId,
-                    "access_time": {
-                        "date": timestamp.strftime("%Y-%m-%d"),
-                        "time": timestamp.strftime("%H:%M:%S"),
-                        "unix_time": int(timestamp.timestamp())
-                    },
-                    "nfc_id": access_data.get("nfc_id"),
-                    "card_data": {
-                        "hex_uid": access_data.get("device_info", {}).get("original_uid"),
-                        "processed_hex": access_data.get("device_info", {}).get("processed_uid")
-                    },
-                    "blockchain_data": {
-                        "tx_hash": tx_hash,
-                        "block_time": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                        "stored_value": access_data.get("nfc_id")
-                    },
-                    
-                    "access_method": "GateTag",
-                    "success": True,
-                    
-
-                }
-                accesslog_entry["name"] = user.get('name', 'Unknown')
-                accesslog_entry["email"] = user.get('email', 'Unknown')
-                accesslog_entry["position"] = user.get('position', 'Unknown')
-                accesslog_entry["access_level"] = user.get('access_level', 'Unknown')
-                accesslog_entry["access_status"] = "granted"
-                resultlog = accesslog_collection.insert_one(accesslog_entry)
-                user_update_status = users_collection.update_one(
-                    {"_id": ObjectId(user_id)},
-                    {"$set": {
-                        "last_access": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                        "last_gate_id": gateId,
-                        "last_gate_name": GateName
-                    }}
-                )
-                response_data["history_updated"] = history_updated
-                
-                print(f"Access record stored on blockchain with tx: {tx_hash}")
-            else:
-                response_data["blockchain_tx"] = None
-                response_data["blockchain_error"] = "Failed to store on blockchain"
-                print("Failed to store access record on blockchain")
+            history_written = write_result["history_written"]
+            response_data["history_updated"] = history_written > 0 if history_written is not None else None
+            self.set_anchor_response(response_data, anchor_id)
         else:
-            tx_hash = store_access_record(str(decimal_value), access_data)
-            
-            if tx_hash:
-                response_data["blockchain_tx"] = tx_hash
-                accesslog_entry = {
-                    "timestamp": timestamp,
-                    "access_time": {
-                        "date": timestamp.strftime("%Y-%m-%d"),
-                        "time": timestamp.strftime("%H:%M:%S"),
-                        "unix_time": int(timestamp.timestamp())
-                    },
-                    "nfc_id": access_data.get("nfc_id"),
-                    "card_data": {
-                        "hex_uid": access_data.get("device_info", {}).get("original_uid"),
-                        "processed_hex": access_data.get("device_info", {}).get("processed_uid")
-                    },
-                    "blockchain_data": {
-                        "tx_hash": tx_hash,
-                        "block_time": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                        "stored_value": access_data.get("nfc_id")
-                    },
-                    
-                    "access_method": "GateTag",
-                    "success": True
-                }
-                accesslog_entry["name"] = "unauthorized"
-                accesslog_entry["email"] = "Unknown"
-                accesslog_entry["position"] = "Unknown"
-                accesslog_entry["access_level"] = "Unknown"
-                accesslog_entry["access_status"] = "denied"
-                accesslog_entry["gate_name"] = GateName if GateName else "Unknown"
-                accesslog_entry["location"] = location if location else "Unknown"
-                accesslog_entry["gateId"] = gateId if gateId else "Unknown"
-                resultlog = accesslog_collection.insert_one(accesslog_entry)
-                print(f"Access record stored on blockchain with tx: {tx_hash}")
-            else:
-                response_data["blockchain_tx"] = None
-                response_data["blockchain_error"] = "Failed to store on blockchain"
-                print("Failed to store access record on blockchain")
+            writes = TapWriteBatch()
+            anchor_id = self.record_denied(writes, access_data, timestamp, gateId, GateName, location)
+            writes.commit()
+            clock.lap("write")
+            if profile != PROFILE_FULL:
+                return tap_response(profile, DECISION_UNKNOWN_CARD)
+            self.set_anchor_response(response_data, anchor_id)
             response_data["user_found"] = False
             response_data["message"] = "No user found with this NFC ID"
         
         return Response(response_data, status=status.HTTP_200_OK)
+
+    def reject(self, profile, decision, body, http_status):
+        if profile == PROFILE_FULL:
+            return Response(body, status=http_status)
+        return tap_response(profile, decision, http_status=http_status)
     
+    def decode_uid(self, uid_hex):
+        standardized_uid = self.standardize_uid(uid_hex)
+        processed_uid = self.process_uid(standardized_uid, 4)
+        
+        try:
+            clean_uid = processed_uid.replace(':', '')
+            decimal_value = int(clean_uid, 16)
+            decimal_str = str(decimal_value)
+            if len(decimal_str) < 10:
+                decimal_value = decimal_str.zfill(10) 
+        except ValueError:
+            print(f"Could not convert '{processed_uid}' to decimal")
+            decimal_value = None
+        return standardized_uid, processed_uid, decimal_value
+
+    def record_granted(self, writes, user, access_data, timestamp, gateId, GateName, location, last_access_guard=False, extra_fields=None):
+        user_id = user.get("_id")
+        anchor_id = ObjectId()
+        writes.push_history(user_id, build_history_entry(
+            access_data, None, gateId, GateName, location, anchor_id=str(anchor_id), timestamp=timestamp
+        ))
+        last_access = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        writes.add_activity(user_id, gateId, GateName, timestamp)
+        writes.set_user_fields(user_id, {
+            "last_access": last_access,
+            "last_gate_id": gateId,
+            "last_gate_name": GateName
+        }, guard={"$or": [{"last_access": {"$lt": last_access}}, {"last_access": None}]} if last_access_guard else None)
+        accesslog_entry = self.build_accesslog_entry(timestamp, access_data, anchor_id)
+        accesslog_entry["gate_name"] = GateName
+        accesslog_entry["location"] = location
+        accesslog_entry["gateId"] = gateId
+        accesslog_entry["name"] = user.get('name', 'Unknown')
+        accesslog_entry["email"] = user.get('email', 'Unknown')
+        accesslog_entry["position"] = user.get('position', 'Unknown')
+        accesslog_entry["access_level"] = user.get('access_level', 'Unknown')
+        accesslog_entry["access_status"] = "granted"
+        accesslog_entry.update(extra_fields or {})
+        accesslog_entry["outbox"] = build_outbox_state(access_data, user_id)
+        writes.add_accesslog(accesslog_entry)
+        writes.increment("granted")
+        writes.add_visitor(access_data["nfc_id"], accesslog_entry["access_time"]["date"], gateId)
+        return anchor_id
+
+    def record_denied(self, writes, access_data, timestamp, gateId, GateName, location, extra_fields=None):
+        anchor_id = ObjectId()
+        accesslog_entry = self.build_accesslog_entry(timestamp, access_data, anchor_id)
+        accesslog_entry["name"] = "unauthorized"
+        accesslog_entry["email"] = "Unknown"
+        accesslog_entry["position"] = "Unknown"
+        accesslog_entry["access_level"] = "Unknown"
+        accesslog_entry["access_status"] = "denied"
+        accesslog_entry["gate_name"] = GateName if GateName else "Unknown"
+        accesslog_entry["location"] = location if location else "Unknown"
+        accesslog_entry["gateId"] = gateId if gateId else "Unknown"
+        accesslog_entry.update(extra_fields or {})
+        accesslog_entry["outbox"] = build_outbox_state(access_data)
+        writes.add_accesslog(accesslog_entry)
+        writes.increment("denied")
+        writes.add_visitor(access_data["nfc_id"], accesslog_entry["access_time"]["date"], gateId)
+        return anchor_id
+
+    def build_accesslog_entry(self, timestamp, access_data, anchor_id):
+        # The anchor id doubles as the document id; the outbox state rides on the same document.
+        return {
+            "_id": anchor_id,
+            "timestamp": timestamp,
+            "access_time": {
+                "date": timestamp.strftime("%Y-%m-%d"),
+                "time": timestamp.strftime("%H:%M:%S"),
+                "unix_time": int(timestamp.timestamp())
+            },
+            "nfc_id": access_data.get("nfc_id"),
+            "card_data": {
+                "hex_uid": access_data.get("device_info", {}).get("original_uid"),
+                "processed_hex": access_data.get("device_info", {}).get("processed_uid")
+            },
+            "blockchain_data": {
+                "tx_hash": None,
+                "anchor_id": str(anchor_id),
+                "anchor_status": "pending",
+                "block_time": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "stored_value": access_data.get("nfc_id")
+            },
+            "access_method": "GateTag",
+            "success": True
+        }
+
+    def set_anchor_response(self, response_data, anchor_id):
+        response_data["blockchain_tx"] = None
+        response_data["anchor_id"] = str(anchor_id)
+        response_data["anchor_status"] = "queued"
+        print(f"Access record queued for blockchain anchoring: {anchor_id}")
+
+    def is_allowed(self, device, access_level):
+        return access_matrix.device_allows(device, access_level)
+
     def find_user_by_nfc(self, nfc_id):
-        user = users_collection.find_one({"nfc_id": nfc_id})
-        if user:
-            return json.loads(json.dumps(user, default=str))
-        return None
+        return authorization_cache.get_or_load("user", nfc_id, self.load_user_by_nfc)
+
+    def find_users_by_nfc(self, nfc_ids):
+        return authorization_cache.get_many("user", nfc_ids, self.load_users_by_nfc)
+
+    def load_users_by_nfc(self, nfc_ids):
+        users = users_collection.find({"nfc_id": {"$in": list(nfc_ids)}}, USER_TAP_PROJECTION)
+        return {user["nfc_id"]: user for user in users}
+
+    def load_user_by_nfc(self, nfc_id):
+        return users_collection.find_one({"nfc_id": nfc_id}, USER_TAP_PROJECTION)
+
+    def full_user(self, user, timestamp, gateId, GateName):
+        # The cached document, with the fields this tap just wrote.
+        document = dict(user, last_access=timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                        last_gate_id=gateId, last_gate_name=GateName)
+        return json.loads(json.dumps(document, default=str))
+
+    def find_device_by_tag(self, tag_id):
+        return authorization_cache.get_or_load(
+            "device", tag_id, lambda key: devices_collection.find_one({"tag_id": key})
+        )
     
     def standardize_uid(self, uid_hex):
         if ':' in uid_hex:
@@ -213,3 +278,122 @@ class pn532data(APIView):
                 return bytes_to_process[::-1]
             else:
                 return uid_hex[::-1]
+
+
+class pn532batch(pn532data):
+
+    def post(self, request):
+        data = request.data
+        gateId = data.get('gateId', None)
+        taps = data.get('taps', [])
+
+        if not gateId:
+            return Response({"error": "No gateId provided"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(taps, list) or not taps:
+            return Response({"error": "No taps provided"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(taps) > INGEST["max_batch_taps"]:
+            return Response(
+                {"error": f"Too many taps in one batch (max {INGEST['max_batch_taps']})"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        device = self.find_device_by_tag(gateId)
+        if not device:
+            return Response({"error": "Device not found"}, status=status.HTTP_404_NOT_FOUND)
+        if device.get("status", "Unknown") != "Active":
+            return Response({"error": "Device is not active"}, status=status.HTTP_403_FORBIDDEN)
+        GateName = device.get("name", "Unknown")
+        location = device.get("location", "Unknown")
+
+        results = [None] * len(taps)
+        decoded = []
+        for index, tap in enumerate(taps):
+            uid_hex = tap.get('uidHex', '') if isinstance(tap, dict) else ''
+            if not uid_hex:
+                results[index] = {"index": index, "status": "rejected", "error": "No UID data provided"}
+                continue
+            timestamp = self.parse_device_timestamp(tap.get('timestamp'))
+            if timestamp is None:
+                results[index] = {"index": index, "status": "rejected", "error": "Missing or invalid timestamp"}
+                continue
+            standardized_uid, processed_uid, decimal_value = self.decode_uid(uid_hex)
+            if decimal_value is None:
+                results[index] = {"index": index, "status": "rejected", "error": "Could not decode UID"}
+                continue
+            decoded.append((index, uid_hex, processed_uid, decimal_value, timestamp))
+
+        users = self.find_users_by_nfc([f"{decimal_value}" for _, _, _, decimal_value, _ in decoded])
+
+        # Oldest first, so the newest tap of a user is the one that ends up in last_access.
+        decoded.sort(key=lambda item: item[4])
+        writes = TapWriteBatch()
+        batch_fields = {"ingested_at": datetime.now(), "ingest_mode": "batch"}
+        for index, uid_hex, processed_uid, decimal_value, timestamp in decoded:
+            user = users.get(f"{decimal_value}")
+            access_data = {
+                "nfc_id": str(decimal_value),
+                "timestamp": timestamp.isoformat(),
+                "device_info": {
+                    "original_uid": uid_hex,
+                    "processed_uid": processed_uid
+                },
+            }
+            result = {
+                "index": index,
+                "decimal_value": decimal_value,
+                "timestamp": timestamp.isoformat(),
+                "user_found": bool(user)
+            }
+            if user:
+                if not self.is_allowed(device, user.get("access_level", "Unknown")):
+                    writes.add_activity(user.get("_id"), gateId, GateName, timestamp, granted=False)
+                    result["status"] = "forbidden"
+                    result["error"] = "User does not have access to this device"
+                    results[index] = result
+                    continue
+                access_data["user_id"] = str(user.get("_id"))
+                anchor_id = self.record_granted(
+                    writes, user, access_data, timestamp, gateId, GateName, location,
+                    last_access_guard=True, extra_fields=batch_fields
+                )
+                result["status"] = "granted"
+                result["name"] = user.get("name", "Unknown")
+            else:
+                anchor_id = self.record_denied(
+                    writes, access_data, timestamp, gateId, GateName, location, extra_fields=batch_fields
+                )
+                result["status"] = "denied"
+            result["anchor_id"] = str(anchor_id)
+            results[index] = result
+
+        if writes.accesslog_entries or writes.activity_updates:
+            writes.commit()
+            for user_id in writes.user_updates:
+                notify_user_changed(user_id)
+
+        summary = {}
+        for result in results:
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+
+        print(f"Batch ingest from {gateId}: {summary}")
+        return Response({
+            "message": "Batch processed successfully",
+            "gateId": gateId,
+            "received": len(taps),
+            "summary": summary,
+            "results": results
+        }, status=status.HTTP_200_OK)
+
+    def parse_device_timestamp(self, value):
+        try:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                # Devices may report unix time in seconds or milliseconds.
+                return datetime.fromtimestamp(value / 1000 if value > 1e12 else value)
+            if isinstance(value, str) and value:
+                parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                if parsed.tzinfo is not None:
+                    parsed = parsed.astimezone().replace(tzinfo=None)
+                return parsed
+        except (ValueError, OverflowError, OSError):
+            pass
+        return None
@@ -9,6 +9,11 @@ import json
 import traceback
 from bson import ObjectId
 from ...middleware.sessioncontroller import verify_session
+from ...helper.cache import authorization_cache
+from ...helper.decisions import access_matrix
+from ...helper.tapresponse import PROFILES
+from ...connections.mongodb.counters import bump_counters
+from pymongo import ReturnDocument
 
 
 class DeviceManagementView(APIView):
@@ -51,6 +56,12 @@ class DeviceManagementView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
+            if data.get('response_profile') and data['response_profile'] not in PROFILES:
+                return Response(
+                    {"error": f"response_profile must be one of {', '.join(PROFILES)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             if devices_collection.find_one({"tag_id": data['tag_id']}):
                 return Response(
                     {"error": "Tag ID already exists"},
@@ -65,12 +76,16 @@ class DeviceManagementView(APIView):
                 "last_scanned": datetime.now(),
                 "total_scans": data.get('total_scans', 0),
                 "assigned_to": data.get('assigned_to', []),
+                "response_profile": data.get('response_profile'),
                 "last_restart": datetime.now(),
                 "created_at": datetime.now(),
                 "updated_at": datetime.now()
             }
             
             result = devices_collection.insert_one(new_device)
+            authorization_cache.invalidate("device")
+            bump_counters(total_devices=1, active_devices=1 if new_device["status"] == "Active" else 0)
+            access_matrix.set_device(new_device)
             new_device['_id'] = str(result.inserted_id)
             
             return Response({
@@ -101,12 +116,18 @@ class DeviceManagementView(APIView):
             data = request.data
             
             update_fields = {}
-            allowed_fields = ['name', 'location', 'status', 'battery', 'assigned_to', 'total_scans']
+            allowed_fields = ['name', 'location', 'status', 'battery', 'assigned_to', 'total_scans', 'response_profile']
             
             for field in allowed_fields:
                 if field in data:
                     update_fields[field] = data[field]
             
+            if update_fields.get('response_profile') and update_fields['response_profile'] not in PROFILES:
+                return Response(
+                    {"error": f"response_profile must be one of {', '.join(PROFILES)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             if not update_fields:
                 return Response(
                     {"error": "No fields to update"},
@@ -115,18 +136,24 @@ class DeviceManagementView(APIView):
             
             update_fields['updated_at'] = datetime.now()
             
-            result = devices_collection.update_one(
+            previous = devices_collection.find_one_and_update(
                 {'_id': ObjectId(device_id)},
-                {'$set': update_fields}
+                {'$set': update_fields},
+                projection={'status': 1},
+                return_document=ReturnDocument.BEFORE
             )
+            authorization_cache.invalidate("device")
             
-            if result.matched_count == 0:
+            if previous is None:
                 return Response(
                     {"error": "Device not found"},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            if 'status' in update_fields:
+                bump_counters(active_devices=int(update_fields['status'] == "Active") - int(previous.get('status') == "Active"))
             
             updated_device = devices_collection.find_one({'_id': ObjectId(device_id)})
+            access_matrix.set_device(updated_device)
             updated_device['_id'] = str(updated_device['_id'])
             
             return Response({
@@ -155,13 +182,16 @@ class DeviceManagementView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            result = devices_collection.delete_one({'_id': ObjectId(device_id)})
+            deleted = devices_collection.find_one_and_delete({'_id': ObjectId(device_id)}, projection={'status': 1})
+            authorization_cache.invalidate("device")
+            access_matrix.remove_device(device_id)
             
-            if result.deleted_count == 0:
+            if deleted is None:
                 return Response(
                     {"error": "Device not found"},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            bump_counters(total_devices=-1, active_devices=-1 if deleted.get('status') == "Active" else 0)
             
             return Response(
                 {"message": "Device deleted successfully"},
@@ -8,10 +8,13 @@ from datetime import datetime
 import json
 import traceback
 from bson import ObjectId
-from web3 import Web3
+from blockchain.modules.provider import node_health
 from ...authentication.auth_utils import require_admin_auth, validate_admin_token
 from django.contrib.sessions.models import Session
 from ...middleware.sessioncontroller import verify_session
+from ...helper.cache import authorization_cache
+from ...connections.mongodb.counters import read_counters
+from ...connections.mongodb.visitors import unique_visitors, exact_unique_visitors, SketchPrecisionError
 
 class OverviewView(APIView):
     permission_classes = [AllowAny]
@@ -21,14 +24,18 @@ class OverviewView(APIView):
         
         try:
             start_time = datetime.now()            
-            total_devices = devices_collection.count_documents({})
-            active_devices = devices_collection.count_documents({"status": "Active"})
-            unique_nfc_ids = accesslog_collection.distinct("nfc_id")
-            total_visitors_count = len(unique_nfc_ids)
-            successful_verifications = accesslog_collection.count_documents({"access_status": "granted"})
-            denied_verifications = accesslog_collection.count_documents({"access_status": "denied"})
-            total_users = users_collection.count_documents({})
-            active_users = users_collection.count_documents({"active": True})
+            counters = read_counters()
+            total_devices = counters["total_devices"]
+            active_devices = counters["active_devices"]
+            try:
+                total_visitors_count = unique_visitors()["count"]
+            except SketchPrecisionError as e:
+                print(f"Error estimating unique visitors: {e}")
+                total_visitors_count = exact_unique_visitors()
+            successful_verifications = counters["granted"]
+            denied_verifications = counters["denied"]
+            total_users = counters["total_users"]
+            active_users = counters["active_users"]
             
             total_verifications = successful_verifications + denied_verifications
             success_rate = round((successful_verifications / total_verifications * 100), 2) if total_verifications > 0 else 0.0
@@ -36,11 +43,8 @@ class OverviewView(APIView):
             blockchain_connected = False
             blockchain_latency = None
             try:
-                blockchain_start = datetime.now()
-                web3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545", request_kwargs={'timeout': 3}))
-                blockchain_connected = web3.is_connected()
-                if blockchain_connected:
-                    blockchain_latency = round((datetime.now() - blockchain_start).total_seconds() * 1000, 2)
+                # Cached probe on the shared provider; see BLOCKCHAIN_HEALTH_TTL_SECONDS.
+                blockchain_connected, blockchain_latency = node_health()
             except Exception as blockchain_error:
                 print(f"Blockchain connection check failed: {blockchain_error}")
                 blockchain_connected = False
@@ -69,7 +73,8 @@ class OverviewView(APIView):
                 "denied_verifications": denied_verifications,
                 "total_verifications": total_verifications,
                 "verification_success_rate": success_rate,
-                "recent_access_logs": recent_logs
+                "recent_access_logs": recent_logs,
+                "authorization_cache": authorization_cache.stats()
             }, status=status.HTTP_200_OK)
         
         except Exception as e:
@@ -78,4 +83,40 @@ class OverviewView(APIView):
             return Response(
                 {"error": "Failed to retrieve overview data", "details": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class VisitorsView(APIView):
+    permission_classes = [AllowAny]
+    def get(self, request):
+        if not verify_session(request):
+            return Response({"error": "user is not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            exact = request.query_params.get('exact', None)
+            result = unique_visitors(
+                start_date=request.query_params.get('start_date', None),
+                end_date=request.query_params.get('end_date', None),
+                gate_id=request.query_params.get('gateId', None),
+                exact=None if exact is None else exact.lower() == 'true'
+            )
+            return Response({"unique_visitors": result["count"], **result}, status=status.HTTP_200_OK)
+
+        except SketchPrecisionError as e:
+            print(f"Error estimating unique visitors: {e}")
+            return Response(
+                {"error": "Visitor sketches do not match the configured precision", "details": str(e)},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ValueError as e:
+            return Response(
+                {"error": "Dates must be formatted as YYYY-MM-DD", "details": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            print(f"Error estimating unique visitors: {e}")
+            traceback.print_exc()
+            return Response(
+                {"error": "Failed to estimate unique visitors", "details": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -1,5 +1,5 @@
 import json
-import requests
+from .llm import llm_client
 
 
 user_data = {
@@ -32,30 +32,28 @@ user_data = {
 
 # # Ask any question here
 # question = "When was the last access?"
-def summarize(question, user_data):
-    prompt = f"""You are an access control assistant. Answer ONLY the question asked. Do not provide code, examples, or solutions.
+GENERATION_OPTIONS = {
+    "temperature": 0.1,
+    "top_p": 0.1,
+    "stop": ["\n", "```", "python", "Solution:", "#", "def ", "import "]
+}
+
+def build_prompt(question, user_data):
+    return f"""You are an access control assistant. Answer ONLY the question asked. Do not provide code, examples, or solutions.
 
 FORBIDDEN: Do not write any code, python, solutions, or examples.
 REQUIRED: Answer with a single sentence only.
 
 User Data:
-{json.dumps(user_data, indent=2)}
+{json.dumps(user_data, default=str)}
 
 Question: {question}
 
 Provide only a direct factual answer:"""
-    response = requests.post(
-        "http://localhost:11434/api/generate",
-        json={
-            "model": "phi",
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.1,
-                "top_p": 0.1,
-                "stop": ["\n", "```", "python", "Solution:", "#", "def ", "import "]
-            }
-        }
-    )
 
-    return response.json()["response"].strip()
+def summarize(question, user_data, timeout=None):
+    return llm_client().generate(build_prompt(question, user_data), GENERATION_OPTIONS, timeout).strip()
+
+def summarize_stream(question, user_data, timeout=None):
+    """Yield the answer piece by piece as the model generates it."""
+    return llm_client().stream(build_prompt(question, user_data), GENERATION_OPTIONS, timeout)
@@ -0,0 +1,239 @@
+"""
+Client for the local Ollama model.
+
+Generation is slow and the model serves a few requests at a time, so calls
+go through one LlmClient per process:
+
+- a keep-alive requests.Session, so calls reuse connections;
+- a FIFO limiter allowing max_concurrency generations at once, with at most
+  max_queue callers waiting; a full queue fails fast (LlmBusy) and a caller
+  whose deadline passes while queued gets LlmTimeout;
+- /api/generate is always called in streaming mode, so stream() can relay
+  tokens as they arrive and generate() can enforce the deadline between
+  tokens instead of waiting on one long read.
+
+llm_metrics tracks queue depth, waits, time to first token and tokens per
+second. After a fork the session is rebuilt in the child.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from config.config import LLM
+
+
+class LlmError(Exception):
+    pass
+
+class LlmBusy(LlmError):
+    """The queue is full; retry later."""
+
+class LlmTimeout(LlmError):
+    """The deadline passed while queued or generating."""
+
+
+class LlmMetrics:
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queued = 0
+            self.active = 0
+            self.counts = {"completed": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+            self.tokens = 0
+            self.waits = deque(maxlen=self.window)
+            self.first_token = deque(maxlen=self.window)
+            self.rates = deque(maxlen=self.window)
+
+    def update(self, queued=0, active=0):
+        with self._lock:
+            self.queued += queued
+            self.active += active
+
+    def count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def record_wait(self, wait_ms):
+        with self._lock:
+            self.waits.append(wait_ms)
+
+    def record_generation(self, tokens, first_token_ms, tokens_per_second):
+        with self._lock:
+            self.counts["completed"] += 1
+            self.tokens += tokens
+            if first_token_ms is not None:
+                self.first_token.append(first_token_ms)
+            if tokens_per_second:
+                self.rates.append(tokens_per_second)
+
+    def snapshot(self):
+        def average(values):
+            return round(sum(values) / len(values), 2) if values else None
+
+        with self._lock:
+            return {
+                "queue_depth": self.queued,
+                "active": self.active,
+                **self.counts,
+                "tokens": self.tokens,
+                "avg_queue_wait_ms": average(self.waits),
+                "max_queue_wait_ms": round(max(self.waits), 2) if self.waits else None,
+                "avg_first_token_ms": average(self.first_token),
+                "tokens_per_second": average(self.rates)
+            }
+
+
+llm_metrics = LlmMetrics()
+
+
+class ConcurrencyLimiter:
+    """At most `limit` holders; waiters are served in arrival order."""
+
+    def __init__(self, limit, max_queue, metrics=None):
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.metrics = metrics or llm_metrics
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+
+    def acquire(self, deadline):
+        started = time.monotonic()
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self.metrics.update(active=1)
+                self.metrics.record_wait(0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.metrics.count("rejected")
+                raise LlmBusy(f"{len(self._waiters)} generations already queued")
+            turn = threading.Event()
+            self._waiters.append(turn)
+            self.metrics.update(queued=1)
+
+        granted = turn.wait(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            if not granted and not turn.is_set():
+                self._waiters.remove(turn)
+                self.metrics.update(queued=-1)
+                self.metrics.count("timeouts")
+                raise LlmTimeout("Timed out waiting for a free model slot")
+        self.metrics.record_wait((time.monotonic() - started) * 1000)
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # The slot passes straight to the oldest waiter; active stays the same.
+                self._waiters.popleft().set()
+                self.metrics.update(queued=-1)
+            else:
+                self._active -= 1
+                self.metrics.update(active=-1)
+
+
+class LlmClient:
+
+    def __init__(self, base_url=None, model=None, max_concurrency=None, max_queue=None, metrics=None):
+        self.base_url = (base_url or LLM["url"]).rstrip("/")
+        self.model = model or LLM["model"]
+        self.metrics = metrics or llm_metrics
+        self.limiter = ConcurrencyLimiter(
+            max_concurrency or LLM["max_concurrency"],
+            LLM["max_queue"] if max_queue is None else max_queue,
+            self.metrics
+        )
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    def session(self):
+        with self._session_lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.limiter.limit)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    def stream(self, prompt, options=None, timeout=None):
+        """Yield response text pieces as the model generates them."""
+        deadline = time.monotonic() + (timeout or LLM["timeout_seconds"])
+        self.limiter.acquire(deadline)
+        try:
+            yield from self._generate(prompt, options, deadline)
+        finally:
+            self.limiter.release()
+
+    def generate(self, prompt, options=None, timeout=None):
+        return "".join(self.stream(prompt, options, timeout))
+
+    def _generate(self, prompt, options, deadline):
+        started = time.monotonic()
+        first_token_ms = None
+        tokens = 0
+        final = {}
+        try:
+            response = self.session().post(
+                f"{self.base_url}/api/generate",
+                json={"model": self.model, "prompt": prompt, "stream": True, "options": options or {}},
+                stream=True,
+                timeout=(LLM["connect_timeout_seconds"], max(0.1, deadline - time.monotonic()))
+            )
+            with response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if time.monotonic() > deadline:
+                        raise LlmTimeout("Generation exceeded its deadline")
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise LlmError(chunk["error"])
+                    if chunk.get("response"):
+                        if first_token_ms is None:
+                            first_token_ms = (time.monotonic() - started) * 1000
+                        tokens += 1
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        final = chunk
+                        break
+        except LlmTimeout:
+            self.metrics.count("timeouts")
+            raise
+        except requests.Timeout as e:
+            self.metrics.count("timeouts")
+            raise LlmTimeout(str(e))
+        except (requests.RequestException, ValueError, LlmError) as e:
+            self.metrics.count("errors")
+            raise e if isinstance(e, LlmError) else LlmError(str(e))
+
+        # Ollama reports the generation's own token count and duration (ns) in its final chunk.
+        tokens = final.get("eval_count") or tokens
+        if final.get("eval_duration"):
+            rate = tokens / (final["eval_duration"] / 1e9)
+        else:
+            elapsed = time.monotonic() - started - (first_token_ms or 0) / 1000
+            rate = tokens / elapsed if elapsed > 0 else None
+        self.metrics.record_generation(tokens, first_token_ms, round(rate, 2) if rate else None)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def llm_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LlmClient()
+        return _client
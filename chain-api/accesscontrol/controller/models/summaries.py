@@ -0,0 +1,296 @@
+"""
+Cached, asynchronous user summaries.
+
+A summary only changes when the user's profile does (an edit or a new tap),
+so it is cached in user_summaries under a content hash of the question and
+what the model sees: a few user fields plus the fixed-size activity profile
+(activity.py), never the raw history. Views never call the model: a cache hit
+is served as is, and a miss queues a pending entry (holding the profile
+snapshot to summarise) and returns a "pending" marker together with the
+last ready summary of that user, if any.
+
+A background worker claims pending entries and generates them. User edits
+and taps notify the worker, which re-queues the summaries that have been
+asked for before, so they are usually ready before anyone looks again. A
+user is refreshed at most once per refresh_debounce_seconds; the digest is
+coarse as well (activity.py), so a stream of taps costs few generations.
+Each user keeps one ready summary per question; older ones are dropped.
+"""
+import hashlib
+import json
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from config.config import SUMMARIES
+from blockchain.modules.history import get_access_history
+from ...connections.mongodb.dbconnect import users_collection, user_summaries_collection
+from ...connections.mongodb.activity import load_activity, activity_digest
+from .engine import summarize
+from .llm import LlmBusy
+
+STATUS_PENDING = "pending"
+STATUS_GENERATING = "generating"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+DEFAULT_QUESTION = "give me the user summary as a small paragraph"
+
+# User fields shown to the model next to the activity profile.
+PROMPT_FIELDS = ("name", "email", "nfc_id", "position", "access_level", "active", "created_at")
+
+
+def format_dates(document):
+    for field in ("created_at", "updated_at"):
+        if field in document and isinstance(document[field], datetime):
+            document[field] = document[field].strftime("%Y-%m-%d %H:%M:%S")
+    return document
+
+def recent_access_history(user_id, limit=5):
+    history = get_access_history(user_id, limit=limit) or []
+    valid_access_history = [
+        access for access in history
+        if isinstance(access, dict) and access.get("timestamp")
+    ]
+    for access in valid_access_history:
+        if isinstance(access["timestamp"], datetime):
+            access["timestamp"] = access["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+    return valid_access_history
+
+def load_user_profile(user_id, with_history=True):
+    """The user document as the summary views show it, optionally with its last 5 accesses and access count; None if missing."""
+    user = users_collection.find_one({"_id": ObjectId(user_id)}, {"_id": 0, "access_history": 0, "search_keys": 0})
+    if not user:
+        return None
+    format_dates(user)
+    if with_history:
+        user["access_history"] = recent_access_history(user_id)
+        # access_history is capped; the activity profile holds the real number of granted accesses.
+        user["access_count"] = load_activity(user_id).get("granted", 0)
+    return user
+
+def prompt_profile(user_id, user):
+    """What the model is shown about a user: a few fields and the activity digest, fixed in size."""
+    data = {field: user[field] for field in PROMPT_FIELDS if field in user}
+    data["activity"] = activity_digest(load_activity(user_id))
+    return json.loads(json.dumps(data, default=str))
+
+def content_hash(question, data):
+    payload = json.dumps({"q": question, "version": SUMMARIES["cache_version"], "data": data}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def summary_response(entry, previous=None):
+    if entry and entry["status"] == STATUS_READY:
+        return {"status": STATUS_READY, "summary": entry["summary"],
+                "generated_at": entry["generated_at"].strftime("%Y-%m-%d %H:%M:%S")}
+    # Claimed or not, a summary that is not ready yet is "pending" to the caller.
+    status = STATUS_FAILED if entry and entry["status"] == STATUS_FAILED else STATUS_PENDING
+    response = {"status": status, "summary": None}
+    if previous:
+        # Last summary of an older profile, until the new one is generated.
+        response["summary"] = previous["summary"]
+        response["stale"] = True
+        response["generated_at"] = previous["generated_at"].strftime("%Y-%m-%d %H:%M:%S")
+    return response
+
+def enqueue_summary(user_id, question, data, digest=None):
+    digest = digest or content_hash(question, data)
+    now = datetime.now()
+    try:
+        entry = user_summaries_collection.find_one_and_update(
+            {"_id": digest},
+            {"$setOnInsert": {"user_id": str(user_id), "question": question, "input": data, "status": STATUS_PENDING,
+                              "summary": None, "attempts": 0, "requested_at": now, "updated_at": now}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Two requests raced to insert the same hash; the other one won.
+        entry = user_summaries_collection.find_one({"_id": digest})
+    # Pending summaries of older profiles would only be thrown away once generated.
+    user_summaries_collection.delete_many(
+        {"user_id": str(user_id), "question": question, "status": STATUS_PENDING, "_id": {"$ne": digest}}
+    )
+    summary_worker_wake()
+    return entry
+
+def cached_summary(user_id, profile, question=DEFAULT_QUESTION):
+    """The cached summary for this profile, or a pending marker (queuing it) while it is generated."""
+    data = prompt_profile(user_id, profile)
+    digest = content_hash(question, data)
+    entry = user_summaries_collection.find_one({"_id": digest})
+    if entry and entry["status"] == STATUS_READY:
+        return summary_response(entry)
+    if entry is None:
+        entry = enqueue_summary(user_id, question, data, digest)
+    previous = user_summaries_collection.find_one(
+        {"user_id": str(user_id), "question": question, "status": STATUS_READY},
+        sort=[("generated_at", -1)]
+    )
+    return summary_response(entry, previous)
+
+def refresh_user_summaries(user_id):
+    """Re-queue every question already asked about this user against their current profile."""
+    questions = user_summaries_collection.distinct("question", {"user_id": str(user_id)})
+    if not questions:
+        return 0
+    profile = load_user_profile(user_id, with_history=False)
+    if profile is None:
+        user_summaries_collection.delete_many({"user_id": str(user_id)})
+        return 0
+    data = prompt_profile(user_id, profile)
+    queued = 0
+    for question in questions:
+        digest = content_hash(question, data)
+        if not user_summaries_collection.find_one({"_id": digest}, {"_id": 1}):
+            enqueue_summary(user_id, question, data, digest)
+            queued += 1
+    return queued
+
+
+class SummaryWorker(threading.Thread):
+
+    def __init__(self, poll_interval=None):
+        super().__init__(name="summary-worker", daemon=True)
+        self.poll_interval = poll_interval or SUMMARIES["poll_interval_seconds"]
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._changed = set()
+        self._changed_lock = threading.Lock()
+        self._refreshed_at = {}
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def wake(self):
+        self._wake_event.set()
+
+    def user_changed(self, user_id):
+        # Called on the request path, so it only records the id; the worker does the reads.
+        with self._changed_lock:
+            self._changed.add(str(user_id))
+        self._wake_event.set()
+
+    def run(self):
+        print("Summary worker started")
+        self.recover()
+        while not self._stop_event.is_set():
+            # Cleared before the round, so a wake-up during it is not lost.
+            self._wake_event.clear()
+            generated = 0
+            try:
+                self.refresh_changed()
+                generated = self.process_once()
+            except Exception as e:
+                print(f"Summary worker error: {e}")
+                traceback.print_exc()
+            if not generated:
+                self._wake_event.wait(self.poll_interval)
+        print("Summary worker stopped")
+
+    def recover(self):
+        cutoff = datetime.now() - timedelta(seconds=SUMMARIES["claim_timeout_seconds"])
+        result = user_summaries_collection.update_many(
+            {"status": STATUS_GENERATING, "claimed_at": {"$lt": cutoff}},
+            {"$set": {"status": STATUS_PENDING, "updated_at": datetime.now()}}
+        )
+        if result.modified_count:
+            print(f"Requeued {result.modified_count} stale summaries")
+
+    def refresh_changed(self):
+        now = time.monotonic()
+        debounce = SUMMARIES["refresh_debounce_seconds"]
+        self._refreshed_at = {user_id: at for user_id, at in self._refreshed_at.items() if now - at < debounce}
+        with self._changed_lock:
+            # Users refreshed within the debounce window wait for a later round.
+            due = {user_id for user_id in self._changed if user_id not in self._refreshed_at}
+            self._changed -= due
+        for user_id in due:
+            self._refreshed_at[user_id] = now
+            refresh_user_summaries(user_id)
+
+    def claim_next(self):
+        return user_summaries_collection.find_one_and_update(
+            {"status": STATUS_PENDING},
+            {"$set": {"status": STATUS_GENERATING, "claimed_at": datetime.now(), "updated_at": datetime.now()},
+             "$inc": {"attempts": 1}},
+            sort=[("requested_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def process_once(self):
+        """Generate up to batch_size pending summaries; returns how many were generated."""
+        generated = 0
+        for _ in range(SUMMARIES["batch_size"]):
+            entry = self.claim_next()
+            if not entry:
+                break
+            if not self.generate(entry):
+                break
+            generated += 1
+        return generated
+
+    def generate(self, entry):
+        """False when the model is busy and the entry went back to the queue untouched."""
+        try:
+            summary = summarize(entry["question"], entry["input"])
+        except LlmBusy:
+            # Interactive requests have the model; this is not a failed attempt.
+            user_summaries_collection.update_one(
+                {"_id": entry["_id"]},
+                {"$set": {"status": STATUS_PENDING, "updated_at": datetime.now()}, "$inc": {"attempts": -1}}
+            )
+            return False
+        except Exception as e:
+            print(f"Error generating summary {entry['_id']}: {e}")
+            status = STATUS_FAILED if entry["attempts"] >= SUMMARIES["max_attempts"] else STATUS_PENDING
+            user_summaries_collection.update_one(
+                {"_id": entry["_id"]},
+                {"$set": {"status": status, "last_error": str(e), "updated_at": datetime.now()}}
+            )
+            return True
+        now = datetime.now()
+        user_summaries_collection.update_one(
+            {"_id": entry["_id"]},
+            {"$set": {"status": STATUS_READY, "summary": summary, "generated_at": now, "updated_at": now},
+             "$unset": {"last_error": ""}}
+        )
+        user_summaries_collection.delete_many(
+            {"user_id": entry["user_id"], "question": entry["question"], "status": STATUS_READY,
+             "_id": {"$ne": entry["_id"]}}
+        )
+        return True
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def start_summary_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = SummaryWorker()
+            _worker.start()
+        return _worker
+
+def stop_summary_worker():
+    with _worker_lock:
+        if _worker is not None:
+            _worker.stop()
+
+def summary_worker_wake():
+    if _worker is not None:
+        _worker.wake()
+
+def notify_user_changed(user_id):
+    if _worker is not None and user_id:
+        _worker.user_changed(user_id)
+
+def summary_stats():
+    counts = {status: 0 for status in (STATUS_PENDING, STATUS_GENERATING, STATUS_READY, STATUS_FAILED)}
+    for row in user_summaries_collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return counts
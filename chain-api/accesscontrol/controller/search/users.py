@@ -8,8 +8,12 @@ from datetime import datetime
 import json
 import traceback
 from bson import ObjectId
-from ...controller.models.engine import summarize
+from django.http import StreamingHttpResponse
+from ...controller.models.engine import summarize, summarize_stream
+from ...controller.models.llm import LlmBusy, LlmTimeout, LlmError, llm_metrics
 from ...middleware.sessioncontroller import verify_session
+from ...helper.usersearch import search_users
+from ...controller.models.summaries import cached_summary, load_user_profile, prompt_profile, summary_stats
 
 class UserSearchView(APIView):
     permission_classes = [AllowAny]
@@ -22,35 +26,21 @@ class UserSearchView(APIView):
             if not user_id:
                 return Response({"error": "User ID is required."}, status=status.HTTP_400_BAD_REQUEST)
             
-            user = users_collection.find_one({"_id": ObjectId(user_id)}, {"_id": 0})
+            user = load_user_profile(user_id)
 
             if not user:
                 return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
             
-            if "created_at" in user and isinstance(user["created_at"], datetime):
-                user["created_at"] = user["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-            if "updated_at" in user and isinstance(user["updated_at"], datetime):
-                user["updated_at"] = user["updated_at"].strftime("%Y-%m-%d %H:%M:%S")
-            
-            if "access_history" in user and isinstance(user["access_history"], list):
-                valid_access_history = [
-                    access for access in user["access_history"] 
-                    if isinstance(access, dict) and access.get("timestamp")
-                ]
-                
-                user["access_history"] = valid_access_history[-5:]
-                
-                for access in user["access_history"]:
-                    if "timestamp" in access and isinstance(access["timestamp"], datetime):
-                        access["timestamp"] = access["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
-            
-            user_summary = summarize("give me the user summary as a small paragraph", user)
+            # Served from the summary cache; a changed profile is summarised in the background.
+            summary = cached_summary(user_id, user)
             
             response_time_ms = round((datetime.now() - start_time).total_seconds() * 1000, 2)
             return Response({
                 "message": "User found successfully",
                 "user": user,
-                "user_summary": user_summary,
+                "user_summary": summary["summary"],
+                "summary_status": summary["status"],
+                "summary_stale": summary.get("stale", False),
                 "response_time_ms": response_time_ms
             }, status=status.HTTP_200_OK)
         
@@ -66,26 +56,12 @@ class UserSearchView(APIView):
             if not search_query:
                 return Response({"error": "Search query is required."}, status=status.HTTP_400_BAD_REQUEST)
             
-            search_filter = {
-                "$or": [
-                    {"name": {"$regex": search_query, "$options": "i"}},
-                    {"email": {"$regex": search_query, "$options": "i"}},
-                    {"nfc_id": {"$regex": search_query, "$options": "i"}},
-                ]
-            }
-            
-            projection = {
-                "_id": 1,
-                "name": 1,
-                "email": 1,
-                "position": 1,
-                "access_level": 1
-            }
-            
-            users = list(users_collection.find(search_filter, projection).sort("_id", -1).limit(4))
+            # Indexed prefix lookup, then trigram lookup for typos; best match first.
+            users = search_users(users_collection, search_query, limit=4)
             print(f"Found {len(users)} users matching query: {search_query}")
 
             for user in users:
+                user.pop("nfc_id", None)
                 if "_id" in user:
                     user["id"] = str(user["_id"])
                     del user["_id"]
@@ -115,39 +91,27 @@ class UserSummarizeView(APIView):
                     },
                     "example_post": {
                         "userid": "682a0a7d61d3d8f830ca5672",
-                        "message": "Give me a summary of this user's access patterns"
-                    }
+                        "message": "Give me a summary of this user's access patterns",
+                        "stream": False
+                    },
+                    "llm": llm_metrics.snapshot(),
+                    "summaries": summary_stats()
                 }, status=status.HTTP_200_OK)
             
             print(f"Summarizing user with ID: {user_id}")
-            user = users_collection.find_one({"_id": ObjectId(user_id)}, {"_id": 0})
+            user = load_user_profile(user_id, with_history=False)
 
             if not user:
                 return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
-                
-            if "created_at" in user and isinstance(user["created_at"], datetime):
-                user["created_at"] = user["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-            if "updated_at" in user and isinstance(user["updated_at"], datetime):
-                user["updated_at"] = user["updated_at"].strftime("%Y-%m-%d %H:%M:%S")
-            
-            if "access_history" in user and isinstance(user["access_history"], list):
-                valid_access_history = [
-                    access for access in user["access_history"] 
-                    if isinstance(access, dict) and access.get("timestamp")
-                ]
-                
-                user["access_history"] = valid_access_history[-5:]
-                
-                for access in user["access_history"]:
-                    if "timestamp" in access and isinstance(access["timestamp"], datetime):
-                        access["timestamp"] = access["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
             
-            user_summary = summarize("give me the user summary as a small paragraph", user)
+            summary = cached_summary(user_id, user)
             
             response_time_ms = round((datetime.now() - start_time).total_seconds() * 1000, 2)
             return Response({
-                "message": "User summary generated successfully",
-                "user_summary": user_summary,
+                "message": "User summary generated successfully" if summary["status"] == "ready" else "User summary is being generated",
+                "user_summary": summary["summary"],
+                "summary_status": summary["status"],
+                "summary_stale": summary.get("stale", False),
                 "response_time_ms": response_time_ms
             }, status=status.HTTP_200_OK)
         
@@ -169,29 +133,16 @@ class UserSummarizeView(APIView):
             if not message:
                 return Response({"error": "Message is required."}, status=status.HTTP_400_BAD_REQUEST)
             
-            user_data = users_collection.find_one({"nfc_id": user_id}, {"_id": 0})
+            user = users_collection.find_one({"nfc_id": user_id}, {"access_history": 0, "search_keys": 0})
             
-            if not user_data:
+            if not user:
                 return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
             
-            # Format datetime fields to avoid JSON serialization errors
-            if "created_at" in user_data and isinstance(user_data["created_at"], datetime):
-                user_data["created_at"] = user_data["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-            if "updated_at" in user_data and isinstance(user_data["updated_at"], datetime):
-                user_data["updated_at"] = user_data["updated_at"].strftime("%Y-%m-%d %H:%M:%S")
+            # The fixed-size activity profile stands in for the raw history entries.
+            user_data = prompt_profile(user["_id"], user)
             
-            # Format access history and take last 5
-            if "access_history" in user_data and isinstance(user_data["access_history"], list):
-                valid_access_history = [
-                    access for access in user_data["access_history"] 
-                    if isinstance(access, dict) and access.get("timestamp")
-                ]
-                
-                user_data["access_history"] = valid_access_history[-5:]
-                
-                for access in user_data["access_history"]:
-                    if "timestamp" in access and isinstance(access["timestamp"], datetime):
-                        access["timestamp"] = access["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+            if request.data.get("stream"):
+                return self.stream_answer(message, user_data, start_time)
             
             user_summary = summarize(message, user_data)
             print(f"Generated user summary: {user_summary}")
@@ -202,6 +153,33 @@ class UserSummarizeView(APIView):
                 "response_time_ms": response_time_ms
             }, status=status.HTTP_200_OK)
         
+        except LlmBusy as e:
+            return Response({"error": "The model is busy, try again shortly.", "details": str(e)},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"})
+        except LlmTimeout as e:
+            return Response({"error": "The model did not answer in time.", "details": str(e)},
+                            status=status.HTTP_504_GATEWAY_TIMEOUT)
         except Exception as e:
             traceback.print_exc()
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def stream_answer(self, message, user_data, start_time):
+        pieces = summarize_stream(message, user_data)
+        # Waiting for the first piece here lets a full queue or a timeout still answer 503/504.
+        first = next(pieces, "")
+
+        def lines():
+            yield json.dumps({"token": first}) + "\n"
+            try:
+                for piece in pieces:
+                    yield json.dumps({"token": piece}) + "\n"
+            except LlmError as e:
+                yield json.dumps({"error": str(e)}) + "\n"
+                return
+            response_time_ms = round((datetime.now() - start_time).total_seconds() * 1000, 2)
+            yield json.dumps({"done": True, "response_time_ms": response_time_ms}) + "\n"
+
+        response = StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
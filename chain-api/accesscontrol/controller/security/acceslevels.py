@@ -2,15 +2,13 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated,AllowAny
-from ...connections.mongodb.dbconnect import accesslog_collection
-from ...connections.mongodb.dbconf import con_string
-from pymongo import MongoClient
-from config.config import MONGODB
+from ...connections.mongodb.dbconnect import accesslog_collection, access_levels_collection
 import json
 import traceback
 from bson import ObjectId
 from datetime import datetime
 from ...middleware.sessioncontroller import verify_session
+from ...helper.decisions import access_matrix
 
 class AccessLevelsView(APIView):
     permission_classes = [AllowAny]
@@ -18,10 +16,6 @@ class AccessLevelsView(APIView):
         if not verify_session(request):
             return Response({"error": "User is not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
         try:
-            client = MongoClient(con_string)
-            db = client[MONGODB["database_name"]]
-            access_levels_collection = db["access_levels"]
-            
             if level_id:
                 try:
                     level_id_int = int(level_id)
@@ -85,10 +79,6 @@ class AccessLevelsView(APIView):
                         'error': f'Missing required field: {field}'
                     }, status=status.HTTP_400_BAD_REQUEST)
             
-            client = MongoClient(con_string)
-            db = client[MONGODB["database_name"]]
-            access_levels_collection = db["access_levels"]
-            
             existing = access_levels_collection.find_one({"name": data['name']})
             if existing:
                 return Response({
@@ -114,6 +104,7 @@ class AccessLevelsView(APIView):
             }
             
             result = access_levels_collection.insert_one(new_level)
+            access_matrix.invalidate()
             
             created_level = access_levels_collection.find_one({"_id": result.inserted_id})
             if created_level:
@@ -144,10 +135,6 @@ class AccessLevelsView(APIView):
         try:
             data = request.data
             
-            client = MongoClient(con_string)
-            db = client[MONGODB["database_name"]]
-            access_levels_collection = db["access_levels"]
-            
             level = None
             
             try:
@@ -184,6 +171,7 @@ class AccessLevelsView(APIView):
                     {"_id": level['_id']},
                     {"$set": update_fields}
                 )
+                access_matrix.invalidate()
                 
                 if result.modified_count > 0:
                     updated_level = access_levels_collection.find_one({"_id": level['_id']})
@@ -217,10 +205,6 @@ class AccessLevelsView(APIView):
         if not verify_session(request):
             return Response({"error": "User is not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
         try:
-            client = MongoClient(con_string)
-            db = client[MONGODB["database_name"]]
-            access_levels_collection = db["access_levels"]
-            
             level = None
             
             try:
@@ -236,6 +220,7 @@ class AccessLevelsView(APIView):
             
 
             result = access_levels_collection.delete_one({"_id": level['_id']})
+            access_matrix.invalidate()
             
             if result.deleted_count > 0:
                 return Response({
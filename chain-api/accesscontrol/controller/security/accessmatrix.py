@@ -0,0 +1,53 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from ...connections.mongodb.dbconnect import users_collection
+import traceback
+from ...middleware.sessioncontroller import verify_session
+from ...helper.decisions import access_matrix
+
+class AccessMatrixView(APIView):
+    permission_classes = [AllowAny]
+    def get(self, request):
+        if not verify_session(request):
+            return Response({"error": "User is not authenticated."}, status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            gate_id = request.query_params.get('gateId', None)
+
+            if not gate_id:
+                devices = access_matrix.snapshot()
+                return Response({
+                    "devices": devices,
+                    "count": len(devices)
+                }, status=status.HTTP_200_OK)
+
+            allowed_levels = access_matrix.allowed_levels(gate_id)
+            if allowed_levels is None:
+                return Response({"error": "Device not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            user_filter = {"access_level": {"$in": allowed_levels}}
+            if request.query_params.get('include_inactive', 'false').lower() != 'true':
+                user_filter["active"] = True
+
+            users = list(users_collection.find(
+                user_filter,
+                {"name": 1, "email": 1, "nfc_id": 1, "access_level": 1, "position": 1, "active": 1}
+            ).sort("name", 1))
+            for user in users:
+                user['_id'] = str(user['_id'])
+
+            return Response({
+                "gateId": gate_id,
+                "allowed_levels": allowed_levels,
+                "users": users,
+                "count": len(users)
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            print(f"Error retrieving access matrix: {e}")
+            traceback.print_exc()
+            return Response({
+                'error': 'Failed to retrieve access matrix',
+                'details': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
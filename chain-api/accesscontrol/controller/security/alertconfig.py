@@ -9,9 +9,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from ...connections.mongodb.dbconf import con_string
-from pymongo import MongoClient
-from config.config import MONGODB
+from ...connections.mongodb.dbconnect import alertconfig_collection
 import json
 import traceback
 from bson import ObjectId
@@ -25,19 +23,14 @@ class AlertConfigView(APIView):
         Return the alert configuration settings
         """
         try:
-            # Connect to MongoDB and get alertconfig collection
-            client = MongoClient(con_string)
-            db = client[MONGODB["database_name"]]
-            alert_config_collection = db["alertconfig"]
-            
             # Get alert configuration - there should be only one document
-            config = alert_config_collection.find_one({})
+            config = alertconfig_collection.find_one({})
             
             # If no configuration exists, create default one
             if not config:
                 default_config = self._create_default_config()
-                result = alert_config_collection.insert_one(default_config)
-                config = alert_config_collection.find_one({"_id": result.inserted_id})
+                result = alertconfig_collection.insert_one(default_config)
+                config = alertconfig_collection.find_one({"_id": result.inserted_id})
             
             # Clean up the ObjectId for JSON response
             if config and '_id' in config:
@@ -67,18 +60,13 @@ class AlertConfigView(APIView):
             # Get data from request
             data = request.data
             
-            # Connect to MongoDB
-            client = MongoClient(con_string)
-            db = client[MONGODB["database_name"]]
-            alert_config_collection = db["alertconfig"]
-            
             # Get existing config or create default if none exists
-            config = alert_config_collection.find_one({})
+            config = alertconfig_collection.find_one({})
             
             if not config:
                 default_config = self._create_default_config()
-                result = alert_config_collection.insert_one(default_config)
-                config = alert_config_collection.find_one({"_id": result.inserted_id})
+                result = alertconfig_collection.insert_one(default_config)
+                config = alertconfig_collection.find_one({"_id": result.inserted_id})
             
             # Update only the fields that are provided
             update_fields = {}
@@ -122,14 +110,14 @@ class AlertConfigView(APIView):
             
             # Only perform update if there are changes
             if update_fields:
-                result = alert_config_collection.update_one(
+                result = alertconfig_collection.update_one(
                     {"_id": config['_id']},
                     {"$set": update_fields}
                 )
                 
                 if result.modified_count > 0:
                     # Get the updated configuration
-                    updated_config = alert_config_collection.find_one({"_id": config['_id']})
+                    updated_config = alertconfig_collection.find_one({"_id": config['_id']})
                     
                     # Clean up the ObjectId for JSON response
                     if '_id' in updated_config:
@@ -4,27 +4,45 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from ...connections.mongodb.dbconnect import users_collection
+from ...helper.cache import authorization_cache, user_stats_cache
+from ...helper.pagination import keyset_page, encode_cursor, clamp_per_page
+from ...helper.usersearch import name_filter, search_fields
+from ...connections.mongodb.counters import bump_counters
+from ..models.summaries import notify_user_changed
+from pymongo import ReturnDocument
 from datetime import datetime
 import json
 import traceback
 from bson import ObjectId
 
+# Fields a listing may be sorted by; anything else would reach $sort and $project unchecked.
+USER_SORT_FIELDS = ("name", "email", "nfc_id", "access_level", "created_at", "active", "position",
+                    "last_access", "last_gate_id", "last_gate_name", "_id")
+
+
 class UserListView(APIView):
     #permission_classes = [IsAuthenticated]
     
     def get(self, request):
         try:
             page = int(request.query_params.get('page', 1))
-            per_page = int(request.query_params.get('per_page', 10))
+            per_page = clamp_per_page(int(request.query_params.get('per_page', 10)))
+            
+            cursor = request.query_params.get('cursor', None)
+            if page < 1:
+                raise ValueError("page must be positive")
             
             skip = (page - 1) * per_page
             sort_field = request.query_params.get('sort_by', 'name')
+            if sort_field not in USER_SORT_FIELDS:
+                raise ValueError(f"sort_by must be one of {', '.join(USER_SORT_FIELDS)}")
             sort_direction = 1 if request.query_params.get('sort_order', 'asc') == 'asc' else -1
             
             filters = {}
-            name_filter = request.query_params.get('name', None)
-            if name_filter:
-                filters['name'] = {'$regex': name_filter, '$options': 'i'}
+            name_query = request.query_params.get('name', None)
+            if name_query:
+                # Word-prefix match answered by the search_keys index.
+                filters.update(name_filter(name_query))
             
             active_filter = request.query_params.get('active', None)
             if active_filter is not None:
@@ -34,33 +52,51 @@ class UserListView(APIView):
             if access_level:
                 filters['access_level'] = access_level
             
-            users_cursor = users_collection.find(
-                filters,
-                {
-                    "name": 1,
-                    "email": 1,
-                    "nfc_id": 1, 
-                    "access_level": 1,
-                    "created_at": 1,
-                    "active": 1,
-                    "position": 1,
-                    "last_access": 1,
-                    "last_gate_id": 1,
-                    "last_gate_name": 1
+            projection = {
+                "name": 1,
+                "email": 1,
+                "nfc_id": 1, 
+                "access_level": 1,
+                "created_at": 1,
+                "active": 1,
+                "position": 1,
+                "last_access": 1,
+                "last_gate_id": 1,
+                "last_gate_name": 1
+            }
+            # The cursor needs the sort value even when it is not a listed field.
+            hidden_sort_field = sort_field != "_id" and sort_field not in projection
+            if hidden_sort_field:
+                projection = {**projection, sort_field: 1}
+            
+            if cursor is not None:
+                # Keyset mode: pass cursor= (empty) for the first page, then next_cursor.
+                users, next_cursor = keyset_page(
+                    users_collection, filters, sort_field, sort_direction, per_page, cursor or None, projection
+                )
+                pagination = {
+                    "mode": "cursor",
+                    "per_page": per_page,
+                    "next_cursor": next_cursor,
+                    "has_next": next_cursor is not None
                 }
-            ).sort(sort_field, sort_direction).skip(skip).limit(per_page)
+                if request.query_params.get('include_total', 'false').lower() == 'true':
+                    pagination["total_users"] = users_collection.count_documents(filters)
+                return Response({
+                    "users": [self.serialize_user(user, sort_field if hidden_sort_field else None) for user in users],
+                    "pagination": pagination
+                }, status=status.HTTP_200_OK)
             
-            users_list = []
-            for user in users_cursor:
-                user['_id'] = str(user['_id'])
-                users_list.append(user)
+            sort = {sort_field: sort_direction, "_id": sort_direction}
+            user_stats = user_stats_cache.get_or_load("user_stats", "all", lambda _: self.user_stats())
+            result = self.list_page(filters, sort, skip, per_page, projection)
+            users = result["page"]
+            total_users = result["total"]
+            next_cursor = encode_cursor(sort_field, sort_direction, users[-1]) if len(users) == per_page else None
             
-            total_users = users_collection.count_documents(filters)
-            total_pages = (total_users + per_page - 1) // per_page
+            users_list = [self.serialize_user(user, sort_field if hidden_sort_field else None) for user in users]
             
-            total_users_count = users_collection.count_documents({})
-            active_users_count = users_collection.count_documents({"active": True})
-            inactive_users_count = users_collection.count_documents({"active": False})
+            total_pages = (total_users + per_page - 1) // per_page
             
             pagination = {
                 "total_users": total_users,
@@ -68,13 +104,8 @@ class UserListView(APIView):
                 "current_page": page,
                 "per_page": per_page,
                 "has_next": page < total_pages,
-                "has_prev": page > 1
-            }
-            
-            user_stats = {
-                "total_count": total_users_count,
-                "active_count": active_users_count,
-                "inactive_count": inactive_users_count
+                "has_prev": page > 1,
+                "next_cursor": next_cursor if page < total_pages else None
             }
             
             return Response({
@@ -95,6 +126,35 @@ class UserListView(APIView):
                 {"error": "Failed to retrieve users", "details": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    def list_page(self, filters, sort, skip, per_page, projection):
+        """One page and the filtered total in one round trip."""
+        page = [{"$skip": skip}, {"$limit": per_page}, {"$project": projection}]
+        total = [{"$count": "count"}]
+        # $match and $sort ahead of $facet can use the listing indexes; stages inside it cannot.
+        pipeline = ([{"$match": filters}] if filters else []) + [{"$sort": sort}, {"$facet": {"page": page, "total": total}}]
+
+        facets = next(users_collection.aggregate(pipeline, allowDiskUse=True))
+        return {
+            "page": facets["page"],
+            "total": facets["total"][0]["count"] if facets["total"] else 0
+        }
+
+    def user_stats(self):
+        # Unfiltered, so it cannot share the page's $match; it only runs on a stats cache miss.
+        stats = next(users_collection.aggregate([{"$group": {
+            "_id": None,
+            "total_count": {"$sum": 1},
+            "active_count": {"$sum": {"$cond": [{"$eq": ["$active", True]}, 1, 0]}},
+            "inactive_count": {"$sum": {"$cond": [{"$eq": ["$active", False]}, 1, 0]}}
+        }}]), {})
+        return {field: stats.get(field, 0) for field in ("total_count", "active_count", "inactive_count")}
+
+    def serialize_user(self, user, hidden_field=None):
+        user['_id'] = str(user['_id'])
+        if hidden_field:
+            user.pop(hidden_field, None)
+        return user
+
     def post(self, request):
         try:
             data = request.data
@@ -116,7 +176,12 @@ class UserListView(APIView):
                 "updated_at": datetime.now()
             }
             
+            new_user.update(search_fields(new_user))
             result = users_collection.insert_one(new_user)
+            del new_user["search_keys"]
+            authorization_cache.invalidate("user")
+            user_stats_cache.invalidate("user_stats")
+            bump_counters(total_users=1, active_users=1 if new_user["active"] is True else 0)
             new_user['_id'] = str(result.inserted_id)
             
             return Response(new_user, status=status.HTTP_201_CREATED)
@@ -149,13 +214,17 @@ class UserListView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
-            result = users_collection.delete_one({"_id": user_id})
+            deleted = users_collection.find_one_and_delete({"_id": user_id}, projection={"active": 1})
+            authorization_cache.invalidate("user")
+            user_stats_cache.invalidate("user_stats")
             
-            if result.deleted_count == 0:
+            if deleted is None:
                 return Response(
                     {"error": "User not found"},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            bump_counters(total_users=-1, active_users=-1 if deleted.get("active") is True else 0)
+            notify_user_changed(user_id)
             
             return Response(
                 {"message": "User deleted successfully"},
@@ -215,15 +284,25 @@ class UserListView(APIView):
             
             update_fields['updated_at'] = datetime.now()
             
-            result = users_collection.update_one({"_id": user_id}, {"$set": update_fields})
+            previous = users_collection.find_one_and_update(
+                {"_id": user_id}, {"$set": update_fields},
+                projection={"active": 1, "name": 1, "email": 1, "nfc_id": 1}, return_document=ReturnDocument.BEFORE
+            )
+            authorization_cache.invalidate("user")
             
-            if result.matched_count == 0:
+            if previous is None:
                 return Response(
                     {"error": "User not found"},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            if {'name', 'email', 'nfc_id'} & set(update_fields):
+                users_collection.update_one({"_id": user_id}, {"$set": search_fields({**previous, **update_fields})})
+            if 'active' in update_fields:
+                user_stats_cache.invalidate("user_stats")
+                bump_counters(active_users=int(update_fields['active'] is True) - int(previous.get("active") is True))
             
-            updated_user = users_collection.find_one({"_id": user_id})
+            notify_user_changed(user_id)
+            updated_user = users_collection.find_one({"_id": user_id}, {"search_keys": 0})
             updated_user['_id'] = str(updated_user['_id'])
             
             return Response(updated_user, status=status.HTTP_200_OK)
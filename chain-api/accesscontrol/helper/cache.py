@@ -0,0 +1,185 @@
+"""
+In-process authorization cache for the tap path.
+
+Entries are grouped by kind ("user", "device"). Every kind carries a version
+that is bumped by invalidate(), so a loader that raced with a write never
+puts a stale document back into the cache.
+
+Other processes (gunicorn workers) learn about a write through version stamps
+in the stats collection: invalidate() bumps the kind's stamp, and every
+process reads the stamps at most once per CACHE["shared_versions"]
+["check_seconds"] and drops the kinds that moved.
+"""
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from config.config import CACHE
+from accesscontrol.connections.mongodb.dbconnect import stats_collection
+
+VERSIONS_ID = "cache_versions"
+
+
+class SharedVersions:
+
+    def __init__(self, check_seconds):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._seen = None
+        self._checked_at = None
+        self._listeners = []
+
+    def subscribe(self, kinds, listener):
+        self._listeners.append((set(kinds), listener))
+
+    def bump(self, *kinds):
+        if not kinds:
+            return
+        try:
+            stats_collection.update_one({"_id": VERSIONS_ID}, {"$inc": {kind: 1 for kind in kinds}}, upsert=True)
+        except Exception as e:
+            # Other processes catch up when their TTLs expire.
+            print(f"Error bumping cache versions {kinds}: {e}")
+
+    def check(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+        try:
+            current = stats_collection.find_one({"_id": VERSIONS_ID}) or {}
+        except Exception as e:
+            print(f"Error reading cache versions: {e}")
+            return
+        current.pop("_id", None)
+        with self._lock:
+            previous, self._seen = self._seen, current
+        if previous is None:
+            return
+        changed = {kind for kind in set(current) | set(previous) if current.get(kind) != previous.get(kind)}
+        for kinds, listener in self._listeners:
+            for kind in changed & kinds:
+                try:
+                    listener(kind)
+                except Exception as e:
+                    print(f"Error invalidating {kind}: {e}")
+                    traceback.print_exc()
+
+
+shared_versions = SharedVersions(CACHE["shared_versions"]["check_seconds"])
+
+
+class AuthorizationCache:
+
+    def __init__(self, ttl_seconds, max_entries, shared_kinds=()):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shared_kinds = set(shared_kinds)
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if self.shared_kinds:
+            shared_versions.subscribe(self.shared_kinds, lambda kind: self.invalidate(kind, broadcast=False))
+
+    def get_or_load(self, kind, key, loader):
+        if kind in self.shared_kinds:
+            shared_versions.check()
+        cache_key = (kind, key)
+        with self._lock:
+            version = self._versions.get(kind, 0)
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                value, entry_version, expires_at = entry
+                if entry_version == version and expires_at > time.monotonic():
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return value
+                del self._entries[cache_key]
+            self.misses += 1
+
+        value = loader(key)
+
+        with self._lock:
+            if self._versions.get(kind, 0) == version:
+                self._store(cache_key, value, version)
+        return value
+
+    def get_many(self, kind, keys, bulk_loader):
+        if kind in self.shared_kinds:
+            shared_versions.check()
+        results = {}
+        missing = []
+        with self._lock:
+            version = self._versions.get(kind, 0)
+            now = time.monotonic()
+            for key in dict.fromkeys(keys):
+                cache_key = (kind, key)
+                entry = self._entries.get(cache_key)
+                if entry is not None:
+                    value, entry_version, expires_at = entry
+                    if entry_version == version and expires_at > now:
+                        self._entries.move_to_end(cache_key)
+                        self.hits += 1
+                        results[key] = value
+                        continue
+                    del self._entries[cache_key]
+                self.misses += 1
+                missing.append(key)
+
+        if missing:
+            loaded = bulk_loader(missing)
+            with self._lock:
+                store = self._versions.get(kind, 0) == version
+                for key in missing:
+                    results[key] = loaded.get(key)
+                    if store:
+                        self._store((kind, key), results[key], version)
+        return results
+
+    def _store(self, cache_key, value, version):
+        self._entries[cache_key] = (value, version, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, kind=None, broadcast=True):
+        with self._lock:
+            kinds = [kind] if kind else list({k for k, _ in self._entries} | set(self._versions) | self.shared_kinds)
+            for name in kinds:
+                self._versions[name] = self._versions.get(name, 0) + 1
+            for cache_key in [k for k in self._entries if k[0] in kinds]:
+                del self._entries[cache_key]
+            self.invalidations += 1
+        if broadcast:
+            shared_versions.bump(*[name for name in kinds if name in self.shared_kinds])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "versions": dict(self._versions)
+            }
+
+
+authorization_cache = AuthorizationCache(
+    CACHE["authorization"]["ttl_seconds"],
+    CACHE["authorization"]["max_entries"],
+    shared_kinds=("user", "device")
+)
+
+# Same versioned invalidation for the user list's unfiltered stats.
+user_stats_cache = AuthorizationCache(CACHE["user_stats"]["ttl_seconds"], 1, shared_kinds=("user_stats",))
@@ -0,0 +1,149 @@
+"""
+Precompiled access-decision matrix.
+
+Access level names are interned to small integer ids and every device keeps
+its allowed levels as a bitmask, so a tap decision is a single bit test on
+the device's compiled row, without taking a lock.
+
+Device writes bump the shared "device" version stamp and access level
+writes the "access_matrix" one. When a process sees either move, it drops
+its compiled rows (and the interned ids with them); a tap on a device
+without a row compiles it from the device document it just loaded. The
+full matrix served by the access-matrix view is rebuilt when that view
+finds it stale; rebuilds read MongoDB outside the lock and only swap their
+result in if nothing was dropped in the meantime.
+"""
+import threading
+import time
+from config.config import CACHE
+from accesscontrol.connections.mongodb.dbconnect import devices_collection
+from .cache import shared_versions
+
+
+class MatrixState:
+    """Interned level ids and compiled device rows; replaced as a whole on every rebuild."""
+
+    def __init__(self):
+        self.level_ids = {}
+        self.level_names = []
+        self.device_masks = {}
+        self.device_tags = {}
+
+    def intern(self, level):
+        level_id = self.level_ids.get(level)
+        if level_id is None:
+            level_id = len(self.level_names)
+            self.level_names.append(level)
+            self.level_ids[level] = level_id
+        return level_id
+
+    def mask_for(self, levels):
+        mask = 0
+        for level in levels or []:
+            mask |= 1 << self.intern(level)
+        return mask
+
+    def set_device(self, device):
+        tag_id = device.get("tag_id")
+        previous_tag = self.device_tags.get(str(device.get("_id")))
+        if previous_tag and previous_tag != tag_id:
+            self.device_masks.pop(previous_tag, None)
+        # The mask is stored after its levels are interned, so a reader that finds it also finds their ids.
+        mask = self.mask_for(device.get("assigned_to"))
+        self.device_masks[tag_id] = mask
+        self.device_tags[str(device.get("_id"))] = tag_id
+        return mask
+
+    def remove_device(self, device_id):
+        tag_id = self.device_tags.pop(str(device_id), None)
+        if tag_id is not None:
+            self.device_masks.pop(tag_id, None)
+
+    def levels_for(self, mask):
+        return [name for level_id, name in enumerate(self.level_names) if mask >> level_id & 1]
+
+
+class AccessMatrix:
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._state = MatrixState()
+        self._generation = 0
+        self.loaded_at = None
+        self._stale = False
+        shared_versions.subscribe(("device", "access_matrix"), lambda kind: self.drop())
+
+    def reload(self):
+        """Rebuild every row; False if rows were dropped while MongoDB was being read."""
+        # Cleared before the read, so a change arriving during it is not lost.
+        self._stale = False
+        with self._lock:
+            generation = self._generation
+        devices = list(devices_collection.find({}, {"tag_id": 1, "assigned_to": 1}))
+        state = MatrixState()
+        for device in devices:
+            state.set_device(device)
+        with self._lock:
+            if generation != self._generation:
+                # Rows were dropped while this read ran; it may predate the write that dropped them.
+                self._stale = True
+                return False
+            self._state = state
+            self.loaded_at = time.monotonic()
+        print(f"Access matrix rebuilt: {len(state.device_masks)} devices, {len(state.level_names)} levels")
+        return True
+
+    def invalidate(self):
+        """Drop the rows here now, and in every other process on its next version check."""
+        self.drop()
+        shared_versions.bump("access_matrix")
+
+    def drop(self):
+        with self._lock:
+            self._state = MatrixState()
+            self._generation += 1
+        self._stale = True
+
+    def ensure_fresh(self):
+        # Only the access-matrix view gets here; taps never wait on a rebuild.
+        shared_versions.check()
+        if self.loaded_at is None or self._stale or time.monotonic() - self.loaded_at > self.refresh_seconds:
+            if not self.reload():
+                self.reload()
+
+    def set_device(self, device):
+        # Called after a device write: a rebuild reading from before it must not swap its rows in.
+        with self._lock:
+            self._generation += 1
+            return self._state.set_device(device)
+
+    def remove_device(self, device_id):
+        with self._lock:
+            self._generation += 1
+            self._state.remove_device(device_id)
+
+    def device_allows(self, device, level):
+        """Bit test on the device's row; a device without one is compiled from the document in hand."""
+        state = self._state
+        mask = state.device_masks.get(device.get("tag_id"))
+        if mask is None:
+            with self._lock:
+                state = self._state
+                mask = state.set_device(device)
+        level_id = state.level_ids.get(level)
+        return level_id is not None and bool(mask >> level_id & 1)
+
+    def allowed_levels(self, tag_id):
+        self.ensure_fresh()
+        state = self._state
+        mask = state.device_masks.get(tag_id)
+        return None if mask is None else state.levels_for(mask)
+
+    def snapshot(self):
+        self.ensure_fresh()
+        state = self._state
+        return {tag_id: state.levels_for(mask) for tag_id, mask in list(state.device_masks.items())}
+
+
+access_matrix = AccessMatrix(CACHE["access_matrix"]["refresh_seconds"])
@@ -0,0 +1,83 @@
+"""
+Streaming serializers for bulk exports.
+
+Rows are produced one document at a time from a MongoDB cursor, grouped into
+chunks of about chunk_bytes and optionally gzip-compressed on the fly, so an
+export holds one cursor batch and one chunk in memory whatever its size.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from bson import ObjectId
+
+ACCESSLOG_CSV_COLUMNS = [
+    "_id", "timestamp", "access_time.date", "access_time.time", "access_status", "nfc_id", "user_id",
+    "name", "email", "position", "access_level", "gateId", "gate_name", "location", "access_method",
+    "ingest_mode", "blockchain_data.anchor_id", "blockchain_data.anchor_status", "blockchain_data.tx_hash",
+    "blockchain_data.block_number"
+]
+
+
+def export_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def dotted(document, path):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def ndjson_lines(documents):
+    for document in documents:
+        yield json.dumps(document, default=export_default, separators=(",", ":")) + "\n"
+
+def csv_lines(documents, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(columns)
+    yield take()
+    for document in documents:
+        row = []
+        for column in columns:
+            value = dotted(document, column)
+            row.append("" if value is None else export_default(value) if not isinstance(value, (str, int, float)) else value)
+        writer.writerow(row)
+        yield take()
+
+def chunked(lines, chunk_bytes):
+    parts = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        parts.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            yield b"".join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield b"".join(parts)
+
+def gzipped(chunks, level=6):
+    # wbits=31 writes a gzip header and trailer around the deflate stream.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,72 @@
+"""
+Keyset (cursor) pagination for MongoDB listings.
+
+A cursor records the sort field, direction and the (value, _id) of the last
+row served. The next page starts strictly after that key, so it costs the
+same at any depth and rows inserted ahead of the cursor (new taps on a
+newest-first listing) do not shift later pages. Cursors are opaque to
+clients: extended JSON, base64url encoded.
+"""
+import base64
+import json
+from bson import json_util
+from config.config import PAGINATION
+
+
+def clamp_per_page(per_page):
+    """per_page capped at PAGINATION["max_per_page"]; raises ValueError below 1."""
+    if per_page < 1:
+        raise ValueError("per_page must be positive")
+    return min(per_page, PAGINATION["max_per_page"])
+
+def encode_cursor(sort_field, direction, document):
+    payload = {"f": sort_field, "d": direction, "v": document.get(sort_field), "id": document["_id"]}
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token, sort_field, direction):
+    """Return (value, _id) for the cursor, or raise ValueError if it is invalid for this sort."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        value, last_id = payload["v"], payload["id"]
+        cursor_field, cursor_direction = payload["f"], payload["d"]
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+    if cursor_field != sort_field or cursor_direction != direction:
+        raise ValueError("Cursor does not match the requested sort order")
+    return value, last_id
+
+def keyset_filter(sort_field, direction, value, last_id):
+    """Filter for rows after (value, last_id) in (sort_field, _id) order.
+
+    MongoDB sorts null/missing values first, and range operators never match
+    them, so they are handled as their own branch.
+    """
+    after = "$gt" if direction == 1 else "$lt"
+    if value is None:
+        branches = [{sort_field: None, "_id": {after: last_id}}]
+        if direction == 1:
+            branches.append({sort_field: {"$ne": None}})
+        return {"$or": branches}
+
+    branches = [{sort_field: {after: value}}, {sort_field: value, "_id": {after: last_id}}]
+    if direction == -1:
+        branches.append({sort_field: None})
+    return {"$or": branches}
+
+def keyset_page(collection, filters, sort_field, direction, per_page, cursor=None, projection=None):
+    """Fetch one page; returns (documents, next_cursor). next_cursor is None on the last page."""
+    query = filters
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_field, direction)
+        query = {"$and": [filters, keyset_filter(sort_field, direction, value, last_id)]} if filters else \
+            keyset_filter(sort_field, direction, value, last_id)
+
+    documents = list(
+        collection.find(query, projection).sort([(sort_field, direction), ("_id", direction)]).limit(per_page + 1)
+    )
+    next_cursor = None
+    if len(documents) > per_page:
+        documents = documents[:per_page]
+        next_cursor = encode_cursor(sort_field, direction, documents[-1])
+    return documents, next_cursor
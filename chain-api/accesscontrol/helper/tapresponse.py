@@ -0,0 +1,71 @@
+"""
+Response profiles for the tap endpoint.
+
+    full     the verbose JSON body (user document, UID variants, anchor info)
+    compact  {"granted", "user_found", "reason", "user": {"name"}} for gate firmware;
+             user_found keeps its full-profile meaning and is only true on a grant,
+             so firmware that reads user_found alone never opens on a denial
+    binary   fixed layout, no parsing needed on the device:
+               byte 0      layout version (1)
+               byte 1      decision code, see DECISION_CODES
+               byte 2      name length N
+               bytes 3..   N bytes of UTF-8 display name
+
+The profile comes from the X-Response-Profile header, then the device's
+response_profile field, then TAP_RESPONSE["default_profile"].
+"""
+import struct
+from django.http import HttpResponse
+from rest_framework.response import Response
+from rest_framework import status
+from config.config import TAP_RESPONSE
+
+PROFILE_FULL = "full"
+PROFILE_COMPACT = "compact"
+PROFILE_BINARY = "binary"
+PROFILES = (PROFILE_FULL, PROFILE_COMPACT, PROFILE_BINARY)
+PROFILE_HEADER = "X-Response-Profile"
+
+DECISION_GRANTED = "granted"
+DECISION_UNKNOWN_CARD = "unknown_card"
+DECISION_LEVEL_NOT_ALLOWED = "level_not_allowed"
+DECISION_DEVICE_INACTIVE = "device_inactive"
+DECISION_DEVICE_NOT_FOUND = "device_not_found"
+DECISION_BAD_REQUEST = "bad_request"
+
+DECISION_CODES = {
+    DECISION_GRANTED: 0,
+    DECISION_UNKNOWN_CARD: 1,
+    DECISION_LEVEL_NOT_ALLOWED: 2,
+    DECISION_DEVICE_INACTIVE: 3,
+    DECISION_DEVICE_NOT_FOUND: 4,
+    DECISION_BAD_REQUEST: 5
+}
+
+BINARY_LAYOUT_VERSION = 1
+BINARY_CONTENT_TYPE = "application/octet-stream"
+
+
+def resolve_profile(request, device=None):
+    profile = request.headers.get(PROFILE_HEADER) or (device or {}).get("response_profile") or TAP_RESPONSE["default_profile"]
+    profile = str(profile).strip().lower()
+    return profile if profile in PROFILES else PROFILE_FULL
+
+def encode_binary(decision, name=None):
+    name_bytes = (name or "").encode("utf-8")[:min(TAP_RESPONSE["name_max_bytes"], 255)]
+    # Truncation may split a multi-byte character; drop the partial tail.
+    name_bytes = name_bytes.decode("utf-8", "ignore").encode("utf-8")
+    return struct.pack("BBB", BINARY_LAYOUT_VERSION, DECISION_CODES[decision], len(name_bytes)) + name_bytes
+
+def tap_response(profile, decision, name=None, http_status=status.HTTP_200_OK):
+    if profile == PROFILE_BINARY:
+        return HttpResponse(encode_binary(decision, name), content_type=BINARY_CONTENT_TYPE, status=http_status)
+    granted = decision == DECISION_GRANTED
+    body = {
+        "granted": granted,
+        "user_found": granted,
+        "reason": decision
+    }
+    if name is not None:
+        body["user"] = {"name": name}
+    return Response(body, status=http_status)
@@ -0,0 +1,50 @@
+"""
+Opt-in per-stage timing for request handlers.
+
+Handlers call stage_clock() once and lap(name) after each stage. Unless
+enable_stage_timing() has been called (the load-test harness does) the clock
+is a no-op, so production requests pay nothing for it.
+"""
+import threading
+import time
+from collections import defaultdict
+
+_enabled = False
+_samples = defaultdict(list)
+_lock = threading.Lock()
+
+
+class StageClock:
+
+    def __init__(self):
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        with _lock:
+            _samples[stage].append(now - self.last)
+        self.last = now
+
+
+class NullClock:
+
+    def lap(self, stage):
+        pass
+
+
+_null_clock = NullClock()
+
+def stage_clock():
+    return StageClock() if _enabled else _null_clock
+
+def enable_stage_timing(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+def collect_stage_samples(reset=True):
+    global _samples
+    with _lock:
+        samples = dict(_samples)
+        if reset:
+            _samples = defaultdict(list)
+    return samples
@@ -0,0 +1,219 @@
+"""
+Indexed user search.
+
+Every user document carries search_keys, a multikey-indexed array built from
+its name, email and card id:
+
+  n:<prefix>  every prefix of every name token    (up to max_prefix chars)
+  e:<prefix>  every prefix of every email token
+  c:<prefix>  every prefix of the card id (lowercase, separators removed)
+  n=<token>   every whole name token, e=<token> and c=<card> likewise
+  t:<trigram> trigrams of "^" + each name and email token
+
+Text is lowercased, accents are stripped and it is split on anything that is
+not a letter or digit. A query is answered in indexed lookups. Users where
+every query token is a whole word come first, then users where it is a
+prefix, up to USER_SEARCH["candidates"] in all, so a short or common prefix
+cannot crowd the exact match out of the capped set. If that finds too few
+users, a last lookup looks for users sharing trigrams with the query, which
+catches typos. Candidates are then checked and ranked in Python with a prefix
+edit distance, so a wrong letter in "jonh" still matches "johnson".
+
+The keys are rebuilt on every write to name, email or nfc_id made through
+the API (search_fields()). Users without keys (created before them, or
+written around the API: imports, the mongo shell) are still found by a
+case-insensitive regex scan limited to keyless users, which the search_keys
+index answers without a collection scan once every user has keys.
+rebuild_user_search backfills them, and rebuilds every user after the key
+format changes.
+"""
+import re
+import unicodedata
+from config.config import USER_SEARCH
+
+FIELD_WEIGHTS = {"name": 1.0, "nfc_id": 0.9, "email": 0.8}
+UNKEYED = {"search_keys": {"$exists": False}}
+SEARCH_PROJECTION = {"_id": 1, "name": 1, "email": 1, "nfc_id": 1, "position": 1, "access_level": 1}
+
+_split = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(char for char in text if not unicodedata.combining(char)).lower()
+
+def tokens(text):
+    return [token for token in _split.split(normalize(text)) if token]
+
+def card_token(nfc_id):
+    return "".join(tokens(nfc_id))
+
+def prefixes(token, max_prefix=None):
+    max_prefix = max_prefix or USER_SEARCH["max_prefix"]
+    return [token[:length] for length in range(1, min(len(token), max_prefix) + 1)]
+
+def trigrams(token):
+    padded = "^" + token
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def search_keys(user):
+    keys = set()
+    max_prefix = USER_SEARCH["max_prefix"]
+    name_tokens = tokens(user.get("name"))
+    email_tokens = tokens(user.get("email"))
+    for token in name_tokens:
+        keys.update("n:" + prefix for prefix in prefixes(token))
+        keys.add("n=" + token[:max_prefix])
+    for token in email_tokens:
+        keys.update("e:" + prefix for prefix in prefixes(token))
+        keys.add("e=" + token[:max_prefix])
+    card = card_token(user.get("nfc_id"))
+    if card:
+        keys.update("c:" + prefix for prefix in prefixes(card))
+        keys.add("c=" + card[:max_prefix])
+    for token in name_tokens + email_tokens:
+        keys.update("t:" + gram for gram in trigrams(token))
+    return sorted(keys)
+
+def search_fields(user):
+    """The $set fields keeping a user's search keys in step with its name, email and nfc_id."""
+    return {"search_keys": search_keys(user)}
+
+def word_regex(token):
+    return {"$regex": r"(^|[^0-9a-z])" + re.escape(token), "$options": "i"}
+
+def name_filter(text):
+    """UserListView name= filter: every word must start a word of the name."""
+    max_prefix = USER_SEARCH["max_prefix"]
+    query_tokens = tokens(text)
+    if not query_tokens:
+        return {}
+    keyed = {"search_keys": {"$all": ["n:" + token[:max_prefix] for token in query_tokens]}}
+    unkeyed = {**UNKEYED, "$and": [{"name": word_regex(token)} for token in query_tokens]}
+    return {"$or": [keyed, unkeyed]}
+
+def max_typos(token):
+    if len(token) <= 3:
+        return 0
+    return min(USER_SEARCH["max_typos"], 1 if len(token) <= 6 else 2)
+
+def prefix_distance(query, token):
+    """Fewest edits (insert, delete, substitute, swap neighbours) turning query into a prefix of token."""
+    previous_row = None
+    row = list(range(len(token) + 1))
+    for i in range(1, len(query) + 1):
+        current = [i] + [0] * len(token)
+        for j in range(1, len(token) + 1):
+            cost = 0 if query[i - 1] == token[j - 1] else 1
+            current[j] = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if (previous_row is not None and i > 1 and j > 1
+                    and query[i - 1] == token[j - 2] and query[i - 2] == token[j - 1]):
+                current[j] = min(current[j], previous_row[j - 2] + 1)
+        previous_row, row = row, current
+    return min(row)
+
+def token_score(query, token):
+    if token == query:
+        return 1.0
+    if token.startswith(query):
+        return 0.6 + 0.4 * len(query) / len(token)
+    allowed = max_typos(query)
+    if not allowed:
+        return 0.0
+    distance = prefix_distance(query, token)
+    if distance > allowed:
+        return 0.0
+    return 0.3 + 0.2 * min(1.0, len(query) / len(token)) - 0.15 * (distance - 1)
+
+def score_user(user, query_tokens):
+    """Sum over query tokens of the best weighted match; 0 when any token matches nothing."""
+    fields = {
+        "name": tokens(user.get("name")),
+        "email": tokens(user.get("email")),
+        "nfc_id": [card_token(user.get("nfc_id"))]
+    }
+    total = 0.0
+    for query in query_tokens:
+        best = 0.0
+        for field, field_tokens in fields.items():
+            for token in field_tokens:
+                if token:
+                    best = max(best, FIELD_WEIGHTS[field] * token_score(query, token))
+        if not best:
+            return 0.0
+        total += best
+    return total
+
+def prefix_filter(query_tokens, card, whole_words=False):
+    """Every query token starts (or, with whole_words, is) a name, email or card token."""
+    max_prefix = USER_SEARCH["max_prefix"]
+    marker = "=" if whole_words else ":"
+    clauses = [{"search_keys": {"$in": [scope + marker + token[:max_prefix] for scope in ("n", "e", "c")]}}
+               for token in query_tokens]
+    word_match = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+    if len(query_tokens) > 1 and card:
+        # "04:A1:B2" is one card id, not three words.
+        return {"$or": [word_match, {"search_keys": "c" + marker + card[:max_prefix]}]}
+    return word_match
+
+def prefix_candidates(collection, query_tokens, card, projection):
+    limit = USER_SEARCH["candidates"]
+    candidates = list(collection.find(prefix_filter(query_tokens, card, whole_words=True), projection).limit(limit))
+    if len(candidates) < limit:
+        match = prefix_filter(query_tokens, card)
+        if candidates:
+            match = {**match, "_id": {"$nin": [user["_id"] for user in candidates]}}
+        candidates += collection.find(match, projection).limit(limit - len(candidates))
+    return candidates
+
+def unkeyed_candidates(collection, query_tokens, card, projection):
+    """Keyless users where every query token (or the whole card id) appears in the name, email or card id."""
+    clauses = [{"$or": [{field: {"$regex": re.escape(token), "$options": "i"}} for field in ("name", "email", "nfc_id")]}
+               for token in query_tokens]
+    match = {**UNKEYED, "$and": clauses}
+    if len(query_tokens) > 1 and card:
+        match = {**UNKEYED, "$or": [{"$and": clauses}, {"nfc_id": {"$regex": r"[^0-9a-z]*".join(card), "$options": "i"}}]}
+    return list(collection.find(match, projection).limit(USER_SEARCH["candidates"]))
+
+def fuzzy_candidates(collection, query_tokens, exclude_ids, projection):
+    grams = sorted({"t:" + gram for token in query_tokens if max_typos(token) for gram in trigrams(token)})
+    if not grams:
+        return []
+    match = {"search_keys": {"$in": grams}}
+    if exclude_ids:
+        match["_id"] = {"$nin": exclude_ids}
+    pipeline = [
+        {"$match": match},
+        {"$project": {**projection, "shared": {"$size": {"$filter": {
+            "input": "$search_keys", "cond": {"$in": ["$$this", grams]}
+        }}}}},
+        {"$sort": {"shared": -1, "_id": 1}},
+        {"$limit": USER_SEARCH["fuzzy_candidates"]}
+    ]
+    return list(collection.aggregate(pipeline))
+
+def search_users(collection, query, limit=4, projection=None):
+    """Best matching users for query, ranked; each carries its search_score."""
+    projection = projection or SEARCH_PROJECTION
+    query_tokens = tokens(query)
+    if not query_tokens:
+        return []
+    card = card_token(query)
+
+    candidates = prefix_candidates(collection, query_tokens, card, projection)
+    # Never overlaps the keyed candidates; costs an empty index probe once every user has keys.
+    candidates += unkeyed_candidates(collection, query_tokens, card, projection)
+    if len(candidates) < limit:
+        candidates += fuzzy_candidates(collection, query_tokens, [user["_id"] for user in candidates], projection)
+
+    ranked = []
+    for user in candidates:
+        score = score_user(user, query_tokens)
+        if len(query_tokens) > 1 and card and card_token(user.get("nfc_id")).startswith(card):
+            score = max(score, FIELD_WEIGHTS["nfc_id"] * len(query_tokens))
+        if score:
+            user.pop("shared", None)
+            user["search_score"] = round(score, 3)
+            ranked.append(user)
+    ranked.sort(key=lambda user: (-user["search_score"], normalize(user.get("name")), str(user["_id"])))
+    return ranked[:limit]
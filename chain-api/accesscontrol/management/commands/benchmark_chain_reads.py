@@ -0,0 +1,75 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from config.config import BLOCKCHAIN, CHAIN_READER
+from blockchain.modules.chainreader import ChainReader
+
+
+class Command(BaseCommand):
+    help = "Compare one-call-per-request chain reads with batched, concurrent ChainReader reads against a node"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--provider", default=BLOCKCHAIN["provider"], help="JSON-RPC endpoint of the node")
+        parser.add_argument("--blocks", type=int, default=200, help="Number of most recent blocks to read")
+        parser.add_argument("--full-transactions", action="store_true", help="Fetch blocks with full transactions")
+        parser.add_argument("--receipts", action="store_true", help="Also fetch the receipt of every transaction read")
+        parser.add_argument("--batch-size", type=int, default=CHAIN_READER["batch_size"])
+        parser.add_argument("--workers", type=int, default=CHAIN_READER["max_workers"])
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        w3 = Web3(Web3.HTTPProvider(options["provider"], request_kwargs={"timeout": 30}))
+        if not w3.is_connected():
+            raise CommandError(f"Cannot reach a node at {options['provider']}")
+
+        latest = w3.eth.block_number
+        numbers = list(range(max(0, latest - options["blocks"] + 1), latest + 1))
+        # Receipts need full transactions to know the hashes.
+        full = options["full_transactions"] or options["receipts"]
+
+        started = time.perf_counter()
+        blocks = [w3.eth.get_block(number, full) for number in numbers]
+        tx_hashes = [tx["hash"] for block in blocks for tx in block.transactions] if full else []
+        if options["receipts"]:
+            for tx_hash in tx_hashes:
+                try:
+                    w3.eth.get_transaction_receipt(tx_hash)
+                except TransactionNotFound:
+                    pass
+        sequential = {
+            "requests": len(numbers) + (len(tx_hashes) if options["receipts"] else 0),
+            "seconds": round(time.perf_counter() - started, 4)
+        }
+
+        reader = ChainReader(w3=w3, batch_size=options["batch_size"], max_workers=options["workers"])
+        started = time.perf_counter()
+        batched_blocks = reader.get_blocks(numbers, full)
+        if options["receipts"]:
+            reader.get_transaction_receipts([tx["hash"] for block in batched_blocks for tx in block.transactions])
+        batched = {"requests": reader.stats()["requests"], "seconds": round(time.perf_counter() - started, 4)}
+
+        report = {
+            "provider": options["provider"],
+            "blocks": len(numbers),
+            "transactions": len(tx_hashes),
+            "calls": reader.stats()["calls"],
+            "batch_size": reader.batch_size,
+            "workers": reader.max_workers,
+            "sequential": sequential,
+            "batched": batched,
+            "request_reduction": round(sequential["requests"] / max(1, batched["requests"]), 2),
+            "speedup": round(sequential["seconds"] / batched["seconds"], 2) if batched["seconds"] else None
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"{report['calls']} calls over {report['blocks']} blocks, {report['transactions']} transactions")
+        self.stdout.write(f"Sequential: {sequential['requests']} requests in {sequential['seconds']}s")
+        self.stdout.write(f"Batched:    {batched['requests']} requests in {batched['seconds']}s "
+                          f"(batch size {reader.batch_size}, {reader.max_workers} workers)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['request_reduction']}x fewer requests, {report['speedup']}x faster"
+        ))
@@ -0,0 +1,124 @@
+import json
+import random
+import time
+from django.core.management.base import BaseCommand
+from pymongo import ASCENDING, IndexModel
+from accesscontrol.connections.mongodb.dbconnect import db
+from accesscontrol.helper.usersearch import search_fields, search_users
+from config.config import MONGODB
+
+FIRST_NAMES = [
+    "james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda", "william", "elizabeth",
+    "david", "barbara", "richard", "susan", "joseph", "jessica", "thomas", "sarah", "charles", "karen",
+    "mohammed", "fatima", "ahmed", "aisha", "rizwan", "priya", "arjun", "ananya", "wei", "mei", "hiroshi",
+    "yuki", "olga", "ivan", "sofia", "lucas", "emma", "noah", "olivia", "liam", "chloe", "mateo", "zoe"
+]
+LAST_NAMES = [
+    "smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis", "rodriguez", "martinez",
+    "hernandez", "lopez", "gonzalez", "wilson", "anderson", "thomas", "taylor", "moore", "jackson", "martin",
+    "khan", "rahman", "patel", "sharma", "nair", "chen", "wang", "tanaka", "sato", "ivanova", "petrov",
+    "muller", "schmidt", "rossi", "ferrari", "dubois", "silva", "santos", "okafor", "mensah", "kowalski"
+]
+POSITIONS = ["Engineer", "Manager", "Analyst", "Security", "Intern", "Director", "Technician"]
+
+
+def typo(rng, word):
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+class Command(BaseCommand):
+    help = "Compare unanchored $regex user search with the indexed search_keys lookup on a seeded collection"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100000, help="Users seeded into the benchmark collection")
+        parser.add_argument("--queries", type=int, default=200, help="Queries run against each path")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark collection afterwards")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        collection = db[MONGODB["collections"]["users"] + "_search_benchmark"]
+        collection.drop()
+        collection.create_indexes([IndexModel([("search_keys", ASCENDING)], name="search_keys_1")])
+
+        started = time.perf_counter()
+        batch = []
+        for index in range(options["users"]):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            user = {
+                "name": f"{first.title()} {last.title()}",
+                "email": f"{first}.{last}{index}@example.com",
+                "nfc_id": f"{rng.getrandbits(40):010X}",
+                "position": rng.choice(POSITIONS),
+                "access_level": "Staff",
+                "active": True
+            }
+            user.update(search_fields(user))
+            batch.append(user)
+            if len(batch) >= 5000:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            collection.insert_many(batch, ordered=False)
+        self.stdout.write(f"Seeded {options['users']} users in {time.perf_counter() - started:.1f}s")
+
+        queries = []
+        for _ in range(options["queries"]):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            kind = rng.choice(["prefix", "full", "last", "typo"])
+            if kind == "prefix":
+                queries.append(first[:rng.randint(2, len(first))])
+            elif kind == "full":
+                queries.append(f"{first} {last[:3]}")
+            elif kind == "last":
+                queries.append(last)
+            else:
+                queries.append(typo(rng, last))
+
+        def run(search):
+            timings = []
+            found = 0
+            for query in queries:
+                started = time.perf_counter()
+                found += 1 if search(query) else 0
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            return {
+                "avg_ms": round(sum(timings) / len(timings), 2),
+                "p50_ms": round(timings[len(timings) // 2], 2),
+                "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+                "queries_with_results": found
+            }
+
+        def regex_search(query):
+            search_filter = {"$or": [
+                {"name": {"$regex": query, "$options": "i"}},
+                {"email": {"$regex": query, "$options": "i"}},
+                {"nfc_id": {"$regex": query, "$options": "i"}},
+            ]}
+            return list(collection.find(search_filter, {"name": 1}).sort("_id", -1).limit(4))
+
+        report = {
+            "users": options["users"],
+            "queries": len(queries),
+            "regex": run(regex_search),
+            "indexed": run(lambda query: search_users(collection, query, limit=4))
+        }
+        report["speedup"] = round(report["regex"]["avg_ms"] / report["indexed"]["avg_ms"], 2) \
+            if report["indexed"]["avg_ms"] else None
+
+        if not options["keep"]:
+            collection.drop()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for path in ("regex", "indexed"):
+            row = report[path]
+            self.stdout.write(f"{path:8} avg {row['avg_ms']}ms  p50 {row['p50_ms']}ms  p95 {row['p95_ms']}ms  "
+                              f"({row['queries_with_results']}/{report['queries']} queries found users)")
+        self.stdout.write(self.style.SUCCESS(f"Indexed search is {report['speedup']}x faster"))
@@ -0,0 +1,392 @@
+import inspect
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from unittest import mock
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from config.config import MONGODB, WRITES
+
+SCENARIOS = ("known", "unknown", "inactive", "unassigned")
+DEFAULT_MIX = "known=70,unknown=15,inactive=10,unassigned=5"
+HISTOGRAM_BOUNDS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+ACTIVE_GATE = "LT-GATE-ACTIVE"
+INACTIVE_GATE = "LT-GATE-INACTIVE"
+GRANTED_LEVEL = "Staff"
+UNASSIGNED_LEVEL = "Visitor"
+
+
+class Command(BaseCommand):
+    help = "Drive the /api/access/ tap endpoint in-process and report throughput, latency and per-stage timings"
+    # System checks import the URLconf, which would connect to MongoDB before the stand-in is chosen.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Measured taps")
+        parser.add_argument("--warmup", type=int, default=100, help="Taps run before measuring")
+        parser.add_argument("--concurrency", type=int, default=8, help="Concurrent request threads")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights, e.g. {DEFAULT_MIX}")
+        parser.add_argument("--users", type=int, default=500, help="Seeded users with cards")
+        parser.add_argument("--mongo", choices=("memory", "local"), default="memory",
+                            help="memory uses mongomock, local uses MONGODB_CONNECTION_STRING with a throwaway database")
+        parser.add_argument("--database", default=None, help="Database for --mongo local (default <name>_loadtest)")
+        parser.add_argument("--chain", choices=("none", "eth-tester"), default="none",
+                            help="eth-tester deploys store.sol on an in-process EVM")
+        parser.add_argument("--anchor", action="store_true", help="Drain the anchoring outbox after the run (needs --chain)")
+        parser.add_argument("--profile", choices=("full", "compact", "binary"), default=None,
+                            help="Send X-Response-Profile with every tap")
+        parser.add_argument("--no-cache", action="store_true", help="Disable the authorization cache")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed for cards and tap order")
+        parser.add_argument("--label", default="", help="Free-form label stored with the results")
+        parser.add_argument("--output", default=None, help="Write JSON results to this file")
+        parser.add_argument("--keep-data", action="store_true", help="Do not drop the local load-test database")
+        parser.add_argument("--show-handler-output", action="store_true", help="Keep the tap handler's prints")
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options["mix"])
+        if options["anchor"] and options["chain"] == "none":
+            raise CommandError("--anchor needs --chain eth-tester")
+
+        if options["mongo"] == "memory" and options["concurrency"] > 1:
+            # mongomock is not thread-safe; use --mongo local for concurrent runs.
+            self.stdout.write(self.style.WARNING("mongomock is not thread-safe, running with --concurrency 1"))
+            options["concurrency"] = 1
+
+        # The shared MongoDB client is created on first use, after the stand-in is in place.
+        patcher = self.prepare_mongo(options)
+        try:
+            self.run(options, mix)
+        finally:
+            if patcher:
+                patcher.stop()
+
+    def run(self, options, mix):
+        from rest_framework.test import APIRequestFactory
+        from accesscontrol.connections.mongodb.dbconnect import client, db
+        from accesscontrol.controller.controller import pn532data
+        from accesscontrol.helper.cache import authorization_cache
+        from accesscontrol.helper.decisions import access_matrix
+        from accesscontrol.helper.timing import enable_stage_timing, collect_stage_samples
+
+        if options["chain"] == "eth-tester":
+            self.prepare_chain()
+
+        rng = random.Random(options["seed"])
+        cards = self.seed(db, rng, options["users"])
+        plan = self.build_plan(rng, mix, cards, options["warmup"] + options["requests"])
+
+        authorization_cache.invalidate()
+        if options["no_cache"]:
+            authorization_cache.ttl_seconds = 0
+        access_matrix.reload()
+
+        factory = APIRequestFactory()
+        view = pn532data.as_view()
+
+        headers = {"HTTP_X_RESPONSE_PROFILE": options["profile"]} if options["profile"] else {}
+
+        def tap(item):
+            scenario, payload = item
+            request = factory.post("/api/access/", payload, format="json", **headers)
+            start = time.perf_counter()
+            response = view(request)
+            latency = time.perf_counter() - start
+            return scenario, response.status_code, latency, self.matches_expectation(scenario, response)
+
+        handler_output = sys.stdout if options["show_handler_output"] else open(os.devnull, "w")
+        try:
+            with redirect_stdout(handler_output), ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+                list(executor.map(tap, plan[:options["warmup"]]))
+                enable_stage_timing()
+                collect_stage_samples()
+                started = time.perf_counter()
+                samples = list(executor.map(tap, plan[options["warmup"]:]))
+                elapsed = time.perf_counter() - started
+                enable_stage_timing(False)
+                stages = collect_stage_samples()
+                anchoring = self.drain_outbox() if options["anchor"] else None
+        finally:
+            if handler_output is not sys.stdout:
+                handler_output.close()
+
+        results = self.build_results(options, mix, samples, elapsed, stages, anchoring, authorization_cache.stats())
+
+        if options["mongo"] == "local" and not options["keep_data"]:
+            client.drop_database(db.name)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2, default=str)
+            self.stdout.write(f"Results written to {options['output']}")
+        self.report(results)
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(","):
+            name, _, weight = part.partition("=")
+            name = name.strip()
+            if name not in SCENARIOS:
+                raise CommandError(f"Unknown scenario '{name}', expected one of {', '.join(SCENARIOS)}")
+            try:
+                mix[name] = float(weight)
+            except ValueError:
+                raise CommandError(f"Invalid weight for '{name}': {weight!r}")
+        if sum(mix.values()) <= 0:
+            raise CommandError("Scenario weights must add up to more than zero")
+        return mix
+
+    def prepare_mongo(self, options):
+        from accesscontrol.connections.mongodb.dbconnect import client_initialised
+        if client_initialised():
+            raise CommandError("MongoDB connection was opened before the load-test database could be selected")
+
+        if options["mongo"] == "memory":
+            try:
+                import mongomock
+            except ImportError:
+                raise CommandError("--mongo memory needs mongomock (pip install -r requirements-loadtest.txt)")
+            patcher = mock.patch("pymongo.MongoClient", mongomock.MongoClient)
+            patcher.start()
+            self.patch_mongomock_bulk(mongomock)
+            # A background flush would touch mongomock from a second thread.
+            WRITES["flush_interval_seconds"] = 0
+            return patcher
+
+        database = options["database"] or f"{MONGODB['database_name']}_loadtest"
+        if database == MONGODB["database_name"]:
+            raise CommandError("Refusing to load-test against the application database")
+        MONGODB["database_name"] = database
+        return None
+
+    def patch_mongomock_bulk(self, mongomock):
+        # pymongo >= 4.11 passes sort= to bulk update builders; older mongomock releases reject it.
+        builder = mongomock.collection.BulkOperationBuilder
+        if "sort" in inspect.signature(builder.add_update).parameters:
+            return
+        add_update = builder.add_update
+
+        def add_update_without_sort(self, *args, sort=None, **kwargs):
+            return add_update(self, *args, **kwargs)
+
+        builder.add_update = add_update_without_sort
+
+    def prepare_chain(self):
+        try:
+            from web3 import Web3
+            from solcx import compile_source, get_installed_solc_versions, install_solc
+        except ImportError:
+            raise CommandError("--chain eth-tester needs eth-tester and py-solc-x (pip install -r requirements-loadtest.txt)")
+        from blockchain.modules.connection import blockchain_connection
+
+        with open(os.path.join(settings.BASE_DIR, "blockchain", "sol", "store.sol"), "r") as f:
+            source = f.read()
+        try:
+            if "0.8.0" not in [str(version) for version in get_installed_solc_versions()]:
+                install_solc("0.8.0")
+            interface = compile_source(source, solc_version="0.8.0")["<stdin>:store"]
+        except Exception as e:
+            raise CommandError(f"Could not compile store.sol: {e}")
+
+        w3 = Web3(Web3.EthereumTesterProvider())
+        w3.eth.default_account = w3.eth.accounts[0]
+        factory = w3.eth.contract(abi=interface["abi"], bytecode=interface["bin"])
+        receipt = w3.eth.wait_for_transaction_receipt(factory.constructor().transact())
+        contract = w3.eth.contract(address=receipt.contractAddress, abi=interface["abi"])
+        blockchain_connection.setup_connection(w3=w3, contract=contract)
+        if not blockchain_connection.is_connected():
+            raise CommandError("Could not attach the in-process chain")
+        self.stdout.write(f"In-process chain ready, store deployed at {receipt.contractAddress}")
+
+    def seed(self, db, rng, user_count):
+        from accesscontrol.controller.controller import pn532data
+
+        decoder = pn532data()
+        now = datetime.now()
+        used = set()
+
+        def new_card():
+            while True:
+                uid_hex = ":".join(f"{rng.randrange(256):02X}" for _ in range(4))
+                nfc_id = str(decoder.decode_uid(uid_hex)[2])
+                if nfc_id not in used:
+                    used.add(nfc_id)
+                    return uid_hex, nfc_id
+
+        db.devices.delete_many({"tag_id": {"$in": [ACTIVE_GATE, INACTIVE_GATE]}})
+        db.devices.insert_many([
+            {"tag_id": ACTIVE_GATE, "name": "Load test gate", "location": "Load test", "status": "Active",
+             "assigned_to": [GRANTED_LEVEL], "total_scans": 0, "created_at": now, "updated_at": now},
+            {"tag_id": INACTIVE_GATE, "name": "Load test gate (inactive)", "location": "Load test", "status": "Inactive",
+             "assigned_to": [GRANTED_LEVEL], "total_scans": 0, "created_at": now, "updated_at": now},
+        ])
+
+        cards = {"known": [], "unassigned": [], "unknown": []}
+        users = []
+        unassigned_count = max(1, user_count // 10)
+        for index in range(user_count + unassigned_count):
+            uid_hex, nfc_id = new_card()
+            level = GRANTED_LEVEL if index < user_count else UNASSIGNED_LEVEL
+            cards["known" if level == GRANTED_LEVEL else "unassigned"].append(uid_hex)
+            users.append({
+                "name": f"Load Test {index}",
+                "email": f"loadtest{index}@example.com",
+                "nfc_id": nfc_id,
+                "access_level": level,
+                "active": True,
+                "position": "Load test",
+                "created_at": now,
+                "loadtest": True
+            })
+        db.users.delete_many({"loadtest": True})
+        db.users.insert_many(users)
+        cards["unknown"] = [new_card()[0] for _ in range(max(1, user_count))]
+        self.stdout.write(f"Seeded {len(users)} users and 2 devices")
+        return cards
+
+    def build_plan(self, rng, mix, cards, count):
+        scenarios = list(mix)
+        weights = [mix[name] for name in scenarios]
+        plan = []
+        for scenario in rng.choices(scenarios, weights=weights, k=count):
+            pool = cards["known"] if scenario == "inactive" else cards[scenario]
+            plan.append((scenario, {
+                "uidHex": rng.choice(pool),
+                "uidLength": 4,
+                "gateId": INACTIVE_GATE if scenario == "inactive" else ACTIVE_GATE
+            }))
+        return plan
+
+    def matches_expectation(self, scenario, response):
+        if scenario in ("inactive", "unassigned"):
+            return response.status_code == 403
+        if response.status_code != 200:
+            return False
+        if not hasattr(response, "data"):
+            # Binary profile: byte 1 is the decision code, 0 meaning granted.
+            return (response.content[1] == 0) == (scenario == "known")
+        return response.data.get("user_found") == (scenario == "known")
+
+    def drain_outbox(self, timeout=120):
+        from blockchain.modules.outbox import AnchorWorker, outbox_stats
+
+        worker = AnchorWorker()
+        worker.recover()
+        started = time.perf_counter()
+        submitted = confirmed = 0
+        while time.perf_counter() - started < timeout:
+            batch_submitted, batch_confirmed = worker.process_once()
+            submitted += batch_submitted
+            confirmed += batch_confirmed
+            counts = outbox_stats()
+            if not counts["pending"] and not counts["submitting"] and not counts["submitted"]:
+                break
+        elapsed = time.perf_counter() - started
+        worker.executor.shutdown(wait=True)
+        return {
+            "submitted": submitted,
+            "confirmed": confirmed,
+            "seconds": round(elapsed, 3),
+            "confirmed_per_second": round(confirmed / elapsed, 2) if elapsed else None,
+            "outbox": outbox_stats()
+        }
+
+    def build_results(self, options, mix, samples, elapsed, stages, anchoring, cache_stats):
+        latencies = [latency for _, _, latency, _ in samples]
+        by_scenario = {}
+        for scenario in SCENARIOS:
+            scenario_samples = [sample for sample in samples if sample[0] == scenario]
+            if scenario_samples:
+                by_scenario[scenario] = {
+                    "count": len(scenario_samples),
+                    "unexpected": sum(1 for sample in scenario_samples if not sample[3]),
+                    "status_codes": dict(Counter(str(sample[1]) for sample in scenario_samples)),
+                    "latency_ms": self.summarize([sample[2] for sample in scenario_samples])
+                }
+
+        return {
+            "label": options["label"],
+            "commit": self.git_commit(),
+            "started_at": datetime.now().isoformat(),
+            "config": {
+                "requests": options["requests"],
+                "warmup": options["warmup"],
+                "concurrency": options["concurrency"],
+                "users": options["users"],
+                "mix": mix,
+                "mongo": options["mongo"],
+                "chain": options["chain"],
+                "cache": not options["no_cache"],
+                "profile": options["profile"],
+                "seed": options["seed"]
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_per_second": round(len(samples) / elapsed, 2) if elapsed else None,
+            "unexpected": sum(1 for sample in samples if not sample[3]),
+            "latency_ms": self.summarize(latencies),
+            "histogram_ms": self.histogram(latencies),
+            "scenarios": by_scenario,
+            "stages_ms": {stage: self.summarize(values) for stage, values in stages.items()},
+            "authorization_cache": cache_stats,
+            "anchoring": anchoring
+        }
+
+    def summarize(self, values):
+        if not values:
+            return {}
+        ordered = sorted(values)
+
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+
+        return {
+            "count": len(ordered),
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+            "p50": percentile(50),
+            "p90": percentile(90),
+            "p99": percentile(99),
+            "max": round(ordered[-1] * 1000, 3)
+        }
+
+    def histogram(self, values):
+        buckets = Counter()
+        for value in values:
+            ms = value * 1000
+            bound = next((b for b in HISTOGRAM_BOUNDS_MS if ms <= b), None)
+            buckets[f"le_{bound}" if bound is not None else "inf"] += 1
+        labels = [f"le_{b}" for b in HISTOGRAM_BOUNDS_MS] + ["inf"]
+        return {label: buckets.get(label, 0) for label in labels}
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except Exception:
+            return None
+
+    def report(self, results):
+        latency = results["latency_ms"]
+        self.stdout.write(
+            f"{results['config']['requests']} taps in {results['elapsed_seconds']}s "
+            f"({results['throughput_per_second']}/s), unexpected responses: {results['unexpected']}"
+        )
+        self.stdout.write(
+            f"Latency ms: mean {latency.get('mean')} p50 {latency.get('p50')} "
+            f"p90 {latency.get('p90')} p99 {latency.get('p99')} max {latency.get('max')}"
+        )
+        for stage, summary in results["stages_ms"].items():
+            self.stdout.write(f"  {stage:<14} mean {summary['mean']} p99 {summary['p99']} (n={summary['count']})")
+        if results["anchoring"]:
+            anchoring = results["anchoring"]
+            self.stdout.write(
+                f"Anchoring: {anchoring['confirmed']} confirmed in {anchoring['seconds']}s "
+                f"({anchoring['confirmed_per_second']}/s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Load test complete"))
@@ -0,0 +1,81 @@
+from collections import defaultdict
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from config.config import HISTORY
+from accesscontrol.connections.mongodb.dbconnect import users_collection, access_history_collection
+
+
+class Command(BaseCommand):
+    help = "Move embedded users.access_history arrays into the bucketed access_history collection"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Users migrated per batch")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be migrated without writing")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+        migrated_users = 0
+        migrated_entries = 0
+        last_id = None
+
+        while True:
+            filters = {"access_history.0": {"$exists": True}}
+            if last_id is not None:
+                filters["_id"] = {"$gt": last_id}
+            users = list(users_collection.find(filters, {"access_history": 1}).sort("_id", 1).limit(batch_size))
+            if not users:
+                break
+
+            for user in users:
+                buckets = self.build_buckets(user["_id"], user["access_history"])
+                migrated_entries += len(user["access_history"])
+                if not dry_run:
+                    # Buckets from an interrupted earlier run are replaced, which keeps the command re-runnable.
+                    access_history_collection.delete_many({"user_id": user["_id"], "migrated": True})
+                    if buckets:
+                        access_history_collection.insert_many(buckets, ordered=False)
+                    users_collection.update_one({"_id": user["_id"]}, {"$unset": {"access_history": ""}})
+                migrated_users += 1
+
+            last_id = users[-1]["_id"]
+            self.stdout.write(f"Migrated {migrated_users} users, {migrated_entries} entries so far")
+
+        prefix = "Would migrate" if dry_run else "Migrated"
+        self.stdout.write(self.style.SUCCESS(f"{prefix} {migrated_entries} entries from {migrated_users} users"))
+
+    def build_buckets(self, user_id, history):
+        by_date = defaultdict(list)
+        for entry in history:
+            if not isinstance(entry, dict):
+                continue
+            by_date[self.entry_date(entry)].append(entry)
+
+        buckets = []
+        bucket_size = HISTORY["bucket_size"]
+        for date, entries in sorted(by_date.items()):
+            entries.sort(key=lambda entry: entry.get("access_time", {}).get("unix_time", 0))
+            for start in range(0, len(entries), bucket_size):
+                chunk = entries[start:start + bucket_size]
+                timestamps = [entry["timestamp"] for entry in chunk if isinstance(entry.get("timestamp"), datetime)]
+                buckets.append({
+                    "user_id": user_id,
+                    "date": date,
+                    "count": len(chunk),
+                    "first_timestamp": min(timestamps) if timestamps else None,
+                    "last_timestamp": max(timestamps) if timestamps else None,
+                    "entries": chunk,
+                    "migrated": True
+                })
+        return buckets
+
+    def entry_date(self, entry):
+        date = entry.get("access_time", {}).get("date")
+        if date:
+            return date
+        timestamp = entry.get("timestamp")
+        if isinstance(timestamp, datetime):
+            return timestamp.strftime("%Y-%m-%d")
+        if isinstance(timestamp, str):
+            return timestamp[:10]
+        return "unknown"
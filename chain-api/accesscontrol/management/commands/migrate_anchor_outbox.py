@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from accesscontrol.connections.mongodb.dbconnect import anchor_outbox_collection, accesslog_collection
+from blockchain.modules.outbox import STATUS_PENDING, STATUS_SUBMITTING, STATUS_SUBMITTED
+
+OUTBOX_FIELDS = ("user_id", "payload", "attempts", "last_error", "created_at", "updated_at", "submitted_at", "batch_id")
+
+
+class Command(BaseCommand):
+    help = "Move in-flight entries of the old anchor_outbox collection onto their accesslog documents"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Entries moved per batch")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be moved without writing")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+        moved = 0
+        missing = 0
+        last_id = None
+
+        while True:
+            filters = {"status": {"$in": [STATUS_PENDING, STATUS_SUBMITTING, STATUS_SUBMITTED]}}
+            if last_id is not None:
+                filters["_id"] = {"$gt": last_id}
+            entries = list(anchor_outbox_collection.find(filters).sort("_id", 1).limit(batch_size))
+            if not entries:
+                break
+
+            operations = [self.move(entry) for entry in entries]
+            if not dry_run:
+                result = accesslog_collection.bulk_write(operations, ordered=False)
+                missing += len(entries) - result.matched_count
+                anchor_outbox_collection.delete_many({"_id": {"$in": [entry["_id"] for entry in entries]}})
+            moved += len(entries)
+            last_id = entries[-1]["_id"]
+            self.stdout.write(f"Moved {moved} entries so far")
+
+        if not dry_run:
+            # Confirmed and failed entries were already backfilled onto their accesslog documents.
+            anchor_outbox_collection.delete_many({})
+        prefix = "Would move" if dry_run else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{prefix} {moved} in-flight entries"))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} entries had no accesslog document and were dropped"))
+
+    def move(self, entry):
+        # A claim left by the old worker is requeued rather than resumed.
+        status = STATUS_PENDING if entry["status"] == STATUS_SUBMITTING else entry["status"]
+        fields = {f"outbox.{field}": entry[field] for field in OUTBOX_FIELDS if field in entry}
+        fields["outbox.status"] = status
+        if status == STATUS_SUBMITTED:
+            fields["blockchain_data.tx_hash"] = entry.get("tx_hash")
+            fields["blockchain_data.anchor_status"] = STATUS_SUBMITTED
+        return UpdateOne({"blockchain_data.anchor_id": str(entry["_id"])}, {"$set": fields})
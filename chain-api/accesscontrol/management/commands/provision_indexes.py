@@ -0,0 +1,45 @@
+import json
+from django.core.management.base import BaseCommand
+from accesscontrol.connections.mongodb.indexes import ensure_indexes, explain_shapes
+
+
+class Command(BaseCommand):
+    help = "Create the declared MongoDB indexes and report query shapes that still scan whole collections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report missing indexes")
+        parser.add_argument("--explain-only", action="store_true", help="Skip index creation, only run explain()")
+        parser.add_argument("--skip-explain", action="store_true", help="Do not explain the registered query shapes")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        result = {}
+        if not options["explain_only"]:
+            result["indexes"] = ensure_indexes(dry_run=options["dry_run"])
+        if not options["skip_explain"]:
+            result["query_shapes"] = explain_shapes()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result, indent=2, default=str))
+            return
+
+        for row in result.get("indexes", []):
+            line = f"{row['collection']}.{row['index']}: {row['status']}"
+            if row.get("detail"):
+                line += f" ({row['detail']})"
+            style = self.style.ERROR if row["status"] == "failed" else \
+                self.style.WARNING if row["status"] == "missing" else self.style.SUCCESS
+            self.stdout.write(style(line))
+
+        scans = 0
+        for row in result.get("query_shapes", []):
+            if row["collscan"]:
+                scans += 1
+                self.stdout.write(self.style.WARNING(f"COLLSCAN  {row['shape']} ({row['collection']})"))
+            else:
+                notes = " + in-memory sort" if row["in_memory_sort"] else ""
+                self.stdout.write(f"IXSCAN    {row['shape']} via {', '.join(row['indexes'])}{notes}")
+
+        if "query_shapes" in result:
+            summary = f"{scans} of {len(result['query_shapes'])} query shapes fall back to a collection scan"
+            self.stdout.write(self.style.WARNING(summary) if scans else self.style.SUCCESS(summary))
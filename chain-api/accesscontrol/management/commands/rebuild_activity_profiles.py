@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from accesscontrol.connections.mongodb.dbconnect import access_history_collection, activity_profiles_collection
+from accesscontrol.connections.mongodb.activity import gate_key
+
+
+class Command(BaseCommand):
+    help = "Build the per-user activity profiles from the existing access history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Profiles written per bulk write")
+        parser.add_argument("--dry-run", action="store_true", help="Build the profiles in memory without writing")
+
+    def handle(self, *args, **options):
+        operations = []
+        written = 0
+        scanned = 0
+        current_user, profile = None, None
+
+        def flush_profile():
+            # History only holds granted taps, so denial counters recorded live are left as they are.
+            fields = {"granted": profile["granted"], "hours": profile["hours"],
+                      "first_seen": profile["first_seen"], "last_seen": profile["last_seen"]}
+            for key, gate in profile["gates"].items():
+                fields.update({f"gates.{key}.id": gate["id"], f"gates.{key}.name": gate["name"],
+                               f"gates.{key}.granted": gate["granted"]})
+            operations.append(UpdateOne({"_id": current_user}, {"$set": fields}, upsert=True))
+
+        # One user's buckets at a time, so only one profile is held in memory.
+        cursor = access_history_collection.find({}, {"user_id": 1, "entries.gateId": 1, "entries.gate_name": 1,
+                                                     "entries.timestamp": 1}, batch_size=1000).sort("user_id", 1)
+        for bucket in cursor:
+            if bucket["user_id"] != current_user:
+                if profile:
+                    flush_profile()
+                current_user = bucket["user_id"]
+                profile = {"granted": 0, "hours": {}, "gates": {}, "first_seen": None, "last_seen": None}
+            for entry in bucket.get("entries", []):
+                timestamp = entry.get("timestamp")
+                if not timestamp:
+                    continue
+                profile["granted"] += 1
+                hour = str(timestamp.hour)
+                profile["hours"][hour] = profile["hours"].get(hour, 0) + 1
+                gate = profile["gates"].setdefault(gate_key(entry.get("gateId")),
+                                                   {"id": entry.get("gateId"), "name": entry.get("gate_name"), "granted": 0})
+                gate["granted"] += 1
+                profile["first_seen"] = min(profile["first_seen"] or timestamp, timestamp)
+                profile["last_seen"] = max(profile["last_seen"] or timestamp, timestamp)
+                scanned += 1
+
+            if len(operations) >= options["batch_size"]:
+                if not options["dry_run"]:
+                    activity_profiles_collection.bulk_write(operations, ordered=False)
+                written += len(operations)
+                operations = []
+        if profile:
+            flush_profile()
+        if operations and not options["dry_run"]:
+            activity_profiles_collection.bulk_write(operations, ordered=False)
+        written += len(operations)
+
+        verb = "Would write" if options["dry_run"] else "Wrote"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {written} activity profiles from {scanned} history entries"))
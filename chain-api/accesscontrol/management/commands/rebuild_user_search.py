@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from accesscontrol.connections.mongodb.dbconnect import users_collection
+from accesscontrol.helper.usersearch import search_fields
+
+
+class Command(BaseCommand):
+    help = "Build the search_keys of every user (prefix and trigram keys used by user search)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Users updated per bulk write")
+        parser.add_argument("--missing-only", action="store_true", help="Only users that have no search keys yet")
+
+    def handle(self, *args, **options):
+        filters = {"search_keys": {"$exists": False}} if options["missing_only"] else {}
+        cursor = users_collection.find(filters, {"name": 1, "email": 1, "nfc_id": 1}, batch_size=options["batch_size"])
+        operations = []
+        updated = 0
+        for user in cursor:
+            operations.append(UpdateOne({"_id": user["_id"]}, {"$set": search_fields(user)}))
+            if len(operations) >= options["batch_size"]:
+                users_collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+                self.stdout.write(f"Updated {updated} users")
+        if operations:
+            users_collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+
+        self.stdout.write(self.style.SUCCESS(f"Built search keys for {updated} users"))
@@ -0,0 +1,79 @@
+from collections import defaultdict
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from config.config import VISITORS
+from accesscontrol.helper.hyperloglog import HyperLogLog
+from accesscontrol.connections.mongodb.dbconnect import accesslog_collection, stats_collection
+from accesscontrol.connections.mongodb.visitors import ALL_ID, day_id, gate_day_id, unique_visitors
+
+
+class Command(BaseCommand):
+    help = "Build the unique-visitor HyperLogLog sketches from the existing access logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Sketch documents written per bulk write")
+        parser.add_argument("--dry-run", action="store_true", help="Build the sketches in memory without writing")
+        parser.add_argument("--reset", action="store_true",
+                            help="Delete the stored sketches first (needed after changing VISITORS_HLL_PRECISION)")
+
+    def handle(self, *args, **options):
+        precision = VISITORS["precision"]
+        sketches = defaultdict(lambda: HyperLogLog(precision))
+        fields = {ALL_ID: {"scope": "all"}}
+        scanned = 0
+
+        cursor = accesslog_collection.find(
+            {"nfc_id": {"$nin": [None, "", "None"]}},
+            {"nfc_id": 1, "access_time.date": 1, "gateId": 1, "_id": 0},
+            batch_size=5000
+        )
+        for log in cursor:
+            date = log.get("access_time", {}).get("date")
+            nfc_id = log["nfc_id"]
+            sketches[ALL_ID].add(nfc_id)
+            if date:
+                sketches[day_id(date)].add(nfc_id)
+                fields.setdefault(day_id(date), {"scope": "day", "date": date})
+                if log.get("gateId"):
+                    sketch_id = gate_day_id(log["gateId"], date)
+                    sketches[sketch_id].add(nfc_id)
+                    fields.setdefault(sketch_id, {"scope": "gate_day", "gate": log["gateId"], "date": date})
+            scanned += 1
+            if scanned % 100000 == 0:
+                self.stdout.write(f"Scanned {scanned} access logs")
+
+        self.stdout.write(f"Scanned {scanned} access logs into {len(sketches)} sketches")
+        if options["dry_run"]:
+            estimate = sketches[ALL_ID].count() if ALL_ID in sketches else 0
+            self.stdout.write(self.style.SUCCESS(f"Would write {len(sketches)} sketches, all-time estimate {estimate}"))
+            return
+
+        if options["reset"]:
+            deleted = stats_collection.delete_many({"_id": {"$regex": "^visitors:"}}).deleted_count
+            self.stdout.write(f"Deleted {deleted} stored sketches")
+
+        # $max merges with registers raised by live taps meanwhile, so re-running is safe.
+        operations = []
+        for sketch_id, sketch in sketches.items():
+            registers = {f"registers.{index}": rank for index, rank in sketch.to_fields().items()}
+            operations.append(UpdateOne(
+                {"_id": sketch_id},
+                {"$max": registers, "$setOnInsert": {"precision": precision, **fields[sketch_id]}},
+                upsert=True
+            ))
+            if len(operations) >= options["batch_size"]:
+                stats_collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            stats_collection.bulk_write(operations, ordered=False)
+        # From now on the sketches cover every log, so unique_visitors may use them.
+        stats_collection.update_one(
+            {"_id": ALL_ID},
+            {"$set": {"built_at": datetime.now()}, "$setOnInsert": {"precision": precision, "scope": "all"}},
+            upsert=True
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(sketches)} sketches, all-time estimate {unique_visitors(exact=False)['count']}"
+        ))
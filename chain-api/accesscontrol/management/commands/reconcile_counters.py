@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from accesscontrol.connections.mongodb.counters import reconcile_counters, count_sources, COUNTER_FIELDS, OVERVIEW_ID
+from accesscontrol.connections.mongodb.dbconnect import stats_collection
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized overview counters from the users, devices and accesslog collections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without rewriting the counters")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            stored = stats_collection.find_one({"_id": OVERVIEW_ID}) or {}
+            previous = {field: stored.get(field) for field in COUNTER_FIELDS}
+            current = count_sources()
+        else:
+            previous, current = reconcile_counters()
+
+        drifted = 0
+        for field in COUNTER_FIELDS:
+            if previous[field] == current[field]:
+                self.stdout.write(f"{field}: {current[field]}")
+            else:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f"{field}: {previous[field]} -> {current[field]}"))
+
+        prefix = "Would fix" if options["dry_run"] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{prefix} {drifted} drifted counters" if drifted else "Counters are in sync"))
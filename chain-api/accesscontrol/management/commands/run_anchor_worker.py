@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from blockchain.modules.connection import blockchain_connection
+from blockchain.modules.outbox import AnchorWorker, outbox_stats, release_submitter_lease
+
+
+class Command(BaseCommand):
+    help = "Run the blockchain anchoring outbox worker in the foreground"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Process one round of the outbox and exit")
+
+    def handle(self, *args, **options):
+        worker = AnchorWorker()
+
+        if options["once"]:
+            worker.recover()
+            if not worker.renew_lease():
+                self.stderr.write("Another anchor worker holds the submitter lease; nothing submitted")
+                return
+            submitted, confirmed = worker.process_once()
+            release_submitter_lease(worker.owner)
+            self.stdout.write(f"Submitted {submitted}, confirmed {confirmed}")
+            self.stdout.write(f"Outbox: {outbox_stats()}")
+            self.report_lanes()
+            return
+
+        worker.start()
+        try:
+            while worker.is_alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.stop()
+            worker.join()
+        self.stdout.write(f"Outbox: {outbox_stats()}")
+        self.report_lanes()
+
+    def report_lanes(self):
+        signer_pool = blockchain_connection.get_signer_pool()
+        if not signer_pool:
+            return
+        for lane in signer_pool.stats()["lanes"]:
+            self.stdout.write(
+                f"Lane {lane['account']}: {lane['submitted']} submitted, {lane['errors']} errors, "
+                f"{lane['tx_per_second']} tx/s"
+            )
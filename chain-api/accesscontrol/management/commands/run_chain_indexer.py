@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from blockchain.modules.indexer import ChainIndexer, LEASE_ID, indexer_stats, reset_index
+from blockchain.modules.lease import release_lease
+
+
+class Command(BaseCommand):
+    help = "Run the chain transaction indexer in the foreground"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Index until the current tip and exit")
+        parser.add_argument("--reset", action="store_true", help="Drop the index and start again from CHAIN_INDEXER_START_BLOCK")
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            reset_index()
+            self.stdout.write("Chain index cleared")
+
+        indexer = ChainIndexer()
+        if options["once"]:
+            if not indexer.renew_lease():
+                self.stderr.write("Another chain indexer holds the indexer lease; nothing indexed")
+                return
+            total = 0
+            try:
+                while True:
+                    indexed = indexer.process_once()
+                    total += indexed
+                    if indexed < indexer.blocks_per_round:
+                        break
+                    indexer.renew_lease()
+            finally:
+                release_lease(LEASE_ID, indexer.owner)
+            self.stdout.write(f"Indexed {total} blocks")
+            self.stdout.write(f"Index: {indexer_stats()}")
+            return
+
+        indexer.start()
+        try:
+            while indexer.is_alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            indexer.stop()
+            indexer.join()
+        self.stdout.write(f"Index: {indexer_stats()}")
@@ -0,0 +1,90 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Set by the command: reply text, token rate and the delay before the first token.
+    reply = ""
+    tokens_per_second = 20.0
+    first_token_delay = 0.2
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        pieces = [word + " " for word in self.reply.split()]
+        started = time.monotonic()
+        time.sleep(self.first_token_delay)
+
+        if not body.get("stream", True):
+            time.sleep(len(pieces) / self.tokens_per_second)
+            self.send_json(self.final_chunk(body, "".join(pieces), len(pieces), started))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        eval_started = time.monotonic()
+        try:
+            for piece in pieces:
+                time.sleep(1 / self.tokens_per_second)
+                self.write_chunk({"model": body.get("model"), "response": piece, "done": False})
+            final = self.final_chunk(body, "", len(pieces), started)
+            final["eval_duration"] = int((time.monotonic() - eval_started) * 1e9)
+            self.write_chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (deadline passed or the caller disconnected).
+            self.close_connection = True
+
+    def final_chunk(self, body, response, tokens, started):
+        return {"model": body.get("model"), "response": response, "done": True, "eval_count": tokens,
+                "total_duration": int((time.monotonic() - started) * 1e9)}
+
+    def write_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_json(self, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Serve a stub of Ollama's /api/generate (streaming and non-streaming) for testing the LLM client"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=11435)
+        parser.add_argument("--tokens-per-second", type=float, default=20.0)
+        parser.add_argument("--first-token-delay", type=float, default=0.2, help="Seconds before the first token")
+        parser.add_argument("--reply", default="The user is an active staff member who mostly enters through the main gate.",
+                            help="Text every generation returns, one token per word")
+
+    def handle(self, *args, **options):
+        StubHandler.reply = options["reply"]
+        StubHandler.tokens_per_second = options["tokens_per_second"]
+        StubHandler.first_token_delay = options["first_token_delay"]
+        server = ThreadingHTTPServer((options["host"], options["port"]), StubHandler)
+        server.daemon_threads = True
+        self.stdout.write(f"LLM stub listening on http://{options['host']}:{options['port']} "
+                          f"(set LLM_URL to use it)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
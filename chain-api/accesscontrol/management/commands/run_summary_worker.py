@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from accesscontrol.controller.models.summaries import SummaryWorker, summary_stats
+
+
+class Command(BaseCommand):
+    help = "Run the cached user summary worker in the foreground"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Generate one round of pending summaries and exit")
+
+    def handle(self, *args, **options):
+        worker = SummaryWorker()
+        worker.recover()
+
+        if options["once"]:
+            generated = worker.process_once()
+            self.stdout.write(f"Generated {generated} summaries")
+            self.stdout.write(f"Summaries: {summary_stats()}")
+            return
+
+        worker.start()
+        try:
+            while worker.is_alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.stop()
+            worker.join()
+        self.stdout.write(f"Summaries: {summary_stats()}")
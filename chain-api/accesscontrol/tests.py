@@ -1,3 +1,47 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
+from rest_framework import status
 
-# Create your tests here.
+from .helper.tapresponse import (
+    tap_response, encode_binary, PROFILE_COMPACT, DECISION_CODES, DECISION_GRANTED, DECISION_LEVEL_NOT_ALLOWED
+)
+
+DENIALS = [
+    (DECISION_LEVEL_NOT_ALLOWED, status.HTTP_403_FORBIDDEN),
+    ("device_inactive", status.HTTP_403_FORBIDDEN),
+    ("device_not_found", status.HTTP_404_NOT_FOUND),
+    ("bad_request", status.HTTP_400_BAD_REQUEST),
+    ("unknown_card", status.HTTP_200_OK),
+]
+
+
+def firmware_grants(status_code, body):
+    # Mirrors ServerComm::parseResponse in device-agent/core/server_comm.cpp.
+    granted = body["granted"] if "granted" in body else bool(body.get("user_found"))
+    return 200 <= status_code < 300 and granted
+
+
+class CompactTapResponseTests(SimpleTestCase):
+
+    def test_compact_level_denial_is_never_granted(self):
+        response = tap_response(PROFILE_COMPACT, DECISION_LEVEL_NOT_ALLOWED, "Riza", status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(response.data["granted"])
+        self.assertFalse(response.data["user_found"])
+        self.assertFalse(firmware_grants(response.status_code, response.data))
+
+    def test_compact_denials_are_never_granted(self):
+        for decision, http_status in DENIALS:
+            with self.subTest(decision=decision):
+                response = tap_response(PROFILE_COMPACT, decision, "Riza", http_status)
+                self.assertFalse(response.data["user_found"])
+                self.assertFalse(firmware_grants(response.status_code, response.data))
+                self.assertNotEqual(encode_binary(decision)[1], DECISION_CODES[DECISION_GRANTED])
+
+    def test_firmware_ignores_grant_on_error_status(self):
+        self.assertFalse(firmware_grants(status.HTTP_403_FORBIDDEN, {"granted": True, "user_found": True}))
+
+    def test_compact_grant(self):
+        response = tap_response(PROFILE_COMPACT, DECISION_GRANTED, "Riza")
+        self.assertTrue(response.data["user_found"])
+        self.assertTrue(firmware_grants(response.status_code, response.data))
+        self.assertEqual(response.data["user"], {"name": "Riza"})
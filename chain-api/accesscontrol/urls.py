@@ -1,24 +1,29 @@
 from django.urls import path
-from accesscontrol.controller.controller import pn532data
+from accesscontrol.controller.controller import pn532data, pn532batch
 from accesscontrol.controller.usersdir.userdata import UserListView
-from accesscontrol.controller.accesslogs.accesscontroller import AccessLogsView
+from accesscontrol.controller.accesslogs.accesscontroller import AccessLogsView, AccessLogVerifyView, AccessLogExportView
 from accesscontrol.controller.security.acceslevels import AccessLevelsView
 from accesscontrol.controller.security.alertconfig import AlertConfigView
+from accesscontrol.controller.security.accessmatrix import AccessMatrixView
 from accesscontrol.controller.devicemanagement.device import DeviceManagementView
 from accesscontrol.controller.blockchain.chaininfo import ChainInfoView, BlockchainTransactionsView
 from accesscontrol.controller.settings.setting import SettingsView
-from accesscontrol.controller.main.overiew import OverviewView
+from accesscontrol.controller.main.overiew import OverviewView, VisitorsView
 from accesscontrol.controller.search.users import UserSearchView,UserSummarizeView
 from accesscontrol.authentication.login.access import AccessControlView
 from accesscontrol.authentication.tokens.refresh import RefreshTokenView
 from accesscontrol.authentication.logout.logout import LogoutView
 urlpatterns = [
     path('access/', pn532data.as_view(), name='nfc_data'),
+    path('access/batch/', pn532batch.as_view(), name='nfc_data_batch'),
     path('users/', UserListView.as_view(), name='user_list'),
     path('users/<str:user_id>/', UserListView.as_view(), name='user_detail'),
     path('logs/', AccessLogsView.as_view(), name='access_logs'),
+    path('logs/export/', AccessLogExportView.as_view(), name='access_logs_export'),
+    path('logs/<str:log_id>/verify/', AccessLogVerifyView.as_view(), name='access_log_verify'),
     path('access-levels/', AccessLevelsView.as_view(), name='access_levels_list'),
     path('access-levels/<str:level_id>/', AccessLevelsView.as_view(), name='access_level_detail'),
+    path('access-matrix/', AccessMatrixView.as_view(), name='access_matrix'),
     path('alert-config/', AlertConfigView.as_view(), name='alert_config'),
     path('alert-config/<str:config_id>/', AlertConfigView.as_view(), name='alert_config_detail'),
     path('devices/', DeviceManagementView.as_view(), name='devices'),
@@ -28,6 +33,7 @@ urlpatterns = [
     path('settings/', SettingsView.as_view(), name='settings'),
     path('settings/<str:setting_id>/', SettingsView.as_view(), name='setting_detail'),
     path('overview/', OverviewView.as_view(), name='overview'),
+    path('overview/visitors/', VisitorsView.as_view(), name='overview_visitors'),
     path('search/', UserSearchView.as_view(), name='user_search'),
     path('search/<str:user_id>/', UserSearchView.as_view(), name='user_search_by_id'),
     path('summarize/', UserSummarizeView.as_view(), name='user_summarize_all'),
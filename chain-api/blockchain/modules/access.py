@@ -1,28 +1,60 @@
 """
 Access record storage on blockchain for chaingate project.
 """
-import json
+import time
 import traceback
 from .connection import blockchain_connection
+from .chainreader import chain_reader
+from .merkle import verify_proof
 
-def store_access_record(nfc_id, access_data):
-    w3 = blockchain_connection.get_connection()
+def submit_access_record(nfc_id):
     contract = blockchain_connection.get_contract()
-    
+
     if not blockchain_connection.is_connected() or not contract:
-        print("Blockchain storage skipped: blockchain not enabled")
+        print("Blockchain submission skipped: blockchain not enabled")
         return None
-    
-    try:
-        data_string = json.dumps(access_data)
-        tx_hash = contract.functions.set(int(nfc_id)).transact()
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        return tx_hash.hex()
-    except Exception as e:
-        print(f"Error storing data on blockchain: {e}")
-        traceback.print_exc()
+
+    tx_hash = blockchain_connection.get_signer_pool().submit(contract.functions.set(int(nfc_id)))
+    return tx_hash.hex()
+
+def submit_batch_root(root_hex, batch_id, size):
+    contract = blockchain_connection.get_contract()
+
+    if not blockchain_connection.is_connected() or not contract:
+        print("Blockchain submission skipped: blockchain not enabled")
+        return None
+
+    tx_hash = blockchain_connection.get_signer_pool().submit(contract.functions.storeLog(
+        int(time.time()),
+        root_hex,
+        "merkle-root",
+        f"chaingate:batch:{batch_id}:{size}"
+    ))
+    return tx_hash.hex()
+
+def get_anchored_root(tx_hash):
+    contract = blockchain_connection.get_contract()
+    receipt = get_transaction_receipt(tx_hash)
+
+    if receipt is None or not contract:
         return None
 
+    for event in contract.events.LogStored().process_receipt(receipt):
+        if event["args"]["severity"] == "merkle-root":
+            return event["args"]["logData"]
+    return None
+
+def get_transaction_receipt(tx_hash):
+    receipts = get_transaction_receipts([tx_hash])
+    return receipts[0] if receipts else None
+
+def get_transaction_receipts(tx_hashes):
+    """Receipts for tx_hashes in one pass of batched reads; None for unmined ones."""
+    if not blockchain_connection.is_connected():
+        return [None] * len(tx_hashes)
+
+    return chain_reader.get_transaction_receipts(tx_hashes)
+
 def get_stored_value():
     contract = blockchain_connection.get_contract()
     
@@ -38,21 +70,37 @@ def get_stored_value():
         return None
 
 def verify_transaction(tx_hash):
-    w3 = blockchain_connection.get_connection()
-    
     if not blockchain_connection.is_connected():
         print("Blockchain verification skipped: blockchain not enabled")
         return None
     
     try:
-        if isinstance(tx_hash, str) and tx_hash.startswith('0x'):
-            tx_hash_bytes = bytes.fromhex(tx_hash[2:])
-        else:
-            tx_hash_bytes = tx_hash
-
-        receipt = w3.eth.get_transaction_receipt(tx_hash_bytes)
-        return receipt
+        return get_transaction_receipt(tx_hash)
     except Exception as e:
         print(f"Error verifying transaction: {e}")
         traceback.print_exc()
-        return None
\ No newline at end of file
+        return None
+
+def verify_anchored_event(blockchain_data):
+    merkle = blockchain_data.get("merkle")
+    tx_hash = blockchain_data.get("tx_hash")
+
+    if not merkle or not tx_hash:
+        return {"verified": False, "reason": "Event has not been anchored in a Merkle batch yet"}
+
+    try:
+        proof_valid = verify_proof(merkle["event"], merkle["proof"], merkle["root"])
+        anchored_root = get_anchored_root(tx_hash)
+        return {
+            "verified": proof_valid and anchored_root is not None and anchored_root.lower() == merkle["root"].lower(),
+            "proof_valid": proof_valid,
+            "root": merkle["root"],
+            "anchored_root": anchored_root,
+            "tx_hash": tx_hash,
+            "batch_id": merkle.get("batch_id"),
+            "leaf_index": merkle.get("leaf_index")
+        }
+    except Exception as e:
+        print(f"Error verifying anchored event: {e}")
+        traceback.print_exc()
+        return {"verified": False, "reason": str(e)}
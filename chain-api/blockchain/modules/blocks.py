@@ -0,0 +1,67 @@
+"""
+Block lookups by timestamp.
+
+Block timestamps never decrease, so the first block of a calendar day is
+found by searching over block numbers (a few batched timestamp reads through
+ChainReader) rather than by reading every block. The boundary is cached for
+the current day: once known, "blocks mined today" is
+latest_block - boundary + 1.
+"""
+import threading
+from datetime import datetime, time
+
+_day_cache = {}
+_day_lock = threading.Lock()
+
+
+def day_start_timestamp(day):
+    return int(datetime.combine(day, time.min).timestamp())
+
+def first_block_since(reader, timestamp, low, high):
+    """Lowest block number in [low, high] mined at or after timestamp, or None.
+
+    Each round reads up to reader.batch_size evenly spaced timestamps in one
+    batch request and keeps the gap holding the boundary.
+    """
+    if low > high:
+        return None
+    probes = max(2, reader.batch_size)
+    while True:
+        count = high - low + 1
+        if count <= probes:
+            points = list(range(low, high + 1))
+        else:
+            points = sorted({low + (count - 1) * i // (probes - 1) for i in range(probes)})
+        stamps = reader.get_block_timestamps(points)
+        match = next((index for index, stamp in enumerate(stamps) if stamp >= timestamp), None)
+        if match is None:
+            return None
+        if match == 0 or points[match] - points[match - 1] == 1:
+            return points[match]
+        low, high = points[match - 1] + 1, points[match]
+
+def blocks_mined_on_day(reader, latest_block, day=None, chain_key=None):
+    """Number of blocks up to latest_block that were mined on day (default today).
+
+    The cache keeps either the day's first block or, while none has been
+    mined yet, the highest block already known to predate the day, so a
+    repeat call only searches blocks it has not seen.
+    """
+    day = day or datetime.now().date()
+    with _day_lock:
+        cached = _day_cache.get(chain_key)
+        if cached is None or cached["day"] != day or latest_block < cached["checked"]:
+            # New day, or the node was reset underneath us.
+            cached = {"day": day, "boundary": None, "checked": -1}
+
+        if cached["boundary"] is None:
+            cached["boundary"] = first_block_since(reader, day_start_timestamp(day), cached["checked"] + 1, latest_block)
+            if cached["boundary"] is None:
+                cached["checked"] = latest_block
+            else:
+                cached["checked"] = cached["boundary"]
+        _day_cache[chain_key] = cached
+
+        if cached["boundary"] is None:
+            return 0
+        return latest_block - cached["boundary"] + 1
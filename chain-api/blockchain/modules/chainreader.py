@@ -0,0 +1,134 @@
+"""
+Batched, concurrent chain reads.
+
+Scanning blocks or checking receipts one call at a time costs one HTTP round
+trip per call. ChainReader groups calls into JSON-RPC batch requests of
+batch_size and runs independent batches on a bounded thread pool.
+
+web3 keeps batching state on the provider, so every worker thread batches
+through its own Web3, all on the pooled connections of provider.py.
+Providers that cannot batch (e.g. the in-process eth-tester chain) fall
+back to one call at a time.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound
+from web3.providers import HTTPProvider
+from web3.types import RPCEndpoint
+from web3._utils.method_formatters import receipt_formatter
+from config.config import CHAIN_READER
+from .connection import blockchain_connection
+from .provider import new_web3
+
+
+class ChainReader:
+
+    def __init__(self, w3=None, batch_size=None, max_workers=None):
+        self.w3 = w3
+        self.batch_size = max(1, batch_size or CHAIN_READER["batch_size"])
+        self.max_workers = max(1, max_workers or CHAIN_READER["max_workers"])
+        self._local = threading.local()
+        self._executor = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.requests = 0
+
+    def connection(self):
+        return self.w3 or blockchain_connection.get_connection()
+
+    def supports_batching(self, w3):
+        return isinstance(w3.provider, HTTPProvider)
+
+    def thread_connection(self):
+        w3 = self.connection()
+        if not self.supports_batching(w3):
+            return w3
+        endpoint = w3.provider.endpoint_uri
+        if getattr(self._local, "endpoint", None) != endpoint:
+            self._local.w3 = new_web3(endpoint)
+            self._local.endpoint = endpoint
+        return self._local.w3
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chain-read")
+            return self._executor
+
+    def count(self, calls, requests):
+        with self._lock:
+            self.calls += calls
+            self.requests += requests
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "requests": self.requests,
+                    "batch_size": self.batch_size, "max_workers": self.max_workers}
+
+    def run_chunk(self, calls):
+        """Run [(eth method name, args), ...] as one batch; results in call order."""
+        w3 = self.thread_connection()
+        if self.supports_batching(w3) and len(calls) > 1:
+            with w3.batch_requests() as batch:
+                for name, args in calls:
+                    batch.add(getattr(w3.eth, name)(*args))
+                results = batch.execute()
+            self.count(len(calls), 1)
+            return results
+        results = [getattr(w3.eth, name)(*args) for name, args in calls]
+        self.count(len(calls), len(calls))
+        return results
+
+    def run_receipt_chunk(self, tx_hashes):
+        w3 = self.thread_connection()
+        if not self.supports_batching(w3) or len(tx_hashes) == 1:
+            receipts = []
+            for tx_hash in tx_hashes:
+                try:
+                    receipts.append(w3.eth.get_transaction_receipt(tx_hash))
+                except TransactionNotFound:
+                    receipts.append(None)
+            self.count(len(tx_hashes), len(tx_hashes))
+            return receipts
+
+        # web3's batch fails as a whole when one receipt is missing (pending
+        # transactions are the common case here), so the batch is sent raw and
+        # only the receipts that exist go through web3's receipt formatter.
+        responses = w3.provider.make_batch_request(
+            [(RPCEndpoint("eth_getTransactionReceipt"), [tx_hash]) for tx_hash in tx_hashes]
+        )
+        self.count(len(tx_hashes), 1)
+        if not isinstance(responses, list):
+            raise RuntimeError(f"Receipt batch failed: {responses.get('error')}")
+        receipts = []
+        for response in responses:
+            if response.get("error"):
+                raise RuntimeError(f"Receipt batch failed: {response['error']}")
+            result = response.get("result")
+            receipts.append(AttributeDict.recursive(receipt_formatter(result)) if result else None)
+        return receipts
+
+    def run(self, items, runner=None):
+        runner = runner or self.run_chunk
+        chunks = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        if len(chunks) <= 1 or self.max_workers == 1 or not self.supports_batching(self.connection()):
+            results = [runner(chunk) for chunk in chunks]
+        else:
+            results = list(self.executor().map(runner, chunks))
+        return [result for chunk in results for result in chunk]
+
+    def get_blocks(self, numbers, full_transactions=False):
+        return self.run([("get_block", (number, full_transactions)) for number in numbers])
+
+    def get_block_timestamps(self, numbers):
+        return [block.timestamp for block in self.get_blocks(numbers)]
+
+    def get_transaction_receipts(self, tx_hashes):
+        """Receipts in tx_hashes order; None for transactions that are not mined yet."""
+        tx_hashes = [tx_hash if not isinstance(tx_hash, str) or tx_hash.startswith("0x") else "0x" + tx_hash
+                     for tx_hash in tx_hashes]
+        return self.run(tx_hashes, self.run_receipt_chunk)
+
+
+chain_reader = ChainReader()
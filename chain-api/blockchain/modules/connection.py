@@ -1,27 +1,48 @@
 import os
 import ast
+import threading
 import traceback
-from web3 import Web3
 from config.config import BLOCKCHAIN
+from .signer import SignerPool
+from .provider import shared_web3
 
 class BlockchainConnection:
     
     def __init__(self):
+        # Connected on first use rather than at import, so importing views or
+        # tooling (e.g. the load-test harness) never reaches out to the node.
         self.blockchain_enabled = False
         self.w3 = None
         self.contract = None
-        self.setup_connection()
+        self.signer_pool = None
+        self._initialised = False
+        self._setup_lock = threading.Lock()
     
-    def setup_connection(self):
+    def ensure_connection(self):
+        if self._initialised:
+            return
+        with self._setup_lock:
+            if not self._initialised:
+                self.setup_connection()
+    
+    def setup_connection(self, w3=None, contract=None):
+        # w3/contract let tooling (e.g. the load-test harness) attach an in-process chain.
+        self._initialised = True
         try:
-            self.w3 = Web3(Web3.HTTPProvider(BLOCKCHAIN["provider"]))
-            self.w3.eth.default_account = self.w3.eth.accounts[BLOCKCHAIN["account_index"]]
+            self.w3 = w3 or shared_web3()
+            accounts = self.w3.eth.accounts
+            first = BLOCKCHAIN["account_index"]
+            self.w3.eth.default_account = accounts[first]
+            self.signer_pool = SignerPool(self.w3, accounts[first:first + max(1, BLOCKCHAIN["signer_accounts"])])
             
             blockchain_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             contract_address_path = os.path.join(blockchain_dir, BLOCKCHAIN["contract_files"]["address"])
             contract_abi_path = os.path.join(blockchain_dir, BLOCKCHAIN["contract_files"]["abi"])
             
-            if os.path.exists(contract_address_path) and os.path.exists(contract_abi_path):
+            if contract is not None:
+                self.contract = contract
+                self.blockchain_enabled = self.w3.is_connected()
+            elif os.path.exists(contract_address_path) and os.path.exists(contract_abi_path):
                 with open(contract_address_path, "r") as f:
                     contract_address = f.read().strip()
                 
@@ -40,12 +61,19 @@ class BlockchainConnection:
             self.blockchain_enabled = False
     
     def is_connected(self):
+        self.ensure_connection()
         return self.blockchain_enabled
     
     def get_connection(self):
+        self.ensure_connection()
         return self.w3
     
     def get_contract(self):
+        self.ensure_connection()
         return self.contract
 
+    def get_signer_pool(self):
+        self.ensure_connection()
+        return self.signer_pool
+
 blockchain_connection = BlockchainConnection()
\ No newline at end of file
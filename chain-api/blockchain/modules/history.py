@@ -1,85 +1,88 @@
 """
 User access history module for chaingate project.
+
+History entries live in the access_history collection, bucketed as one
+document per user per day holding at most HISTORY["bucket_size"] entries.
 """
 import traceback
 from datetime import datetime
 from bson import ObjectId
-from accesscontrol.connections.mongodb.dbconnect import users_collection
+from pymongo import UpdateOne
+from config.config import HISTORY
+from accesscontrol.connections.mongodb.dbconnect import access_history_collection
+
+def build_history_entry(access_data, tx_hash, gateId=None, GateName=None, location=None, anchor_id=None, timestamp=None):
+    timestamp = timestamp or datetime.now()
+    return {
+        "gate_name": GateName,
+        "location": location,
+        "gateId": gateId,
+        "timestamp": timestamp,
+        "access_time": {
+            "date": timestamp.strftime("%Y-%m-%d"),
+            "time": timestamp.strftime("%H:%M:%S"),
+            "unix_time": int(timestamp.timestamp())
+        },
+        "nfc_id": access_data.get("nfc_id"),
+        "card_data": {
+            "hex_uid": access_data.get("device_info", {}).get("original_uid"),
+            "processed_hex": access_data.get("device_info", {}).get("processed_uid")
+        },
+        "blockchain_data": {
+            "tx_hash": tx_hash,
+            "anchor_id": anchor_id,
+            "anchor_status": "confirmed" if tx_hash else "pending",
+            "block_time": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "stored_value": access_data.get("nfc_id")
+        },
+        "access_status": "granted",
+        "access_method": "nfc_card",
+        "success": True
+    }
+
+def history_bucket_update(user_id, entry):
+    if isinstance(user_id, str):
+        user_id = ObjectId(user_id)
 
-def update_access_history(user_id, access_data, tx_hash, gateId=None, GateName=None, location=None):
+    # A full bucket no longer matches the filter, so the upsert opens a new one.
+    return UpdateOne(
+        {"user_id": user_id, "date": entry["access_time"]["date"], "count": {"$lt": HISTORY["bucket_size"]}},
+        {
+            "$push": {"entries": entry},
+            "$inc": {"count": 1},
+            "$min": {"first_timestamp": entry["timestamp"]},
+            "$max": {"last_timestamp": entry["timestamp"]}
+        },
+        upsert=True
+    )
+
+def backfill_access_history(user_id, anchor_id, tx_hash, anchor_status, block_number=None):
     try:
-        timestamp = datetime.now()
-        history_entry = {
-            "gate_name": GateName,
-            "location": location,
-            "gateId": gateId,
-            "timestamp": timestamp,
-            "access_time": {
-                "date": timestamp.strftime("%Y-%m-%d"),
-                "time": timestamp.strftime("%H:%M:%S"),
-                "unix_time": int(timestamp.timestamp())
-            },
-            "nfc_id": access_data.get("nfc_id"),
-            "card_data": {
-                "hex_uid": access_data.get("device_info", {}).get("original_uid"),
-                "processed_hex": access_data.get("device_info", {}).get("processed_uid")
-            },
-            "blockchain_data": {
-                "tx_hash": tx_hash,
-                "block_time": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                "stored_value": access_data.get("nfc_id")
-            },
-            "access_status": "granted",
-            "access_method": "nfc_card",
-            "success": True
-        }
-        
         if isinstance(user_id, str):
-            try:
-                user_id = ObjectId(user_id)
-                print(f"Converted user_id string to ObjectId: {user_id}")
-            except Exception as e:
-                print(f"Error converting user_id to ObjectId: {e}")
-        
-        user = users_collection.find_one({"_id": user_id})
-        
-        if not user:
-            print(f"User not found with ID: {user_id}")
-            return False
-        
-        print(f"Found user: {user.get('name', 'Unknown')} with ID: {user_id}")
+            user_id = ObjectId(user_id)
 
-        if "access_history" not in user:
-            print(f"Creating new access_history field for user {user_id}")
-            result = users_collection.update_one(
-                {"_id": user_id},
-                {"$set": {"access_history": [history_entry]}}
-            )
-        else:
-            print(f"Appending to existing access_history for user {user_id}")
-            result = users_collection.update_one(
-                {"_id": user_id},
-                {"$push": {"access_history": history_entry}}
-            )
-        
-        if result.matched_count > 0:
-            print(f"User document matched for update: {result.matched_count}")
-        else:
-            print(f"No user document matched for update")
-        
-        if result.modified_count > 0:
-            print(f"Access history updated for user {user_id}")
-            return True
-        else:
-            print(f"Failed to update access history for user {user_id}")
-            return False
-            
+        result = access_history_collection.update_one(
+            {"user_id": user_id, "entries.blockchain_data.anchor_id": anchor_id},
+            {"$set": {
+                "entries.$.blockchain_data.tx_hash": tx_hash,
+                "entries.$.blockchain_data.anchor_status": anchor_status,
+                "entries.$.blockchain_data.block_number": block_number
+            }}
+        )
+        return result.modified_count > 0
     except Exception as e:
-        print(f"Error updating user history: {e}")
+        print(f"Error backfilling access history for user {user_id}: {e}")
         traceback.print_exc()
         return False
 
-def get_access_history(user_id, limit=10):
+def entry_time(entry):
+    # Migrated entries may lack a datetime timestamp; fall back to their unix_time.
+    timestamp = entry.get("timestamp")
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return entry.get("access_time", {}).get("unix_time", 0)
+
+def get_access_history(user_id, limit=10, start_date=None, end_date=None):
     try:
         if isinstance(user_id, str):
             try:
@@ -88,18 +91,36 @@ def get_access_history(user_id, limit=10):
                 print(f"Error converting user_id to ObjectId: {e}")
                 return None
         
-        user = users_collection.find_one(
-            {"_id": user_id},
-            {"access_history": {"$slice": -limit}}
-        )
+        filters = {"user_id": user_id}
+        if start_date or end_date:
+            date_filter = {}
+            if start_date:
+                date_filter["$gte"] = start_date
+            if end_date:
+                date_filter["$lte"] = end_date
+            filters["date"] = date_filter
         
-        if not user:
-            print(f"User not found with ID: {user_id}")
-            return None
+        # Buckets come newest first and a bucket holds nothing newer than its last_timestamp, so
+        # the walk can stop once the next bucket is older than the limit-th newest entry so far.
+        entries = []
+        buckets = access_history_collection.find(filters, {"entries": 1, "last_timestamp": 1}).sort(
+            [("date", -1), ("last_timestamp", -1)]
+        )
+        for bucket in buckets:
+            last_timestamp = bucket.get("last_timestamp")
+            if limit and len(entries) >= limit and isinstance(last_timestamp, datetime) \
+                    and last_timestamp.timestamp() < entry_time(entries[limit - 1]):
+                buckets.close()
+                break
+            # Entries are pushed as they are flushed, not strictly in time order.
+            entries.extend(reversed(bucket.get("entries", [])))
+            entries.sort(key=entry_time, reverse=True)
+            if limit:
+                entries = entries[:limit]
         
-        return user.get("access_history", [])
+        return entries[::-1]
     
     except Exception as e:
         print(f"Error retrieving user access history: {e}")
         traceback.print_exc()
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,205 @@
+"""
+Local index of chain transactions.
+
+A background worker tails new blocks and copies their transactions into the
+chain_transactions collection, so BlockchainTransactionsView can page and
+filter from MongoDB instead of re-downloading blocks on every request.
+
+Documents are keyed by chain position ("<block>:<tx index>", zero padded), so
+_id order is chain order. The last indexed height and its block hash are kept
+in the stats collection; the worker resumes from there after a restart, and
+re-indexes the last reorg_depth blocks if that hash is no longer canonical.
+
+Only one indexer runs at a time: every one (per serving process or
+run_chain_indexer) competes for a lease in the stats collection, and the
+tip is only moved from the exact tip the round started from, so a late
+writer can neither move it backwards nor repeat a reorg rewind.
+"""
+import threading
+import traceback
+import uuid
+from datetime import datetime
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from config.config import CHAIN_INDEXER
+from accesscontrol.connections.mongodb.dbconnect import chain_transactions_collection, stats_collection
+from .connection import blockchain_connection
+from .chainreader import ChainReader, chain_reader
+from .lease import acquire_lease, release_lease
+
+STATE_ID = "chain_indexer"
+LEASE_ID = "lease:chain-indexer"
+
+
+def position_id(block_number, tx_index):
+    return f"{block_number:012d}:{tx_index:06d}"
+
+def to_hex(value):
+    if value is None:
+        return None
+    hexed = value.hex() if hasattr(value, "hex") else str(value)
+    return hexed if hexed.startswith("0x") else "0x" + hexed
+
+def transaction_document(block, tx_index, tx):
+    gas_price = tx.get("gasPrice")
+    return {
+        "_id": position_id(block.number, tx_index),
+        "hash": to_hex(tx.hash),
+        "block": block.number,
+        "block_hash": to_hex(block.hash),
+        "tx_index": tx_index,
+        "from": tx["from"],
+        "to": tx.get("to"),
+        "value_wei": str(tx.value),
+        "gas": tx.gas,
+        "gas_price": str(gas_price) if gas_price is not None else None,
+        "nonce": tx.nonce,
+        "timestamp": datetime.fromtimestamp(block.timestamp),
+        "indexed_at": datetime.now()
+    }
+
+def read_state():
+    return stats_collection.find_one({"_id": STATE_ID}) or {}
+
+def save_state(block_number, block_hash, chain_id, previous):
+    """Move the tip on from previous (the state the round started from); False if it has moved since."""
+    if "block" in previous:
+        expected = {"block": previous["block"], "block_hash": previous.get("block_hash")}
+    else:
+        expected = {"block": {"$exists": False}}
+    try:
+        result = stats_collection.update_one(
+            {"_id": STATE_ID, **expected},
+            {"$set": {"block": block_number, "block_hash": block_hash, "chain_id": chain_id, "updated_at": datetime.now()}},
+            upsert="block" not in previous
+        )
+    except DuplicateKeyError:
+        return False
+    return result.matched_count > 0 or result.upserted_id is not None
+
+def reset_index():
+    chain_transactions_collection.delete_many({})
+    stats_collection.delete_one({"_id": STATE_ID})
+
+
+class ChainIndexer(threading.Thread):
+
+    def __init__(self, w3=None, poll_interval=None, blocks_per_round=None):
+        super().__init__(name="chain-indexer", daemon=True)
+        self.w3 = w3
+        self._reader = None
+        self.poll_interval = poll_interval or CHAIN_INDEXER["poll_interval_seconds"]
+        self.blocks_per_round = blocks_per_round or CHAIN_INDEXER["blocks_per_round"]
+        self._stop_event = threading.Event()
+        self.owner = uuid.uuid4().hex
+        self.has_lease = False
+
+    def connection(self):
+        return self.w3 or blockchain_connection.get_connection()
+
+    def reader(self):
+        if self.w3 is None:
+            return chain_reader
+        if self._reader is None:
+            self._reader = ChainReader(w3=self.w3)
+        return self._reader
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        print("Chain indexer started")
+        while not self._stop_event.is_set():
+            indexed = 0
+            try:
+                if self.renew_lease():
+                    w3 = self.connection()
+                    if w3 is not None and w3.is_connected():
+                        indexed = self.process_once()
+            except Exception as e:
+                print(f"Chain indexer error: {e}")
+                traceback.print_exc()
+            # Keep going without waiting while catching up with the tip.
+            if indexed < self.blocks_per_round:
+                self._stop_event.wait(self.poll_interval)
+        if self.has_lease:
+            release_lease(LEASE_ID, self.owner)
+        print("Chain indexer stopped")
+
+    def renew_lease(self):
+        held = acquire_lease(LEASE_ID, self.owner, CHAIN_INDEXER["lease_seconds"])
+        if held != self.has_lease:
+            print(f"Chain indexer {'took' if held else 'lost'} the indexer lease")
+        self.has_lease = held
+        return held
+
+    def resume_from(self, w3, latest_block):
+        """(next block, chain id, state to move the tip on from), after checking the stored tip is still canonical."""
+        state = read_state()
+        chain_id = w3.eth.chain_id
+        if "block" not in state:
+            return CHAIN_INDEXER["start_block"], chain_id, state
+
+        if state.get("chain_id") != chain_id or state["block"] > latest_block:
+            # Different chain or a restarted dev node: the stored index describes blocks that no longer exist.
+            print(f"Chain indexer: chain changed (stored tip {state['block']}, node tip {latest_block}), reindexing")
+            reset_index()
+            return CHAIN_INDEXER["start_block"], chain_id, {}
+
+        if to_hex(w3.eth.get_block(state["block"]).hash) != state.get("block_hash"):
+            rewind = max(CHAIN_INDEXER["start_block"], state["block"] - CHAIN_INDEXER["reorg_depth"])
+            print(f"Chain indexer: block {state['block']} was reorganised, re-indexing from {rewind}")
+            chain_transactions_collection.delete_many({"block": {"$gte": rewind}})
+            return rewind, chain_id, state
+
+        return state["block"] + 1, chain_id, state
+
+    def process_once(self):
+        """Index up to blocks_per_round new blocks; returns how many blocks were indexed."""
+        w3 = self.connection()
+        latest_block = w3.eth.block_number
+        start, chain_id, state = self.resume_from(w3, latest_block)
+        end = min(latest_block, start + self.blocks_per_round - 1)
+        if start > end:
+            return 0
+
+        operations = []
+        blocks = self.reader().get_blocks(list(range(start, end + 1)), full_transactions=True)
+        for block in blocks:
+            for tx_index, tx in enumerate(block.transactions):
+                document = transaction_document(block, tx_index, tx)
+                # Replace keeps a re-indexed block idempotent.
+                operations.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+
+        if operations:
+            chain_transactions_collection.bulk_write(operations, ordered=False)
+        if not save_state(end, to_hex(blocks[-1].hash), chain_id, state):
+            print(f"Chain indexer: tip moved by another indexer while indexing {start}-{end}, not saving")
+            return 0
+        return end - start + 1
+
+
+_indexer = None
+_indexer_lock = threading.Lock()
+
+def start_chain_indexer():
+    global _indexer
+    with _indexer_lock:
+        if _indexer is None or not _indexer.is_alive():
+            _indexer = ChainIndexer()
+            _indexer.start()
+        return _indexer
+
+def stop_chain_indexer():
+    with _indexer_lock:
+        if _indexer is not None:
+            _indexer.stop()
+
+def indexer_stats():
+    state = read_state()
+    return {
+        "indexed_block": state.get("block"),
+        "chain_id": state.get("chain_id"),
+        "updated_at": state.get("updated_at").isoformat() if state.get("updated_at") else None,
+        "transactions": chain_transactions_collection.estimated_document_count()
+    }
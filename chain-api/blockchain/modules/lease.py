@@ -0,0 +1,30 @@
+"""
+Single-holder leases for background workers.
+
+A lease is a document in the stats collection naming its owner and when it
+expires. A worker renews it every round; another one can only take it over
+once it has expired, so a dead holder is replaced after at most one lease
+period.
+"""
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from accesscontrol.connections.mongodb.dbconnect import stats_collection
+
+
+def acquire_lease(lease_id, owner, seconds):
+    """Take or renew the lease; False while another live worker holds it."""
+    now = datetime.now()
+    try:
+        lease = stats_collection.find_one_and_update(
+            {"_id": lease_id, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "renewed_at": now, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The lease exists and is held by someone else, so the upsert tried to insert a second one.
+        return False
+    return lease is not None and lease["owner"] == owner
+
+def release_lease(lease_id, owner):
+    stats_collection.delete_one({"_id": lease_id, "owner": owner})
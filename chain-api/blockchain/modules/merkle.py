@@ -0,0 +1,65 @@
+"""
+Merkle tree helpers for batched blockchain anchoring.
+
+Leaves and inner nodes are keccak256 hashes with a one byte domain prefix so a
+leaf can never be passed off as an inner node. An odd node at the end of a
+level is promoted to the next level unchanged.
+"""
+import json
+from web3 import Web3
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def canonical_event(event):
+    return json.dumps(event, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+def leaf_hash(event):
+    return Web3.keccak(LEAF_PREFIX + canonical_event(event))
+
+def node_hash(left, right):
+    return Web3.keccak(NODE_PREFIX + left + right)
+
+def build_tree(events):
+    if not events:
+        raise ValueError("Cannot build a Merkle tree without events")
+
+    levels = [[leaf_hash(event) for event in events]]
+    while len(levels[-1]) > 1:
+        current = levels[-1]
+        parents = []
+        for i in range(0, len(current), 2):
+            if i + 1 < len(current):
+                parents.append(node_hash(current[i], current[i + 1]))
+            else:
+                parents.append(current[i])
+        levels.append(parents)
+    return levels
+
+def merkle_root(levels):
+    return levels[-1][0]
+
+def merkle_proof(levels, index):
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({
+                "position": "left" if sibling < index else "right",
+                "hash": to_hex(level[sibling])
+            })
+        index //= 2
+    return proof
+
+def verify_proof(event, proof, root):
+    computed = leaf_hash(event)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"].removeprefix("0x"))
+        if step["position"] == "left":
+            computed = node_hash(sibling, computed)
+        else:
+            computed = node_hash(computed, sibling)
+    return to_hex(computed) == root.lower()
+
+def to_hex(value):
+    return "0x" + value.hex().removeprefix("0x")
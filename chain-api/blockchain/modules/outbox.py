@@ -0,0 +1,333 @@
+"""
+Durable anchoring outbox for chaingate project.
+
+Taps are logged to MongoDB straight away, and each accesslog document
+carries its own outbox state in an "outbox" field, so logging a tap and
+queueing it for anchoring is a single insert. A background worker submits
+the queued documents to the contract, tracks their receipts and backfills
+the resulting tx hash onto the accesslog document and the user's
+access_history entry. The outbox field is removed once the anchor is
+confirmed, so only in-flight documents carry it.
+
+In "batch" mode the worker collects pending entries over a time or size
+window, anchors the Merkle root of their payloads with a single storeLog()
+transaction and stores each entry's inclusion proof on its accesslog document.
+
+Signer lanes count nonces in memory, so only one process may submit at a
+time: every worker (one per gunicorn process, or run_anchor_worker) competes
+for a lease document in the stats collection and only the holder submits.
+"""
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from config.config import ANCHOR
+from accesscontrol.connections.mongodb.dbconnect import anchor_batches_collection, accesslog_collection
+from .connection import blockchain_connection
+from .access import submit_access_record, submit_batch_root, get_transaction_receipts
+from .merkle import build_tree, merkle_root, merkle_proof, to_hex
+from .history import backfill_access_history
+from .lease import acquire_lease, release_lease
+
+STATUS_PENDING = "pending"
+STATUS_SUBMITTING = "submitting"
+STATUS_SUBMITTED = "submitted"
+STATUS_CONFIRMED = "confirmed"
+STATUS_FAILED = "failed"
+
+LEASE_ID = "lease:anchor-submitter"
+
+def build_outbox_state(access_data, user_id=None):
+    """The "outbox" field of a queued accesslog document."""
+    now = datetime.now()
+    return {
+        "status": STATUS_PENDING,
+        "user_id": user_id,
+        "payload": access_data,
+        "attempts": 0,
+        "last_error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def anchor_id_of(entry):
+    return entry["blockchain_data"]["anchor_id"]
+
+def acquire_submitter_lease(owner):
+    """Take or renew the submitter lease; False while another live worker holds it."""
+    return acquire_lease(LEASE_ID, owner, ANCHOR["lease_seconds"])
+
+def release_submitter_lease(owner):
+    release_lease(LEASE_ID, owner)
+
+def backfill_anchor(entry, tx_hash, status, block_number=None):
+    # The accesslog document is the outbox entry, so its fields were set with the status change.
+    if entry["outbox"].get("user_id"):
+        backfill_access_history(entry["outbox"]["user_id"], anchor_id_of(entry), tx_hash, status, block_number)
+
+
+class AnchorWorker(threading.Thread):
+
+    def __init__(self, poll_interval=None, batch_size=None):
+        super().__init__(name="anchor-worker", daemon=True)
+        self.poll_interval = poll_interval or ANCHOR["poll_interval_seconds"]
+        self.batch_size = batch_size or ANCHOR["batch_size"]
+        self._stop_event = threading.Event()
+        self.owner = uuid.uuid4().hex
+        self.has_lease = False
+        pool = blockchain_connection.get_signer_pool()
+        self.executor = ThreadPoolExecutor(max_workers=len(pool) if pool else 1, thread_name_prefix="anchor-submit")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        print("Anchor worker started")
+        last_recover = None
+        while not self._stop_event.is_set():
+            try:
+                # Claims left by a crashed worker only go stale after claim_timeout, so sweep on a timer.
+                if last_recover is None or time.monotonic() - last_recover >= ANCHOR["recover_interval_seconds"]:
+                    self.recover()
+                    last_recover = time.monotonic()
+                if self.renew_lease() and blockchain_connection.is_connected():
+                    self.process_once()
+            except Exception as e:
+                print(f"Anchor worker error: {e}")
+                traceback.print_exc()
+            self._stop_event.wait(self.poll_interval)
+        self.executor.shutdown(wait=True)
+        if self.has_lease:
+            release_submitter_lease(self.owner)
+        print("Anchor worker stopped")
+
+    def renew_lease(self):
+        held = acquire_submitter_lease(self.owner)
+        if held != self.has_lease:
+            print(f"Anchor worker {'took' if held else 'lost'} the submitter lease")
+        self.has_lease = held
+        return held
+
+    def recover(self):
+        # Entries claimed by a worker that died before recording a tx hash go back to the queue.
+        cutoff = datetime.now() - timedelta(seconds=ANCHOR["claim_timeout_seconds"])
+        result = accesslog_collection.update_many(
+            {"outbox.status": STATUS_SUBMITTING, "outbox.claimed_at": {"$lt": cutoff}},
+            {"$set": {"outbox.status": STATUS_PENDING, "outbox.updated_at": datetime.now()}}
+        )
+        if result.modified_count:
+            print(f"Requeued {result.modified_count} stale anchor entries")
+
+    def process_once(self):
+        if ANCHOR["mode"] == "batch":
+            submitted = self.process_batch()
+        else:
+            entries = []
+            for _ in range(self.batch_size):
+                entry = self.claim_next()
+                if not entry:
+                    break
+                entries.append(entry)
+            # Each signer lane keeps its own nonce, so claimed entries are submitted in parallel.
+            list(self.executor.map(self.submit, entries))
+            submitted = len(entries)
+        confirmed = self.check_receipts()
+        return submitted, confirmed
+
+    def batch_ready(self):
+        oldest = accesslog_collection.find_one(
+            {"outbox.status": STATUS_PENDING},
+            projection={"outbox.created_at": 1},
+            sort=[("outbox.created_at", 1)]
+        )
+        if not oldest:
+            return False
+        if (datetime.now() - oldest["outbox"]["created_at"]).total_seconds() >= ANCHOR["batch_window_seconds"]:
+            return True
+        pending = accesslog_collection.count_documents(
+            {"outbox.status": STATUS_PENDING}, limit=ANCHOR["batch_max_events"]
+        )
+        return pending >= ANCHOR["batch_max_events"]
+
+    def claim_batch(self):
+        batch_id = ObjectId()
+        candidate_ids = [
+            doc["_id"] for doc in accesslog_collection.find(
+                {"outbox.status": STATUS_PENDING}, {"_id": 1}
+            ).sort("outbox.created_at", 1).limit(ANCHOR["batch_max_events"])
+        ]
+        accesslog_collection.update_many(
+            {"_id": {"$in": candidate_ids}, "outbox.status": STATUS_PENDING},
+            {"$set": {"outbox.status": STATUS_SUBMITTING, "outbox.batch_id": batch_id,
+                      "outbox.claimed_at": datetime.now(), "outbox.updated_at": datetime.now()},
+             "$inc": {"outbox.attempts": 1}}
+        )
+        entries = list(accesslog_collection.find({"outbox.batch_id": batch_id}).sort("outbox.created_at", 1))
+        return batch_id, entries
+
+    def process_batch(self):
+        if not self.batch_ready():
+            return 0
+
+        batch_id, entries = self.claim_batch()
+        if not entries:
+            return 0
+
+        try:
+            levels = build_tree([entry["outbox"]["payload"] for entry in entries])
+            root = to_hex(merkle_root(levels))
+            tx_hash = submit_batch_root(root, str(batch_id), len(entries))
+            if not tx_hash:
+                raise RuntimeError("blockchain not enabled")
+        except Exception as e:
+            print(f"Error submitting anchor batch {batch_id}: {e}")
+            for entry in entries:
+                self.release(entry, str(e))
+            return 0
+
+        now = datetime.now()
+        anchor_batches_collection.insert_one({
+            "_id": batch_id,
+            "root": root,
+            "size": len(entries),
+            "tx_hash": tx_hash,
+            "status": STATUS_SUBMITTED,
+            "anchor_ids": [anchor_id_of(entry) for entry in entries],
+            "created_at": now
+        })
+
+        operations = []
+        for index, entry in enumerate(entries):
+            merkle = {
+                "batch_id": str(batch_id),
+                "root": root,
+                "leaf_index": index,
+                "proof": merkle_proof(levels, index),
+                "event": entry["outbox"]["payload"]
+            }
+            operations.append(UpdateOne(
+                {"_id": entry["_id"]},
+                {"$set": {"outbox.status": STATUS_SUBMITTED, "outbox.submitted_at": now, "outbox.updated_at": now,
+                          "blockchain_data.merkle": merkle,
+                          "blockchain_data.tx_hash": tx_hash,
+                          "blockchain_data.anchor_status": STATUS_SUBMITTED}}
+            ))
+        accesslog_collection.bulk_write(operations, ordered=False)
+        print(f"Anchored batch {batch_id} of {len(entries)} events with root {root}")
+        return len(entries)
+
+    def claim_next(self):
+        return accesslog_collection.find_one_and_update(
+            {"outbox.status": STATUS_PENDING},
+            {"$set": {"outbox.status": STATUS_SUBMITTING, "outbox.claimed_at": datetime.now(),
+                      "outbox.updated_at": datetime.now()},
+             "$inc": {"outbox.attempts": 1}},
+            sort=[("outbox.created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def submit(self, entry):
+        try:
+            tx_hash = submit_access_record(entry["nfc_id"])
+            if not tx_hash:
+                raise RuntimeError("blockchain not enabled")
+            accesslog_collection.update_one(
+                {"_id": entry["_id"]},
+                {"$set": {"outbox.status": STATUS_SUBMITTED, "outbox.submitted_at": datetime.now(),
+                          "outbox.updated_at": datetime.now(),
+                          "blockchain_data.tx_hash": tx_hash,
+                          "blockchain_data.anchor_status": STATUS_SUBMITTED}}
+            )
+        except Exception as e:
+            print(f"Error submitting anchor {entry['_id']}: {e}")
+            self.release(entry, str(e))
+
+    def release(self, entry, error):
+        status = STATUS_FAILED if entry["outbox"].get("attempts", 0) >= ANCHOR["max_attempts"] else STATUS_PENDING
+        fields = {"outbox.status": status, "outbox.last_error": error, "outbox.updated_at": datetime.now(),
+                  "blockchain_data.tx_hash": None, "blockchain_data.anchor_status": status,
+                  "blockchain_data.block_number": None}
+        accesslog_collection.update_one({"_id": entry["_id"]}, {"$set": fields})
+        if status == STATUS_FAILED:
+            backfill_anchor(entry, None, STATUS_FAILED)
+
+    def check_receipts(self):
+        confirmed = 0
+        # A transaction that was dropped or replaced never gets a receipt; its entries are retried.
+        submit_cutoff = datetime.now() - timedelta(seconds=ANCHOR["submit_timeout_seconds"])
+        expired_batches = set()
+        limit = max(self.batch_size * 5, ANCHOR["batch_max_events"]) if ANCHOR["mode"] == "batch" else self.batch_size * 5
+        entries = list(
+            accesslog_collection.find({"outbox.status": STATUS_SUBMITTED}).sort("outbox.submitted_at", 1).limit(limit)
+        )
+        # Entries of one Merkle batch share a transaction, so each receipt is fetched once,
+        # and all of them go out together as batched JSON-RPC reads.
+        tx_hashes = list(dict.fromkeys(entry["blockchain_data"]["tx_hash"] for entry in entries))
+        receipts = dict(zip(tx_hashes, get_transaction_receipts(tx_hashes))) if tx_hashes else {}
+        for entry in entries:
+            tx_hash = entry["blockchain_data"]["tx_hash"]
+            receipt = receipts[tx_hash]
+            if receipt is None:
+                if entry["outbox"].get("submitted_at", submit_cutoff) < submit_cutoff:
+                    self.release(entry, f"no receipt for {tx_hash} after {ANCHOR['submit_timeout_seconds']}s")
+                    if entry["outbox"].get("batch_id"):
+                        expired_batches.add(entry["outbox"]["batch_id"])
+                continue
+            if receipt.get("status", 1) != 1:
+                self.release(entry, "transaction reverted")
+                continue
+            # Confirmed documents leave the queue: the outbox field (and its payload copy) is dropped.
+            accesslog_collection.update_one(
+                {"_id": entry["_id"]},
+                {"$set": {"blockchain_data.anchor_status": STATUS_CONFIRMED,
+                          "blockchain_data.block_number": receipt["blockNumber"],
+                          "blockchain_data.confirmed_at": datetime.now()},
+                 "$unset": {"outbox": ""}}
+            )
+            backfill_anchor(entry, tx_hash, STATUS_CONFIRMED, receipt["blockNumber"])
+            batch_id = entry["outbox"].get("batch_id")
+            if batch_id:
+                anchor_batches_collection.update_one(
+                    {"_id": batch_id, "status": STATUS_SUBMITTED},
+                    {"$set": {"status": STATUS_CONFIRMED, "block_number": receipt["blockNumber"],
+                              "confirmed_at": datetime.now()}}
+                )
+            confirmed += 1
+        if expired_batches:
+            anchor_batches_collection.update_many(
+                {"_id": {"$in": list(expired_batches)}, "status": STATUS_SUBMITTED},
+                {"$set": {"status": STATUS_FAILED, "failed_at": datetime.now()}}
+            )
+        return confirmed
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def start_anchor_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = AnchorWorker()
+            _worker.start()
+        return _worker
+
+def stop_anchor_worker():
+    with _worker_lock:
+        if _worker is not None:
+            _worker.stop()
+
+def outbox_stats():
+    counts = {status: 0 for status in (STATUS_PENDING, STATUS_SUBMITTING, STATUS_SUBMITTED, STATUS_CONFIRMED, STATUS_FAILED)}
+    for row in accesslog_collection.aggregate([
+        {"$match": {"outbox.status": {"$exists": True}}},
+        {"$group": {"_id": "$outbox.status", "count": {"$sum": 1}}}
+    ]):
+        counts[row["_id"]] = row["count"]
+    # Confirmed documents no longer carry an outbox field.
+    counts[STATUS_CONFIRMED] = accesslog_collection.count_documents({"blockchain_data.anchor_status": STATUS_CONFIRMED})
+    return counts
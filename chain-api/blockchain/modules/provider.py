@@ -0,0 +1,175 @@
+"""
+Process-wide Web3 provider.
+
+Every Web3 built here talks to BLOCKCHAIN["provider"] through one keep-alive
+requests.Session per endpoint, with a bounded connection pool, a request
+timeout and retries on connection errors for read-only methods. web3 itself
+keeps one session per thread, which is replaced by the shared pool.
+
+Each provider call is timed into rpc_metrics, per JSON-RPC method. Node
+health (reachable, probe latency) is cached for health_ttl_seconds so views
+do not probe the node on every request. After a fork (e.g. gunicorn
+workers) the pool and the shared Web3 are rebuilt in the child.
+"""
+import os
+import threading
+import time
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.providers import HTTPProvider
+from web3.providers.rpc.utils import ExceptionRetryConfiguration
+from web3._utils.http_session_manager import HTTPSessionManager
+from config.config import BLOCKCHAIN
+
+
+class RpcMetrics:
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def record(self, method, elapsed_ms, ok=True):
+        with self._lock:
+            entry = self._methods.get(method)
+            if entry is None:
+                entry = self._methods[method] = {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                                 "recent": deque(maxlen=self.window)}
+            entry["calls"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["recent"].append(elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            methods = {}
+            for method, entry in self._methods.items():
+                recent = sorted(entry["recent"])
+                methods[method] = {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "avg_ms": round(entry["total_ms"] / entry["calls"], 2),
+                    "p50_ms": round(recent[len(recent) // 2], 2),
+                    "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2),
+                    "max_ms": round(entry["max_ms"], 2)
+                }
+            return methods
+
+    def reset(self):
+        with self._lock:
+            self._methods = {}
+
+
+rpc_metrics = RpcMetrics()
+
+
+class SharedSessionManager(HTTPSessionManager):
+    # web3 caches one session per thread; hand every thread the pooled one instead.
+
+    def __init__(self, session):
+        super().__init__()
+        self.shared_session = session
+
+    def cache_and_return_session(self, endpoint_uri, session=None, request_timeout=None):
+        return self.shared_session
+
+
+class PooledHTTPProvider(HTTPProvider):
+
+    def __init__(self, endpoint_uri, session, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self._request_session_manager = SharedSessionManager(session)
+
+    def make_request(self, method, params):
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = super().make_request(method, params)
+            ok = "error" not in response
+            return response
+        finally:
+            rpc_metrics.record(method, (time.perf_counter() - started) * 1000, ok)
+
+    def make_batch_request(self, batch_requests):
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = super().make_batch_request(batch_requests)
+            ok = isinstance(response, list)
+            return response
+        finally:
+            rpc_metrics.record("batch", (time.perf_counter() - started) * 1000, ok)
+
+
+_lock = threading.Lock()
+_pid = None
+_sessions = {}
+_shared_web3 = None
+_health = {"checked_at": 0.0, "connected": False, "latency_ms": None}
+
+
+def _check_fork():
+    global _pid, _sessions, _shared_web3
+    if _pid != os.getpid():
+        # Sockets inherited from the parent process must not be shared with it.
+        _pid = os.getpid()
+        _sessions = {}
+        _shared_web3 = None
+        _health.update({"checked_at": 0.0, "connected": False, "latency_ms": None})
+
+def session_for(endpoint_uri):
+    with _lock:
+        _check_fork()
+        session = _sessions.get(endpoint_uri)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BLOCKCHAIN["pool_size"])
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[endpoint_uri] = session
+        return session
+
+def new_web3(endpoint_uri=None):
+    """A Web3 with its own provider object (own batching state) on the shared connection pool."""
+    endpoint_uri = endpoint_uri or BLOCKCHAIN["provider"]
+    return Web3(PooledHTTPProvider(
+        endpoint_uri,
+        session_for(endpoint_uri),
+        request_kwargs={"timeout": BLOCKCHAIN["timeout_seconds"]},
+        exception_retry_configuration=ExceptionRetryConfiguration(
+            errors=(requests.ConnectionError, requests.Timeout),
+            retries=max(1, BLOCKCHAIN["retries"]),
+            backoff_factor=BLOCKCHAIN["retry_backoff_seconds"]
+        )
+    ))
+
+def shared_web3():
+    global _shared_web3
+    with _lock:
+        _check_fork()
+        if _shared_web3 is not None:
+            return _shared_web3
+    web3 = new_web3()
+    with _lock:
+        if _shared_web3 is None:
+            _shared_web3 = web3
+        return _shared_web3
+
+def node_health(max_age=None):
+    """(connected, probe latency in ms) for the shared provider, cached for max_age seconds."""
+    max_age = BLOCKCHAIN["health_ttl_seconds"] if max_age is None else max_age
+    web3 = shared_web3()
+    if time.monotonic() - _health["checked_at"] < max_age:
+        return _health["connected"], _health["latency_ms"]
+
+    started = time.perf_counter()
+    connected = web3.is_connected()
+    _health.update({
+        "checked_at": time.monotonic(),
+        "connected": connected,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2) if connected else None
+    })
+    return _health["connected"], _health["latency_ms"]
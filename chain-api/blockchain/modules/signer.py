@@ -0,0 +1,124 @@
+"""
+Multi-account signer pool for chaingate project.
+
+Each unlocked node account is a lane with its own locally tracked nonce, so
+transactions from different lanes can be in flight at the same time without
+colliding and without an eth_getTransactionCount call per submission.
+
+The counters live in this process only, so a set of accounts must be used by
+one submitting process at a time (see the submitter lease in outbox.py). If
+the node still rejects a nonce as used, the lane resyncs from the node's
+pending count and retries once.
+"""
+import itertools
+import threading
+import time
+
+# Node errors meaning the nonce was already used (by another process or an earlier submit).
+NONCE_ERRORS = ("nonce too low", "already known", "replacement transaction underpriced", "known transaction")
+
+def is_nonce_error(error):
+    message = str(error).lower()
+    return any(text in message for text in NONCE_ERRORS)
+
+
+class SignerLane:
+
+    def __init__(self, w3, account):
+        self.w3 = w3
+        self.account = account
+        self.lock = threading.Lock()
+        self.nonce = None
+        self.submitted = 0
+        self.errors = 0
+        self.resyncs = 0
+        self.busy_seconds = 0.0
+        self.created_at = time.monotonic()
+        self.last_submit_at = None
+
+    def next_nonce(self):
+        if self.nonce is None:
+            self.nonce = self.w3.eth.get_transaction_count(self.account, "pending")
+        nonce = self.nonce
+        self.nonce += 1
+        return nonce
+
+    def resync(self):
+        self.nonce = None
+        self.resyncs += 1
+
+    def transact(self, contract_function):
+        try:
+            return contract_function.transact({"from": self.account, "nonce": self.next_nonce()})
+        except Exception as e:
+            if not is_nonce_error(e):
+                raise
+            print(f"Signer {self.account}: {e}, resyncing nonce from the node")
+            self.resync()
+            return contract_function.transact({"from": self.account, "nonce": self.next_nonce()})
+
+    def submit(self, contract_function):
+        started = time.monotonic()
+        try:
+            tx_hash = self.transact(contract_function)
+        except Exception:
+            # The node may or may not have consumed the nonce, resync on the next submit.
+            self.nonce = None
+            self.errors += 1
+            raise
+        finally:
+            self.busy_seconds += time.monotonic() - started
+        self.submitted += 1
+        self.last_submit_at = time.monotonic()
+        return tx_hash
+
+    def stats(self):
+        uptime = time.monotonic() - self.created_at
+        return {
+            "account": self.account,
+            "submitted": self.submitted,
+            "errors": self.errors,
+            "nonce_resyncs": self.resyncs,
+            "next_nonce": self.nonce,
+            "tx_per_second": round(self.submitted / uptime, 3) if uptime > 0 else 0.0,
+            "avg_submit_ms": round(self.busy_seconds / self.submitted * 1000, 2) if self.submitted else None,
+            "in_flight": self.lock.locked()
+        }
+
+
+class SignerPool:
+
+    def __init__(self, w3, accounts):
+        if not accounts:
+            raise ValueError("SignerPool needs at least one account")
+        self.lanes = [SignerLane(w3, account) for account in accounts]
+        self._cursor = itertools.count()
+
+    def __len__(self):
+        return len(self.lanes)
+
+    def acquire_lane(self):
+        start = next(self._cursor) % len(self.lanes)
+        for offset in range(len(self.lanes)):
+            lane = self.lanes[(start + offset) % len(self.lanes)]
+            if lane.lock.acquire(blocking=False):
+                return lane
+        lane = self.lanes[start]
+        lane.lock.acquire()
+        return lane
+
+    def submit(self, contract_function):
+        lane = self.acquire_lane()
+        try:
+            return lane.submit(contract_function)
+        finally:
+            lane.lock.release()
+
+    def stats(self):
+        lanes = [lane.stats() for lane in self.lanes]
+        return {
+            "lanes": lanes,
+            "submitted": sum(lane["submitted"] for lane in lanes),
+            "errors": sum(lane["errors"] for lane in lanes),
+            "tx_per_second": round(sum(lane["tx_per_second"] for lane in lanes), 3)
+        }
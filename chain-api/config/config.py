@@ -17,18 +17,170 @@ MONGODB = {
         "access_levels": os.getenv("MONGODB_COLLECTION_ACCESS_LEVELS", "access_levels"),
         "alertconfig": os.getenv("MONGODB_COLLECTION_ALERTCONFIG", "alertconfig"),
         "devices": os.getenv("MONGODB_COLLECTION_DEVICES", "devices"),
-        "settings": os.getenv("MONGODB_COLLECTION_SETTINGS", "settings")
+        "settings": os.getenv("MONGODB_COLLECTION_SETTINGS", "settings"),
+        "anchor_outbox": os.getenv("MONGODB_COLLECTION_ANCHOR_OUTBOX", "anchor_outbox"),
+        "anchor_batches": os.getenv("MONGODB_COLLECTION_ANCHOR_BATCHES", "anchor_batches"),
+        "access_history": os.getenv("MONGODB_COLLECTION_ACCESS_HISTORY", "access_history"),
+        "stats": os.getenv("MONGODB_COLLECTION_STATS", "stats"),
+        "chain_transactions": os.getenv("MONGODB_COLLECTION_CHAIN_TRANSACTIONS", "chain_transactions"),
+        "user_summaries": os.getenv("MONGODB_COLLECTION_USER_SUMMARIES", "user_summaries"),
+        "activity_profiles": os.getenv("MONGODB_COLLECTION_ACTIVITY_PROFILES", "activity_profiles")
+    },
+    "client": {
+        "max_pool_size": int(os.getenv("MONGODB_MAX_POOL_SIZE", "100")),
+        "min_pool_size": int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+        "max_idle_time_ms": int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000")),
+        "connect_timeout_ms": int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000")),
+        "server_selection_timeout_ms": int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        # 0 leaves socket reads without a timeout
+        "socket_timeout_ms": int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "0")),
+        # Write concern "w" (a node count such as "1" or "majority"), read concern and read preference.
+        # Unset leaves them to the connection string (e.g. its w=majority) or the server defaults.
+        "write_concern": os.getenv("MONGODB_WRITE_CONCERN"),
+        "read_concern": os.getenv("MONGODB_READ_CONCERN"),
+        "read_preference": os.getenv("MONGODB_READ_PREFERENCE"),
+        "app_name": os.getenv("MONGODB_APP_NAME", "chaingate-api")
     }
 }
 
 BLOCKCHAIN = {
     "provider": os.getenv("BLOCKCHAIN_PROVIDER", "http://127.0.0.1:8545"),
     "account_index": int(os.getenv("BLOCKCHAIN_ACCOUNT_INDEX", "0")),
+    "signer_accounts": int(os.getenv("BLOCKCHAIN_SIGNER_ACCOUNTS", "4")),
     "contract_files": {
         "address": os.getenv("BLOCKCHAIN_CONTRACT_ADDRESS_FILE", "contracts/contract.txt"),
         "abi": os.getenv("BLOCKCHAIN_CONTRACT_ABI_FILE", "contracts/contract_abi.txt")
     },
     "network": os.getenv("BLOCKCHAIN_NETWORK", "testnet"),
+    "timeout_seconds": float(os.getenv("BLOCKCHAIN_TIMEOUT_SECONDS", "10")),
+    # Attempts for read-only calls that hit a connection error or timeout
+    "retries": int(os.getenv("BLOCKCHAIN_RETRIES", "3")),
+    "retry_backoff_seconds": float(os.getenv("BLOCKCHAIN_RETRY_BACKOFF_SECONDS", "0.25")),
+    "pool_size": int(os.getenv("BLOCKCHAIN_POOL_SIZE", "10")),
+    "health_ttl_seconds": float(os.getenv("BLOCKCHAIN_HEALTH_TTL_SECONDS", "5"))
+}
+
+ANCHOR = {
+    "mode": os.getenv("ANCHOR_MODE", "single"),
+    "batch_window_seconds": float(os.getenv("ANCHOR_BATCH_WINDOW_SECONDS", "10")),
+    "batch_max_events": int(os.getenv("ANCHOR_BATCH_MAX_EVENTS", "256")),
+    "worker_enabled": os.getenv("ANCHOR_WORKER_ENABLED", "True").lower() == "true",
+    "poll_interval_seconds": float(os.getenv("ANCHOR_POLL_INTERVAL_SECONDS", "1")),
+    "batch_size": int(os.getenv("ANCHOR_BATCH_SIZE", "20")),
+    "max_attempts": int(os.getenv("ANCHOR_MAX_ATTEMPTS", "5")),
+    "claim_timeout_seconds": int(os.getenv("ANCHOR_CLAIM_TIMEOUT_SECONDS", "60")),
+    # How often the worker requeues claims older than claim_timeout_seconds
+    "recover_interval_seconds": float(os.getenv("ANCHOR_RECOVER_INTERVAL_SECONDS", "30")),
+    # Submitted entries without a receipt after this long (dropped or replaced tx) go back to pending
+    "submit_timeout_seconds": int(os.getenv("ANCHOR_SUBMIT_TIMEOUT_SECONDS", "600")),
+    # Only the holder of the submitter lease sends transactions; another worker takes over once it expires
+    "lease_seconds": int(os.getenv("ANCHOR_LEASE_SECONDS", "30"))
+}
+
+CHAIN_INDEXER = {
+    "worker_enabled": os.getenv("CHAIN_INDEXER_ENABLED", "True").lower() == "true",
+    "poll_interval_seconds": float(os.getenv("CHAIN_INDEXER_POLL_INTERVAL_SECONDS", "2")),
+    "blocks_per_round": int(os.getenv("CHAIN_INDEXER_BLOCKS_PER_ROUND", "100")),
+    "start_block": int(os.getenv("CHAIN_INDEXER_START_BLOCK", "0")),
+    # Blocks re-indexed when the tip the indexer stopped at is no longer canonical
+    "reorg_depth": int(os.getenv("CHAIN_INDEXER_REORG_DEPTH", "12")),
+    # Only the lease holder indexes; another indexer takes over once it expires
+    "lease_seconds": int(os.getenv("CHAIN_INDEXER_LEASE_SECONDS", "30"))
+}
+
+CHAIN_READER = {
+    # Calls per JSON-RPC batch request and batches in flight at once
+    "batch_size": int(os.getenv("CHAIN_READER_BATCH_SIZE", "50")),
+    "max_workers": int(os.getenv("CHAIN_READER_MAX_WORKERS", "4"))
+}
+
+LLM = {
+    # Local Ollama server and model used for summaries and questions
+    "url": os.getenv("LLM_URL", "http://localhost:11434"),
+    "model": os.getenv("LLM_MODEL", "phi"),
+    # Generations run at once, callers allowed to wait, and the deadline covering queue and generation
+    "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", "2")),
+    "max_queue": int(os.getenv("LLM_MAX_QUEUE", "8")),
+    "timeout_seconds": float(os.getenv("LLM_TIMEOUT_SECONDS", "120")),
+    "connect_timeout_seconds": float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+}
+
+SUMMARIES = {
+    "worker_enabled": os.getenv("SUMMARY_WORKER_ENABLED", "True").lower() == "true",
+    "poll_interval_seconds": float(os.getenv("SUMMARY_POLL_INTERVAL_SECONDS", "5")),
+    "batch_size": int(os.getenv("SUMMARY_BATCH_SIZE", "10")),
+    "max_attempts": int(os.getenv("SUMMARY_MAX_ATTEMPTS", "3")),
+    "claim_timeout_seconds": int(os.getenv("SUMMARY_CLAIM_TIMEOUT_SECONDS", "300")),
+    # A user's summaries are re-queued after a tap or edit at most this often
+    "refresh_debounce_seconds": float(os.getenv("SUMMARY_REFRESH_DEBOUNCE_SECONDS", "300")),
+    # Bump after changing the model or prompt to regenerate every cached summary
+    "cache_version": os.getenv("SUMMARY_CACHE_VERSION", "1")
+}
+
+HISTORY = {
+    "bucket_size": int(os.getenv("HISTORY_BUCKET_SIZE", "200"))
+}
+
+INGEST = {
+    "max_batch_taps": int(os.getenv("INGEST_MAX_BATCH_TAPS", "1000"))
+}
+
+WRITES = {
+    # "acknowledged", "fast" (users update sent with w=0) or "transaction" (requires a replica set)
+    "mode": os.getenv("TAP_WRITE_MODE", "acknowledged"),
+    # History, activity and stats writes are merged across taps and flushed this often; 0 writes them inline
+    "flush_interval_seconds": float(os.getenv("TAP_DEFERRED_FLUSH_SECONDS", "1")),
+    "flush_max_ops": int(os.getenv("TAP_DEFERRED_FLUSH_MAX_OPS", "1000"))
+}
+
+CACHE = {
+    "authorization": {
+        "ttl_seconds": float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30")),
+        "max_entries": int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "5000"))
+    },
+    "access_matrix": {
+        "refresh_seconds": float(os.getenv("ACCESS_MATRIX_REFRESH_SECONDS", "60"))
+    },
+    # How often each process reads the shared version stamps that writes in any process bump
+    "shared_versions": {
+        "check_seconds": float(os.getenv("CACHE_VERSION_CHECK_SECONDS", "1"))
+    },
+    # Unfiltered user list stats; user writes through the API invalidate them sooner
+    "user_stats": {
+        "ttl_seconds": float(os.getenv("USER_STATS_CACHE_TTL_SECONDS", "300"))
+    }
+}
+
+VISITORS = {
+    # HyperLogLog precision: 2^precision registers, standard error 1.04 / sqrt(2^precision)
+    "precision": int(os.getenv("VISITORS_HLL_PRECISION", "12")),
+    "exact_max_days": int(os.getenv("VISITORS_EXACT_MAX_DAYS", "7"))
+}
+
+USER_SEARCH = {
+    # Longest indexed prefix, ranked candidates per lookup and the typo allowance for long words
+    "max_prefix": int(os.getenv("USER_SEARCH_MAX_PREFIX", "16")),
+    "candidates": int(os.getenv("USER_SEARCH_CANDIDATES", "200")),
+    "fuzzy_candidates": int(os.getenv("USER_SEARCH_FUZZY_CANDIDATES", "200")),
+    "max_typos": int(os.getenv("USER_SEARCH_MAX_TYPOS", "2"))
+}
+
+EXPORT = {
+    # Documents per cursor round trip, and bytes per streamed chunk
+    "batch_size": int(os.getenv("EXPORT_BATCH_SIZE", "5000")),
+    "chunk_bytes": int(os.getenv("EXPORT_CHUNK_BYTES", "65536")),
+    "gzip_level": int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+}
+
+PAGINATION = {
+    # Upper bound on per_page for every paginated listing; larger values are clamped
+    "max_per_page": int(os.getenv("PAGINATION_MAX_PER_PAGE", "100"))
+}
+
+TAP_RESPONSE = {
+    # "full", "compact" or "binary"; devices can override with response_profile or the X-Response-Profile header
+    "default_profile": os.getenv("TAP_RESPONSE_PROFILE", "full"),
+    "name_max_bytes": int(os.getenv("TAP_RESPONSE_NAME_MAX_BYTES", "32"))
 }
 
 DEBUG = os.getenv("DEBUG", "True").lower() == "true"
\ No newline at end of file
@@ -62,7 +62,7 @@ void AccessControl::processCardScan() {
 
 void AccessControl::handleAccessResponse(const ServerResponse& response) {
     if (response.success) {
-        if (response.userFound) {
+        if (response.granted) {
             ledController->activate(GREEN_LED_PIN, GREEN_LED_DURATION);
         } else {
             ledController->activate(RED_LED_PIN, RED_LED_DURATION);
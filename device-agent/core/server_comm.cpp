@@ -6,6 +6,7 @@ ServerResponse ServerComm::sendAccessRequest(const NFCData& nfcData) {
     ServerResponse response;
     response.success = false;
     response.userFound = false;
+    response.granted = false;
     response.httpCode = -1;
     
     if (WiFi.status() != WL_CONNECTED) {
@@ -17,6 +18,7 @@ ServerResponse ServerComm::sendAccessRequest(const NFCData& nfcData) {
     HTTPClient http;
     http.begin(serverUrl);
     http.addHeader("Content-Type", "application/json");
+    http.addHeader("X-Response-Profile", "compact");
     
     String jsonPayload = buildJsonPayload(nfcData);
     Serial.println("Sending JSON: " + jsonPayload);
@@ -77,6 +79,7 @@ ServerResponse ServerComm::parseResponse(const String& response, int httpCode) {
     result.httpCode = httpCode;
     result.success = false;
     result.userFound = false;
+    result.granted = false;
     
     DynamicJsonDocument doc(2048);
     DeserializationError error = deserializeJson(doc, response);
@@ -84,11 +87,17 @@ ServerResponse ServerComm::parseResponse(const String& response, int httpCode) {
     if (!error) {
         result.success = true;
         result.userFound = doc["user_found"];
+        // Only a 2xx with an explicit grant opens the gate. The full profile
+        // has no "granted" field, so fall back to user_found there.
+        bool grantedField = doc.containsKey("granted") ? doc["granted"].as<bool>() : result.userFound;
+        result.granted = httpCode >= 200 && httpCode < 300 && grantedField;
         
         Serial.print("User found: ");
         Serial.println(result.userFound);
+        Serial.print("Granted: ");
+        Serial.println(result.granted);
         
-        if (result.userFound) {
+        if (result.granted) {
             result.userName = doc["user"]["name"].as<String>();
             result.message = "Access granted to: " + result.userName;
             Serial.println(result.message);
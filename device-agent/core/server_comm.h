@@ -10,6 +10,7 @@
 struct ServerResponse {
     bool success;
     bool userFound;
+    bool granted;
     String userName;
     String message;
     int httpCode;